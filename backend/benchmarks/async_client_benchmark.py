@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare EPCClient and AsyncEPCClient UPRN lookups against a local mock API.
+
+The mock server answers every search with a single record after a fixed
+delay, so the numbers reflect how well each client overlaps network waits.
+
+    python benchmarks/async_client_benchmark.py --lookups 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ.setdefault('EPC_API_EMAIL', 'benchmark@example.com')
+os.environ.setdefault('EPC_API_KEY', 'benchmark')
+# Let the limiter get out of the way so we measure the clients themselves
+os.environ.setdefault('EPC_RATE_LIMIT', '10000')
+os.environ.setdefault('EPC_RATE_LIMIT_MAX', '10000')
+os.environ.setdefault('EPC_RATE_LIMIT_BURST', '10000')
+
+from config.settings import Config
+from src.api.async_client import AsyncEPCClient
+from src.api.client import EPCClient
+
+class MockEPCHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    
+    def do_GET(self):
+        time.sleep(self.latency)
+        query = parse_qs(urlparse(self.path).query)
+        uprn = query.get('uprn', [''])[0]
+        
+        body = json.dumps({
+            'column-names': ['lmk-key', 'uprn', 'current-energy-rating'],
+            'rows': [[f'lmk-{uprn}', uprn, 'C']]
+        }).encode()
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+class MockEPCServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 would throttle concurrent clients at accept()
+    request_queue_size = 256
+
+def start_mock_server(latency: float) -> ThreadingHTTPServer:
+    MockEPCHandler.latency = latency
+    server = MockEPCServer(('127.0.0.1', 0), MockEPCHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_sync(uprns) -> float:
+    client = EPCClient()
+    started = time.perf_counter()
+    
+    for uprn in uprns:
+        client.search_by_uprn(uprn)
+    
+    return time.perf_counter() - started
+
+async def run_async(uprns, concurrency: int) -> float:
+    async with AsyncEPCClient(max_concurrency=concurrency) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client.search_by_uprn(uprn) for uprn in uprns))
+        return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='Simulated server latency in seconds')
+    parser.add_argument('--concurrency', type=int, default=Config.ASYNC_MAX_CONCURRENCY)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    
+    server = start_mock_server(args.latency)
+    Config.EPC_API_BASE_URL = f"http://127.0.0.1:{server.server_address[1]}"
+    uprns = [str(100000000 + i) for i in range(args.lookups)]
+    
+    try:
+        sync_seconds = run_sync(uprns)
+        async_seconds = asyncio.run(run_async(uprns, args.concurrency))
+    finally:
+        server.shutdown()
+    
+    print(f"{args.lookups} UPRN lookups, {args.latency * 1000:.0f}ms simulated latency")
+    print(f"  EPCClient (sequential):        {sync_seconds:7.2f}s  "
+          f"{args.lookups / sync_seconds:8.1f} lookups/s")
+    print(f"  AsyncEPCClient (x{args.concurrency:<3} in flight): {async_seconds:7.2f}s  "
+          f"{args.lookups / async_seconds:8.1f} lookups/s")
+    print(f"  Speedup: {sync_seconds / async_seconds:.1f}x")
+
+if __name__ == '__main__':
+    main()
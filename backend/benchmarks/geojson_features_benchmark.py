@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Compare the legacy per-row GeoJSON feature builder with the columnar one.
+
+Both build features for the same geocoded synthetic certificates, once with
+every column as a property and once with the LandApp property subset; the
+full streaming export is timed as well.
+
+    python benchmarks/geojson_features_benchmark.py --rows 100000
+"""
+import argparse
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.export.geojson import GeoJSONExporter
+from store_certificates_benchmark import make_certificates
+
+LANDAPP_PROPERTIES = [
+    'lmk-key', 'address1', 'address2', 'postcode', 'local-authority',
+    'current-energy-rating', 'current-energy-efficiency', 'property-type',
+    'lodgement-date', 'uprn'
+]
+
+def make_geocoded_certificates(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    data = make_certificates(rows, extra_columns=30)
+    data['address2'] = np.where(rng.random(rows) < 0.5, 'Village', None)
+    data['latitude'] = rng.uniform(50, 55, rows)
+    data['longitude'] = rng.uniform(-5, 1, rows)
+    return data
+
+def legacy_features(data: pd.DataFrame, include_properties=None) -> list:
+    """The original implementation: iterrows with per-cell checks."""
+    def serialize_value(value):
+        if pd.isna(value):
+            return None
+        elif isinstance(value, (int, float, str, bool)):
+            return value
+        else:
+            return str(value)
+    
+    def full_address(row):
+        parts = []
+        for col in ['address1', 'address2', 'address3']:
+            if col in row.index and pd.notna(row[col]) and str(row[col]).strip():
+                parts.append(str(row[col]).strip())
+        if 'postcode' in row.index and pd.notna(row['postcode']):
+            parts.append(str(row['postcode']).strip())
+        return ", ".join(parts)
+    
+    features = []
+    for _, row in data.iterrows():
+        if include_properties:
+            properties = {prop: serialize_value(row[prop]) for prop in include_properties
+                          if prop in row.index and pd.notna(row[prop])}
+        else:
+            properties = {col: serialize_value(value) for col, value in row.items()
+                          if col not in ['latitude', 'longitude'] and pd.notna(value)}
+        properties['full_address'] = full_address(row)
+        
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point",
+                         "coordinates": [float(row['longitude']), float(row['latitude'])]},
+            "properties": properties
+        })
+    return features
+
+def timed(label: str, func) -> float:
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<36} {elapsed:7.2f}s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    data = make_geocoded_certificates(args.rows)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        exporter = GeoJSONExporter(tmp)
+        
+        for label, properties in (('all columns', None), ('LandApp subset', LANDAPP_PROPERTIES)):
+            print(f"Building {args.rows:,} features ({label})")
+            legacy = timed('legacy iterrows', lambda: legacy_features(data, properties))
+            columnar = timed('columnar _iter_features',
+                             lambda: list(exporter._iter_features(data, properties)))
+            print(f"  Speedup: {legacy / columnar:.1f}x")
+        
+        print(f"Streaming export of {args.rows:,} rows")
+        timed('export_for_landapp (compact)',
+              lambda: exporter.export_for_landapp(data, 'benchmark'))
+        timed('export_for_landapp (GeoJSONSeq)',
+              lambda: exporter.export_for_landapp(data, 'benchmark', sequence=True))
+
+if __name__ == '__main__':
+    main()
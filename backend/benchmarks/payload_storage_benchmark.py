@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Compare cache size and read speed for the certificate payload formats.
+
+The same synthetic certificates are cached three times: as the original
+``json.dumps`` text, as compact ``to_json`` text, and in the compressed
+format written by EPCDatabase.store_certificates. Each database is vacuumed
+before its size is taken, then read back in full through get_certificates.
+
+    python benchmarks/payload_storage_benchmark.py --rows 100000
+"""
+import argparse
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.data.database import EPCDatabase
+from store_certificates_benchmark import make_certificates
+
+DESCRIPTIONS = {
+    'walls-description': ['Cavity wall, filled cavity', 'Solid brick, as built, no insulation (assumed)',
+                          'Cavity wall, as built, insulated (assumed)', 'Timber frame, as built'],
+    'roof-description': ['Pitched, 270 mm loft insulation', 'Pitched, 100 mm loft insulation',
+                         'Flat, limited insulation (assumed)', '(another dwelling above)'],
+    'mainheat-description': ['Boiler and radiators, mains gas', 'Electric storage heaters',
+                             'Air source heat pump, radiators, electric', 'Boiler and radiators, oil'],
+    'windows-description': ['Fully double glazed', 'Partial double glazing', 'Single glazed'],
+    'main-fuel': ['mains gas (not community)', 'electricity (not community)', 'oil (not community)'],
+    'built-form': ['Semi-Detached', 'Mid-Terrace', 'End-Terrace', 'Detached'],
+    'transaction-type': ['marketed sale', 'rental (private)', 'rental (social)', 'new dwelling'],
+    'tenure': ['owner-occupied', 'rental (private)', 'rental (social)', 'NO DATA!'],
+}
+EFFICIENCIES = ['Very Good', 'Good', 'Average', 'Poor', 'Very Poor', None]
+
+def make_realistic_certificates(rows: int) -> pd.DataFrame:
+    """Mostly repeated descriptive strings and sparse numbers, like the API returns."""
+    rng = np.random.default_rng(7)
+    data = make_certificates(rows, extra_columns=30)
+    
+    for field, values in DESCRIPTIONS.items():
+        data[field] = rng.choice(values, rows)
+    
+    for element in ('walls', 'roof', 'mainheat', 'windows', 'hot-water', 'lighting', 'floor'):
+        data[f'{element}-energy-eff'] = rng.choice(EFFICIENCIES, rows)
+        data[f'{element}-env-eff'] = rng.choice(EFFICIENCIES, rows)
+    
+    data['inspection-date'] = '2023-04-18'
+    data['construction-age-band'] = rng.choice(
+        ['England and Wales: 1930-1949', 'England and Wales: 1967-1975', 'England and Wales: 2007 onwards'],
+        rows
+    )
+    return data
+
+def rewrite_payloads(db: EPCDatabase, data: pd.DataFrame, payloads):
+    ids = EPCDatabase.certificate_ids(data).tolist()
+    db.connections.write(lambda conn: conn.executemany(
+        'UPDATE epc_certificates SET data = ? WHERE certificate_id = ?',
+        zip(payloads, ids)
+    ))
+
+def measure(label: str, db: EPCDatabase, rows: int):
+    db.compact()
+    started = time.perf_counter()
+    result = db.get_certificates({'local-authority': 'E07000209'}, 'domestic')
+    elapsed = time.perf_counter() - started
+    
+    assert len(result) == rows, f"{label}: read {len(result)} of {rows} rows"
+    print(f"  {label:<24} {db.file_size() / 1024 ** 2:8.1f} MB  "
+          f"{elapsed:6.2f}s  {rows / elapsed:10,.0f} rows/s")
+    return db.file_size(), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    data = make_realistic_certificates(args.rows)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = {}
+        for name in ('legacy', 'compact', 'compressed'):
+            databases[name] = EPCDatabase(str(Path(tmp) / f'{name}.db'))
+            databases[name].store_certificates(data, 'domestic')
+        
+        rewrite_payloads(databases['legacy'], data,
+                         (json.dumps(record) for record in data.to_dict('records')))
+        rewrite_payloads(databases['compact'], data,
+                         data.to_json(orient='records', lines=True).rstrip('\n').split('\n'))
+        
+        print(f"Caching {args.rows:,} certificates ({len(data.columns)} columns)")
+        results = {name: measure(name, db, args.rows) for name, db in databases.items()}
+    
+    legacy_size, legacy_read = results['legacy']
+    size, read = results['compressed']
+    print(f"  Compressed vs legacy: {legacy_size / size:.1f}x smaller, "
+          f"reads {legacy_read / read:.2f}x the speed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Compare the legacy groupby summary with the bincount grid aggregation.
+
+Times the original ``create_summary_geojson`` groupby (a Python
+``value_counts`` per postcode), the same postcode summary via bincount, and
+hexagon and square grids at the default resolutions.
+
+    python benchmarks/spatial_grid_benchmark.py --rows 1000000
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.export.spatial_grid import SpatialGridAggregator
+
+RATINGS = list('ABCDEFG')
+
+def make_geocoded_certificates(rows: int) -> pd.DataFrame:
+    # Strings, as the API returns them
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        'lmk-key': np.arange(rows).astype(str),
+        'postcode': [f'GU{i % 40} {i % 997}AA' for i in range(rows)],
+        'current-energy-rating': rng.choice(RATINGS, rows),
+        'current-energy-efficiency': rng.integers(1, 100, rows).astype(str),
+        'co2-emissions-current': rng.uniform(0, 12, rows).round(1).astype(str),
+        'latitude': rng.uniform(50.5, 52.5, rows),
+        'longitude': rng.uniform(-2.5, 0.5, rows),
+    })
+
+def legacy_summary(data: pd.DataFrame, group_by: str = 'postcode') -> pd.DataFrame:
+    """The original implementation's aggregation step."""
+    data = data.assign(**{'current-energy-efficiency':
+                          pd.to_numeric(data['current-energy-efficiency'], errors='coerce')})
+    return data.groupby(group_by).agg({
+        'latitude': 'mean',
+        'longitude': 'mean',
+        'current-energy-rating': lambda x: x.value_counts().to_dict(),
+        'lmk-key': 'count',
+        'current-energy-efficiency': 'mean'
+    }).reset_index()
+
+def timed(label: str, func) -> float:
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<36} {elapsed:7.2f}s  ({len(result):,} groups)")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    data = make_geocoded_certificates(args.rows)
+    aggregator = SpatialGridAggregator()
+    
+    print(f"Summarising {args.rows:,} certificates by postcode")
+    legacy = timed('legacy groupby', lambda: legacy_summary(data))
+    columnar = timed('bincount summarise_by', lambda: aggregator.summarise_by(data, 'postcode'))
+    print(f"  Speedup: {legacy / columnar:.1f}x")
+    
+    sizes = SpatialGridAggregator.DEFAULT_CELL_SIZES
+    print(f"Grid cells at {', '.join(f'{size}m' for size in sizes)}")
+    for shape in SpatialGridAggregator.SHAPES:
+        grid = SpatialGridAggregator(shape)
+        started = time.perf_counter()
+        levels = grid.aggregate_levels(data, sizes)
+        elapsed = time.perf_counter() - started
+        counts = ', '.join(f'{len(cells):,}' for cells in levels.values())
+        print(f"  {shape + ' aggregate_levels':<36} {elapsed:7.2f}s  ({counts} cells)")
+        
+        started = time.perf_counter()
+        for cells in levels.values():
+            grid.to_geojson(cells)
+        print(f"  {shape + ' polygons to GeoJSON':<36} {time.perf_counter() - started:7.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Compare the legacy per-row cache insert with EPCDatabase.store_certificates.
+
+Synthetic certificates with a realistic column count and sparse fields are
+written to fresh temporary databases by both paths.
+
+    python benchmarks/store_certificates_benchmark.py --rows 100000
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.data.database import EPCDatabase
+
+RATINGS = list('ABCDEFG')
+PROPERTY_TYPES = ['House', 'Flat', 'Bungalow', 'Maisonette', 'Park home']
+
+def make_certificates(rows: int, extra_columns: int = 80) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    
+    data = pd.DataFrame({
+        'lmk-key': [f'{i:032x}' for i in range(rows)],
+        'uprn': rng.integers(10**9, 10**11, rows).astype(str),
+        'address1': [f'{i} Example Road' for i in range(rows)],
+        'postcode': [f'GU{i % 30} {i % 9}AA' for i in range(rows)],
+        'local-authority': 'E07000209',
+        'current-energy-rating': rng.choice(RATINGS, rows),
+        'current-energy-efficiency': rng.integers(1, 100, rows),
+        'property-type': rng.choice(PROPERTY_TYPES, rows),
+        'lodgement-date': '2023-05-01',
+    })
+    
+    for i in range(extra_columns):
+        column = rng.random(rows)
+        column[rng.random(rows) < 0.6] = np.nan
+        data[f'field-{i}'] = column
+    
+    return data
+
+def legacy_store(db_path: str, data: pd.DataFrame, property_type: str) -> int:
+    """The original implementation: iterrows, json.dumps and one INSERT per row."""
+    records_stored = 0
+    
+    with sqlite3.connect(db_path) as conn:
+        for _, row in data.iterrows():
+            certificate_id = row.get('lmk-key') or row.get('building-reference-number')
+            
+            if not certificate_id:
+                continue
+            
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO epc_certificates
+                (certificate_id, property_type, data, cached_at, last_accessed)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            ''', (certificate_id, property_type, json.dumps(row.to_dict())))
+            records_stored += 1
+        
+        conn.commit()
+    
+    return records_stored
+
+def timed(label: str, func) -> float:
+    started = time.perf_counter()
+    stored = func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {elapsed:7.2f}s  {stored / elapsed:10,.0f} rows/s")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    data = make_certificates(args.rows)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = EPCDatabase(str(Path(tmp) / 'legacy.db'))
+        bulk_db = EPCDatabase(str(Path(tmp) / 'bulk.db'))
+        
+        print(f"Storing {args.rows:,} certificates ({len(data.columns)} columns)")
+        legacy = timed('legacy iterrows + execute',
+                       lambda: legacy_store(legacy_db.db_path, data, 'domestic'))
+        bulk = timed('bulk to_json + executemany',
+                     lambda: bulk_db.store_certificates(data, 'domestic'))
+    
+    print(f"  Speedup: {legacy / bulk:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,13 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Relative database paths are taken from the backend package directory, so
+# they do not depend on the directory the process was started from
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def backend_path(path: str) -> str:
+    return os.path.join(BACKEND_DIR, path)
+
 class Config:
     EPC_API_EMAIL = os.getenv('EPC_API_EMAIL')
     EPC_API_KEY = os.getenv('EPC_API_KEY')
@@ -11,17 +18,90 @@ class Config:
     EPC_API_PASSWORD = os.getenv('EPC_API_PASSWORD')
     EPC_API_BASE_URL = os.getenv('EPC_API_BASE_URL', 'https://epc.opendatacommunities.org/api/v1')
     
-    DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/epc_cache.db')
+    DATABASE_PATH = backend_path(os.getenv('DATABASE_PATH', 'data/epc_cache.db'))
+    # How long a cached search result is served without calling the API (0 disables)
+    SEARCH_CACHE_TTL_HOURS = float(os.getenv('SEARCH_CACHE_TTL_HOURS', '24'))
+    DB_WRITE_BATCH_ROWS = 5000
+    DB_BUSY_TIMEOUT = 30
     
     OS_PLACES_API_KEY = os.getenv('OS_PLACES_API_KEY')
     
+    # Geocoding results are cached next to the certificate cache
+    GEOCODE_CACHE_PATH = backend_path(os.getenv(
+        'GEOCODE_CACHE_PATH',
+        os.path.join(os.path.dirname(DATABASE_PATH), 'geocode_cache.db')
+    ))
+    GEOCODE_CACHE_TTL_DAYS = float(os.getenv('GEOCODE_CACHE_TTL_DAYS', '90'))
+    GEOCODE_NEGATIVE_TTL_HOURS = float(os.getenv('GEOCODE_NEGATIVE_TTL_HOURS', '24'))
+    GEOCODE_LRU_SIZE = 20000
+    # Request rates (per second) and OS Places concurrency for network geocoding
+    GEOCODE_OS_PLACES_RATE = float(os.getenv('GEOCODE_OS_PLACES_RATE', '10'))
+    GEOCODE_OS_PLACES_WORKERS = int(os.getenv('GEOCODE_OS_PLACES_WORKERS', '8'))
+    GEOCODE_NOMINATIM_RATE = 1.0
+    # Optional local postcode file (e.g. ONSPD CSV with pcds, lat, long) used
+    # before any network geocoder
+    POSTCODE_CENTROIDS_PATH = os.getenv('POSTCODE_CENTROIDS_PATH')
+    
     DEFAULT_EXPORT_PATH = os.getenv('DEFAULT_EXPORT_PATH', 'exports/')
     GEOJSON_CRS = os.getenv('GEOJSON_CRS', 'EPSG:4326')
     
+    # Web app search results held server-side for paging, export, map and
+    # analytics; least recently used sets go first once either cap is hit
+    RESULT_SET_TTL_MINUTES = float(os.getenv('RESULT_SET_TTL_MINUTES', '30'))
+    RESULT_SET_MAX_SETS = int(os.getenv('RESULT_SET_MAX_SETS', '50'))
+    RESULT_SET_MAX_ROWS = int(os.getenv('RESULT_SET_MAX_ROWS', '2000000'))
+    RESULT_PAGE_SIZE = 100
+    RESULT_PAGE_MAX = 1000
+    
+    # Background jobs for long web searches and exports; job state is kept
+    # in SQLite so the browser can poll it, finished jobs are purged after
+    # the retention period
+    JOB_DATABASE_PATH = backend_path(os.getenv('JOB_DATABASE_PATH', 'data/jobs.db'))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', '24'))
+    JOB_PROGRESS_INTERVAL = 0.5
+    # Finished jobs are purged at most this often, from submit
+    JOB_PURGE_INTERVAL = 300
+    
+    # Web API responses (/api/search, /api/analytics) cached by normalised
+    # request body: an in-memory LRU, plus SQLite when RESPONSE_CACHE_PATH is
+    # set. Entries are dropped once the certificate cache changes; a TTL of
+    # 0 disables the cache
+    RESPONSE_CACHE_TTL_MINUTES = float(os.getenv('RESPONSE_CACHE_TTL_MINUTES', '10'))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '256'))
+    RESPONSE_CACHE_MAX_MB = float(os.getenv('RESPONSE_CACHE_MAX_MB', '64'))
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH')
+    
+    # Web map: certificates are clustered into cells of MAP_CLUSTER_RADIUS
+    # pixels up to MAP_CLUSTER_MAX_ZOOM, or whenever more than MAP_MAX_POINTS
+    # would be in view
+    MAP_CLUSTER_MAX_ZOOM = int(os.getenv('MAP_CLUSTER_MAX_ZOOM', '13'))
+    MAP_CLUSTER_RADIUS = int(os.getenv('MAP_CLUSTER_RADIUS', '60'))
+    MAP_MAX_POINTS = int(os.getenv('MAP_MAX_POINTS', '5000'))
+    
+    # Width of the efficiency score bands kept in the analytics rollups
+    ANALYTICS_EFFICIENCY_BAND = 5
+    
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
     
     REQUEST_TIMEOUT = 30
     RETRY_ATTEMPTS = 3
     RETRY_DELAY = 1
     
-    PAGE_SIZE = 5000
\ No newline at end of file
+    # Adaptive rate limiting shared by every EPC API request (requests/second)
+    RATE_LIMIT_INITIAL = float(os.getenv('EPC_RATE_LIMIT', '10'))
+    RATE_LIMIT_MIN = float(os.getenv('EPC_RATE_LIMIT_MIN', '0.5'))
+    RATE_LIMIT_MAX = float(os.getenv('EPC_RATE_LIMIT_MAX', '50'))
+    RATE_LIMIT_BURST = float(os.getenv('EPC_RATE_LIMIT_BURST', '5'))
+    RATE_LIMIT_INCREASE = 0.5
+    RATE_LIMIT_LATENCY_TARGET = 2.0
+    
+    ASYNC_MAX_CONCURRENCY = int(os.getenv('EPC_ASYNC_MAX_CONCURRENCY', '20'))
+    
+    PAGE_SIZE = 5000
+    
+    # Earliest lodgement year on the register, used for year-window shards
+    EPC_FIRST_YEAR = 2008
+    SHARD_WORKERS = int(os.getenv('EPC_SHARD_WORKERS', '4'))
+    # Longest wait for the next page from any shard before a sharded search fails
+    SHARD_PAGE_TIMEOUT = float(os.getenv('EPC_SHARD_PAGE_TIMEOUT', '300'))
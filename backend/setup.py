@@ -11,12 +11,14 @@ setup(
     packages=find_packages(),
     install_requires=[
         "requests>=2.28.0",
+        "aiohttp>=3.8.0",
         "pandas>=1.5.0", 
+        "pyarrow>=12.0.0",
+        "zstandard>=0.21.0",
         "geopandas>=0.12.0",
         "click>=8.1.0",
         "python-dotenv>=1.0.0",
         "tqdm>=4.64.0",
-        "folium>=0.14.0",
         "sqlalchemy>=1.4.0",
         "geopy>=2.3.0",
         "shapely>=2.0.0",
@@ -0,0 +1,236 @@
+import asyncio
+import time
+import aiohttp
+import pandas as pd
+from typing import AsyncGenerator, Dict, Optional
+import logging
+
+from .auth import EPCAuth
+from .pagination import parse_page
+from .rate_limit import get_rate_limiter, parse_retry_after
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+class EPCRequestError(Exception):
+    """A request that failed after retries, as opposed to one with no results."""
+
+class AsyncSearchAfterPaginator:
+    def __init__(self, session: aiohttp.ClientSession, base_url: str,
+                 semaphore: asyncio.Semaphore):
+        self.session = session
+        self.base_url = base_url
+        self.semaphore = semaphore
+        self.rate_limiter = get_rate_limiter()
+    
+    async def paginate(self, endpoint: str, params: Dict,
+                       search_after_key: str = 'search-after',
+                       strict: bool = False) -> AsyncGenerator[Dict, None]:
+        search_after = None
+        page_count = 0
+        total_records = 0
+        
+        while True:
+            page_params = params.copy()
+            
+            if search_after:
+                page_params[search_after_key] = search_after
+            
+            page_params['size'] = Config.PAGE_SIZE
+            
+            try:
+                response = await self._make_request(endpoint, page_params)
+                
+                if not response:
+                    logger.warning(f"No response received for page {page_count + 1}")
+                    break
+                
+                data = parse_page(response)
+                if not data:
+                    logger.info(f"No more data available after {page_count} pages")
+                    break
+                
+                page_count += 1
+                total_records += len(data)
+                
+                logger.debug(f"Page {page_count}: Retrieved {len(data)} records "
+                            f"(total: {total_records})")
+                
+                yield {
+                    'data': data,
+                    'page': page_count,
+                    'page_size': len(data),
+                    'total_retrieved': total_records
+                }
+                
+                search_after = response.get('next-search-after')
+                if not search_after:
+                    break
+            
+            except Exception as e:
+                if strict:
+                    if isinstance(e, EPCRequestError):
+                        raise
+                    # e.g. a response that is JSON but not a search page
+                    raise EPCRequestError(f"Bad page {page_count + 1} from {endpoint}: "
+                                          f"{str(e)}") from e
+                logger.error(f"Error on page {page_count + 1}: {str(e)}")
+                break
+    
+    async def _throttle(self):
+        wait_time = self.rate_limiter.try_acquire()
+        while wait_time > 0:
+            await asyncio.sleep(wait_time)
+            wait_time = self.rate_limiter.try_acquire()
+    
+    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """Return the decoded response, or ``None`` for a 404.
+        
+        Raises ``EPCRequestError`` for any other failure once retries are spent.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        # aiohttp only accepts str, int and float query values
+        query = {key: str(value) for key, value in (params or {}).items()}
+        
+        for attempt in range(Config.RETRY_ATTEMPTS):
+            try:
+                async with self.semaphore:
+                    await self._throttle()
+                    started = time.monotonic()
+                    
+                    async with self.session.get(url, params=query) as response:
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        self.rate_limiter.record_response(
+                            response.status, time.monotonic() - started, retry_after
+                        )
+                        
+                        if response.status == 200:
+                            try:
+                                return await response.json(content_type=None)
+                            except ValueError as e:
+                                raise EPCRequestError(f"Malformed response from {endpoint}: "
+                                                      f"{str(e)}") from e
+                        elif response.status == 429:
+                            if retry_after is None:
+                                self.rate_limiter.pause((attempt + 1) * Config.RETRY_DELAY)
+                            logger.warning(f"Rate limited, retrying at "
+                                           f"{self.rate_limiter.current_rate:.2f} req/s")
+                            continue
+                        elif response.status == 404:
+                            return None
+                        else:
+                            text = await response.text()
+                            logger.error(f"API error {response.status}: {text}")
+                            raise EPCRequestError(f"API error {response.status} for {endpoint}")
+            
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < Config.RETRY_ATTEMPTS - 1:
+                    wait_time = (attempt + 1) * Config.RETRY_DELAY
+                    logger.warning(f"Request failed, retrying in {wait_time}s: {str(e)}")
+                    await asyncio.sleep(wait_time)
+                else:
+                    logger.error(f"Request failed after {Config.RETRY_ATTEMPTS} attempts: {str(e)}")
+                    raise EPCRequestError(str(e)) from e
+        
+        raise EPCRequestError(f"Still rate limited after {Config.RETRY_ATTEMPTS} attempts "
+                              f"for {endpoint}")
+
+class AsyncEPCClient:
+    """asyncio counterpart of ``EPCClient`` for many concurrent lookups.
+    
+    Use as an async context manager so the underlying HTTP session is
+    closed; ``max_concurrency`` bounds in-flight requests across every
+    search issued through the client.
+    """
+    
+    def __init__(self, max_concurrency: Optional[int] = None,
+                 base_url: Optional[str] = None):
+        self.auth = EPCAuth()
+        self.base_url = base_url or Config.EPC_API_BASE_URL
+        self.max_concurrency = max_concurrency or Config.ASYNC_MAX_CONCURRENCY
+        self.session = None
+        self.paginator = None
+    
+    async def __aenter__(self) -> 'AsyncEPCClient':
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def open(self):
+        if self.session is not None:
+            return
+        
+        self.session = aiohttp.ClientSession(
+            headers=self.auth.get_auth_headers(),
+            timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+        )
+        self.paginator = AsyncSearchAfterPaginator(
+            self.session, self.base_url, asyncio.Semaphore(self.max_concurrency)
+        )
+    
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+            self.paginator = None
+    
+    async def search_by_postcode(self, postcode: str, property_type: str = 'domestic') -> pd.DataFrame:
+        filters = {'postcode': postcode}
+        endpoint = f'{property_type}/search'
+        return await self._search(endpoint, filters)
+    
+    async def search_by_local_authority(self, local_authority: str,
+                                        property_type: str = 'domestic',
+                                        additional_filters: Optional[Dict] = None) -> pd.DataFrame:
+        filters = {'local-authority': local_authority}
+        
+        if additional_filters:
+            filters.update(additional_filters)
+        
+        endpoint = f'{property_type}/search'
+        return await self._search(endpoint, filters)
+    
+    async def search_by_uprn(self, uprn: str, property_type: str = 'domestic',
+                             strict: bool = False) -> pd.DataFrame:
+        """Look up one UPRN; with ``strict`` a failed request raises
+        ``EPCRequestError`` instead of returning an empty frame."""
+        filters = {'uprn': uprn}
+        endpoint = f'{property_type}/search'
+        return await self._search(endpoint, filters, strict)
+    
+    async def iter_records(self, endpoint: str, params: Dict,
+                           strict: bool = False) -> AsyncGenerator[Dict, None]:
+        await self.open()
+        
+        async for page_data in self.paginator.paginate(endpoint, params, strict=strict):
+            for record in page_data['data']:
+                yield record
+    
+    async def _search(self, endpoint: str, params: Dict,
+                      strict: bool = False) -> pd.DataFrame:
+        logger.debug(f"Starting async search: {endpoint} with params: {params}")
+        
+        all_data = [record async for record in self.iter_records(endpoint, params, strict)]
+        
+        if all_data:
+            return pd.DataFrame(all_data)
+        return pd.DataFrame()
+    
+    async def get_certificate_by_id(self, certificate_id: str,
+                                    property_type: str = 'domestic') -> Optional[Dict]:
+        await self.open()
+        endpoint = f'{property_type}/certificate/{certificate_id}'
+        
+        try:
+            result = await self.paginator._make_request(endpoint)
+            
+            if result is None:
+                logger.error(f"Failed to get certificate {certificate_id}")
+            return result
+        
+        except Exception as e:
+            logger.error(f"Error getting certificate {certificate_id}: {str(e)}")
+            return None
@@ -2,6 +2,7 @@ import base64
 import requests
 from typing import Optional
 from config.settings import Config
+from .rate_limit import get_rate_limiter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,7 +43,8 @@ class EPCAuth:
     def test_connection(self) -> bool:
         try:
             headers = self.get_auth_headers()
-            response = requests.get(
+            response = get_rate_limiter().get(
+                requests,
                 f"{self.base_url}/domestic/search",
                 headers=headers,
                 params={'postcode': 'SW1A 0AA', 'size': 1},
@@ -1,17 +1,23 @@
 import requests
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Generator, List, Optional
 from tqdm import tqdm
 import logging
 
 from .auth import EPCAuth
-from .pagination import SearchAfterPaginator
+from .pagination import SearchAfterPaginator, year_window_shards
+from .rate_limit import get_rate_limiter
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+# Called with (pages, records) as each page of a search arrives
+PageProgress = Callable[[int, int], None]
+
 class EPCClient:
-    def __init__(self):
+    def __init__(self, search_cache=None):
+        # Optional src.data.search_cache.SearchCache consulted before the API
+        self.search_cache = search_cache
         self.auth = EPCAuth()
         self.session = self._create_session()
         self.paginator = SearchAfterPaginator(self.session, Config.EPC_API_BASE_URL)
@@ -24,35 +30,70 @@ class EPCClient:
     def test_connection(self) -> bool:
         return self.auth.test_connection()
     
-    def search_domestic(self, filters: Dict) -> pd.DataFrame:
-        return self._search('domestic/search', filters)
+    def search_domestic(self, filters: Dict,
+                        shards: Optional[List[Dict]] = None,
+                        max_workers: Optional[int] = None,
+                        progress: Optional[PageProgress] = None) -> pd.DataFrame:
+        return self._search('domestic/search', filters, shards, max_workers, progress)
     
-    def search_non_domestic(self, filters: Dict) -> pd.DataFrame:
-        return self._search('non-domestic/search', filters)
+    def search_non_domestic(self, filters: Dict,
+                            shards: Optional[List[Dict]] = None,
+                            max_workers: Optional[int] = None,
+                            progress: Optional[PageProgress] = None) -> pd.DataFrame:
+        return self._search('non-domestic/search', filters, shards, max_workers, progress)
     
-    def search_by_postcode(self, postcode: str, property_type: str = 'domestic') -> pd.DataFrame:
+    def search_by_postcode(self, postcode: str, property_type: str = 'domestic',
+                           progress: Optional[PageProgress] = None) -> pd.DataFrame:
         filters = {'postcode': postcode}
         endpoint = f'{property_type}/search'
-        return self._search(endpoint, filters)
+        return self._search(endpoint, filters, progress=progress)
     
     def search_by_local_authority(self, local_authority: str, 
                                  property_type: str = 'domestic',
-                                 additional_filters: Optional[Dict] = None) -> pd.DataFrame:
+                                 additional_filters: Optional[Dict] = None,
+                                 progress: Optional[PageProgress] = None) -> pd.DataFrame:
         filters = {'local-authority': local_authority}
         
         if additional_filters:
             filters.update(additional_filters)
         
         endpoint = f'{property_type}/search'
-        return self._search(endpoint, filters)
+        return self._search(endpoint, filters, progress=progress)
     
-    def search_by_uprn(self, uprn: str, property_type: str = 'domestic') -> pd.DataFrame:
+    def search_by_local_authority_sharded(self, local_authority: str,
+                                          property_type: str = 'domestic',
+                                          from_year: Optional[int] = None,
+                                          to_year: Optional[int] = None,
+                                          max_workers: Optional[int] = None) -> pd.DataFrame:
+        filters = {'local-authority': local_authority}
+        shards = year_window_shards(filters,
+                                    from_year or Config.EPC_FIRST_YEAR,
+                                    to_year or pd.Timestamp.now().year)
+        
+        # The filters key the search cache: a year window must not be
+        # cached as the whole authority
+        if from_year:
+            filters['from-year'] = from_year
+        if to_year:
+            filters['to-year'] = to_year
+        
+        endpoint = f'{property_type}/search'
+        return self._search(endpoint, filters, shards=shards, max_workers=max_workers)
+    
+    def search_by_uprn(self, uprn: str, property_type: str = 'domestic',
+                       progress: Optional[PageProgress] = None) -> pd.DataFrame:
         filters = {'uprn': uprn}
         endpoint = f'{property_type}/search'
-        return self._search(endpoint, filters)
+        return self._search(endpoint, filters, progress=progress)
     
     def search_agricultural_buildings(self, local_authority: Optional[str] = None, 
-                                    postcode: Optional[str] = None) -> pd.DataFrame:
+                                    postcode: Optional[str] = None,
+                                    progress: Optional[PageProgress] = None) -> pd.DataFrame:
+        return self.search_non_domestic(self.agricultural_filters(local_authority, postcode),
+                                        progress=progress)
+    
+    def agricultural_filters(self, local_authority: Optional[str] = None,
+                             postcode: Optional[str] = None) -> Dict:
         filters = {}
         
         if local_authority:
@@ -65,36 +106,110 @@ class EPCClient:
             'built-form': 'Detached'
         })
         
-        return self.search_non_domestic(filters)
+        return filters
     
-    def _search(self, endpoint: str, params: Dict) -> pd.DataFrame:
-        logger.info(f"Starting search: {endpoint} with params: {params}")
+    def _pages(self, endpoint: str, params: Dict,
+               shards: Optional[List[Dict]] = None,
+               max_workers: Optional[int] = None) -> Generator[Dict, None, None]:
+        if shards:
+            return self.paginator.paginate_sharded(endpoint, shards, max_workers)
+        return self.paginator.paginate(endpoint, params)
+    
+    def iter_records(self, endpoint: str, params: Dict,
+                     shards: Optional[List[Dict]] = None,
+                     max_workers: Optional[int] = None) -> Generator[Dict, None, None]:
+        """Yield records one at a time as each page arrives from the paginator."""
+        for page_data in self._pages(endpoint, params, shards, max_workers):
+            yield from page_data['data']
+    
+    def iter_frames(self, endpoint: str, params: Dict,
+                    chunk_rows: Optional[int] = None,
+                    shards: Optional[List[Dict]] = None,
+                    max_workers: Optional[int] = None) -> Generator[pd.DataFrame, None, None]:
+        """Yield DataFrame chunks of at most ``chunk_rows`` records.
         
-        all_data = []
-        total_records = 0
+        Only one chunk is held in memory at a time, so whole-authority pulls
+        can be cached or exported without materialising every page. Raises
+        ``PaginationError`` if the search cannot be completed.
+        """
+        chunk_rows = chunk_rows or Config.PAGE_SIZE
+        search_hash = None
         
-        pages = list(self.paginator.paginate(endpoint, params))
+        if self.search_cache is not None:
+            cached = self.search_cache.lookup(endpoint, params)
+            if cached is not None:
+                for start in range(0, len(cached), chunk_rows):
+                    yield cached.iloc[start:start + chunk_rows].reset_index(drop=True)
+                return
+            search_hash = self.search_cache.begin(endpoint, params)
         
-        if not pages:
-            logger.warning("No data returned from API")
-            return pd.DataFrame()
+        def emit(records: List[Dict]) -> pd.DataFrame:
+            frame = pd.DataFrame(records)
+            if search_hash is not None:
+                self.search_cache.add_results(search_hash, frame, self._property_type(endpoint))
+            return frame
         
-        progress_bar = tqdm(pages, desc="Processing pages", unit="page")
+        buffer = []
         
-        for page_data in progress_bar:
-            data = page_data['data']
-            all_data.extend(data)
-            total_records = page_data['total_retrieved']
+        for record in self.iter_records(endpoint, params, shards, max_workers):
+            buffer.append(record)
             
-            progress_bar.set_description(f"Processing pages ({total_records} records)")
+            if len(buffer) >= chunk_rows:
+                yield emit(buffer)
+                buffer = []
+        
+        if buffer:
+            yield emit(buffer)
+        
+        # Only a fully consumed stream is recorded as a complete cached search;
+        # a failed page raises PaginationError before this point
+        if search_hash is not None:
+            self.search_cache.complete(search_hash, endpoint, params)
+    
+    def _property_type(self, endpoint: str) -> str:
+        return endpoint.strip('/').split('/')[0]
+    
+    def _search(self, endpoint: str, params: Dict,
+                shards: Optional[List[Dict]] = None,
+                max_workers: Optional[int] = None,
+                progress: Optional[PageProgress] = None) -> pd.DataFrame:
+        logger.info(f"Starting search: {endpoint} with params: {params}")
+        
+        if self.search_cache is not None:
+            cached = self.search_cache.lookup(endpoint, params)
+            if cached is not None:
+                return cached
+        
+        all_data = []
+        pages = self._pages(endpoint, params, shards, max_workers)
+        progress_bar = tqdm(pages, desc="Processing pages", unit="page")
+        
+        try:
+            for page_data in progress_bar:
+                all_data.extend(page_data['data'])
+                total_records = page_data['total_retrieved']
+                
+                progress_bar.set_description(f"Processing pages ({total_records} records)")
+                if progress:
+                    progress(page_data['page'], total_records)
+        finally:
+            # A progress callback may abort the search; closing the pages
+            # stops any shard workers straight away
+            progress_bar.close()
+            pages.close()
         
         if all_data:
             df = pd.DataFrame(all_data)
             logger.info(f"Search complete: {len(df)} records retrieved")
-            return df
         else:
             logger.info("No records found matching search criteria")
-            return pd.DataFrame()
+            df = pd.DataFrame()
+        
+        # Reached only once every page has arrived: PaginationError skips it
+        if self.search_cache is not None:
+            self.search_cache.store(endpoint, params, df, self._property_type(endpoint))
+        
+        return df
     
     def get_certificate_by_id(self, certificate_id: str, 
                              property_type: str = 'domestic') -> Optional[Dict]:
@@ -102,7 +217,7 @@ class EPCClient:
         url = f"{Config.EPC_API_BASE_URL}/{endpoint}"
         
         try:
-            response = self.session.get(url, timeout=Config.REQUEST_TIMEOUT)
+            response = get_rate_limiter().get(self.session, url, timeout=Config.REQUEST_TIMEOUT)
             
             if response.status_code == 200:
                 return response.json()
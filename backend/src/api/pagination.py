@@ -1,18 +1,64 @@
 import requests
+import queue
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Generator
 from config.settings import Config
+from .rate_limit import get_rate_limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
+class PaginationError(Exception):
+    """A search stopped before its last page because a request failed."""
+
+def parse_page(response: Dict) -> List[Dict]:
+    # Handle both formats: 'data' array or 'column-names'/'rows' format
+    if 'data' in response:
+        return response.get('data', [])
+    elif 'rows' in response and 'column-names' in response:
+        # Convert column-names/rows format to data array
+        columns = response['column-names']
+        rows = response['rows']
+        return [dict(zip(columns, row)) for row in rows]
+    return []
+
+def year_window_shards(params: Dict, from_year: int, to_year: int,
+                       window: int = 1) -> List[Dict]:
+    shards = []
+    
+    for start in range(from_year, to_year + 1, window):
+        shard = params.copy()
+        shard['from-year'] = start
+        shard['to-year'] = min(start + window - 1, to_year)
+        shards.append(shard)
+    
+    return shards
+
+def postcode_district_shards(params: Dict, districts: List[str]) -> List[Dict]:
+    shards = []
+    
+    for district in districts:
+        shard = params.copy()
+        shard['postcode'] = district
+        shards.append(shard)
+    
+    return shards
+
 class SearchAfterPaginator:
     def __init__(self, session: requests.Session, base_url: str):
         self.session = session
         self.base_url = base_url
+        self.rate_limiter = get_rate_limiter()
         
     def paginate(self, endpoint: str, params: Dict, 
                  search_after_key: str = 'search-after') -> Generator[Dict, None, None]:
+        """Yield pages until the API reports no more.
+        
+        Raises ``PaginationError`` if a page cannot be fetched, so a
+        truncated search is never mistaken for a complete one.
+        """
         search_after = None
         page_count = 0
         total_records = 0
@@ -27,70 +73,167 @@ class SearchAfterPaginator:
             
             try:
                 response = self._make_request(endpoint, page_params)
+            except PaginationError:
+                logger.error(f"Search stopped at page {page_count + 1} "
+                             f"after {total_records} records")
+                raise
+            
+            data = parse_page(response) if response else []
+            if not data:
+                logger.info(f"No more data available after {page_count} pages")
+                break
+            
+            page_count += 1
+            total_records += len(data)
+            
+            logger.info(f"Page {page_count}: Retrieved {len(data)} records "
+                       f"(total: {total_records})")
+            
+            yield {
+                'data': data,
+                'page': page_count,
+                'page_size': len(data),
+                'total_retrieved': total_records
+            }
+            
+            search_after = response.get('next-search-after')
+            if not search_after:
+                logger.info(f"Pagination complete: {total_records} total records")
+                break
+    
+    def paginate_sharded(self, endpoint: str, shards: List[Dict],
+                         max_workers: Optional[int] = None,
+                         dedupe_key: Optional[str] = 'lmk-key') -> Generator[Dict, None, None]:
+        """Fetch independent sub-queries in parallel and merge their pages.
+        
+        Each shard is paginated sequentially on its own worker thread; pages
+        are yielded in arrival order with records already seen under
+        ``dedupe_key`` dropped, since overlapping shards can repeat them. A
+        failed shard, or no page from any shard within
+        ``SHARD_PAGE_TIMEOUT`` seconds, stops the search with
+        ``PaginationError``.
+        """
+        max_workers = max(1, min(max_workers or Config.SHARD_WORKERS, len(shards)))
+        pages = queue.Queue(maxsize=max_workers * 2)
+        stop = threading.Event()
+        shard_done = object()
+        
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def fetch_shard(shard_params: Dict):
+            try:
+                for page_data in self.paginate(endpoint, shard_params):
+                    if not put(page_data):
+                        break
+            except Exception as e:
+                logger.error(f"Shard {shard_params} failed: {str(e)}")
+                put(e)
+            finally:
+                put(shard_done)
+        
+        seen = set()
+        page_count = 0
+        total_records = 0
+        remaining = len(shards)
+        
+        logger.info(f"Fetching {len(shards)} shards with {max_workers} workers")
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        
+        try:
+            for shard_params in shards:
+                executor.submit(fetch_shard, shard_params)
+            
+            while remaining:
+                try:
+                    page_data = pages.get(timeout=Config.SHARD_PAGE_TIMEOUT)
+                except queue.Empty:
+                    raise PaginationError(f"No page from any shard within "
+                                          f"{Config.SHARD_PAGE_TIMEOUT}s")
+                
+                if page_data is shard_done:
+                    remaining -= 1
+                    continue
+                if isinstance(page_data, Exception):
+                    raise PaginationError(f"A shard failed: {str(page_data)}") from page_data
+                
+                data = page_data['data']
+                
+                if dedupe_key:
+                    unique = []
+                    for record in data:
+                        key = record.get(dedupe_key)
+                        if key is None:
+                            unique.append(record)
+                        elif key not in seen:
+                            seen.add(key)
+                            unique.append(record)
+                    data = unique
                 
-                if not response:
-                    logger.warning(f"No response received for page {page_count + 1}")
-                    break
-                    
-                # Handle both formats: 'data' array or 'column-names'/'rows' format
-                if 'data' in response:
-                    data = response.get('data', [])
-                elif 'rows' in response and 'column-names' in response:
-                    # Convert column-names/rows format to data array
-                    columns = response['column-names']
-                    rows = response['rows']
-                    data = [dict(zip(columns, row)) for row in rows]
-                else:
-                    data = []
                 if not data:
-                    logger.info(f"No more data available after {page_count} pages")
-                    break
+                    continue
                 
                 page_count += 1
                 total_records += len(data)
                 
-                logger.info(f"Page {page_count}: Retrieved {len(data)} records "
-                           f"(total: {total_records})")
-                
                 yield {
                     'data': data,
                     'page': page_count,
                     'page_size': len(data),
                     'total_retrieved': total_records
                 }
-                
-                search_after = response.get('next-search-after')
-                if not search_after:
-                    logger.info(f"Pagination complete: {total_records} total records")
-                    break
-                    
-                time.sleep(0.1)
-                
-            except Exception as e:
-                logger.error(f"Error on page {page_count + 1}: {str(e)}")
-                break
+            
+            logger.info(f"Sharded pagination complete: {total_records} unique records "
+                       f"from {page_count} pages")
+        finally:
+            stop.set()
+            executor.shutdown(wait=False)
     
     def _make_request(self, endpoint: str, params: Dict) -> Optional[Dict]:
+        """Return the decoded response, or ``None`` when there is nothing to read.
+        
+        Raises ``PaginationError`` for any other failure once retries are spent.
+        """
         url = f"{self.base_url}/{endpoint}"
         
         for attempt in range(Config.RETRY_ATTEMPTS):
             try:
-                response = self.session.get(
+                response = self.rate_limiter.get(
+                    self.session,
                     url,
                     params=params,
                     timeout=Config.REQUEST_TIMEOUT
                 )
                 
                 if response.status_code == 200:
-                    return response.json()
+                    # The API answers a search with no matches with an empty body
+                    if not response.content.strip():
+                        return None
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise PaginationError(f"Malformed response from {endpoint}: "
+                                              f"{str(e)}") from e
+                elif response.status_code == 404:
+                    return None
                 elif response.status_code == 429:
-                    wait_time = (attempt + 1) * Config.RETRY_DELAY
-                    logger.warning(f"Rate limited, waiting {wait_time}s before retry")
-                    time.sleep(wait_time)
+                    # The limiter has already slowed down; without a Retry-After
+                    # header fall back to a linear backoff for every caller.
+                    if 'Retry-After' not in response.headers:
+                        self.rate_limiter.pause((attempt + 1) * Config.RETRY_DELAY)
+                    logger.warning(f"Rate limited, retrying at "
+                                   f"{self.rate_limiter.current_rate:.2f} req/s")
                     continue
                 else:
                     logger.error(f"API error {response.status_code}: {response.text}")
-                    return None
+                    raise PaginationError(f"API error {response.status_code} for {endpoint}")
                     
             except requests.RequestException as e:
                 if attempt < Config.RETRY_ATTEMPTS - 1:
@@ -99,6 +242,7 @@ class SearchAfterPaginator:
                     time.sleep(wait_time)
                 else:
                     logger.error(f"Request failed after {Config.RETRY_ATTEMPTS} attempts: {str(e)}")
-                    return None
+                    raise PaginationError(str(e)) from e
         
-        return None
\ No newline at end of file
+        raise PaginationError(f"Still rate limited after {Config.RETRY_ATTEMPTS} attempts "
+                              f"for {endpoint}")
\ No newline at end of file
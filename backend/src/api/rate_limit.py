@@ -0,0 +1,167 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import logging
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate follows the server's behaviour.
+    
+    Successful, fast responses raise the rate additively; 429s halve it and
+    honour ``Retry-After`` by pausing every caller, and slow responses ease
+    it back gently (AIMD).
+    """
+    
+    def __init__(self, rate: Optional[float] = None,
+                 min_rate: Optional[float] = None,
+                 max_rate: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 latency_target: Optional[float] = None):
+        self.min_rate = min_rate or Config.RATE_LIMIT_MIN
+        self.max_rate = max_rate or Config.RATE_LIMIT_MAX
+        self.capacity = burst or Config.RATE_LIMIT_BURST
+        self.latency_target = latency_target or Config.RATE_LIMIT_LATENCY_TARGET
+        
+        self._rate = min(max(rate or Config.RATE_LIMIT_INITIAL, self.min_rate), self.max_rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = 0
+        self._requests = 0
+        self._throttled = 0
+        self._condition = threading.Condition()
+    
+    @property
+    def current_rate(self) -> float:
+        return self._rate
+    
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+    
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                'rate': round(self._rate, 3),
+                'queue_depth': self._waiting,
+                'tokens': round(self._tokens, 3),
+                'requests': self._requests,
+                'throttled': self._throttled,
+                'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 3)
+            }
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+    
+    def acquire(self):
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    
+                    if now < self._paused_until:
+                        wait_time = self._paused_until - now
+                    elif self._tokens >= 1:
+                        self._tokens -= 1
+                        self._requests += 1
+                        return
+                    else:
+                        wait_time = (1 - self._tokens) / self._rate
+                    
+                    self._condition.wait(wait_time)
+            finally:
+                self._waiting -= 1
+    
+    def try_acquire(self) -> float:
+        """Take a token if one is free; otherwise return the seconds to wait.
+        
+        Lets non-blocking callers such as the asyncio client wait with their
+        own sleep instead of parking a thread in ``acquire``.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._requests += 1
+                return 0.0
+            return (1 - self._tokens) / self._rate
+    
+    def pause(self, seconds: float):
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+    
+    def record_response(self, status_code: int, latency: float,
+                        retry_after: Optional[float] = None):
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            
+            if status_code == 429:
+                self._throttled += 1
+                self._rate = max(self.min_rate, self._rate * 0.5)
+                self._tokens = 0
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                logger.warning(f"Rate limited by server, reducing rate to {self._rate:.2f} req/s")
+            elif status_code < 500:
+                if latency > self.latency_target:
+                    self._rate = max(self.min_rate, self._rate * 0.9)
+                else:
+                    self._rate = min(self.max_rate, self._rate + Config.RATE_LIMIT_INCREASE)
+            
+            self._condition.notify_all()
+    
+    def get(self, http, url: str, **kwargs):
+        """Issue ``http.get`` (a session or the requests module) under the limiter."""
+        self.acquire()
+        started = time.monotonic()
+        response = http.get(url, **kwargs)
+        
+        self.record_response(
+            response.status_code,
+            time.monotonic() - started,
+            parse_retry_after(response.headers.get('Retry-After'))
+        )
+        
+        return response
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    global _rate_limiter
+    
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = AdaptiveRateLimiter()
+        return _rate_limiter
@@ -1,12 +1,15 @@
 import click
 import logging
 import sys
+from datetime import datetime
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.api.client import EPCClient
+from src.api.pagination import year_window_shards
 from src.data.database import EPCDatabase
+from src.data.search_cache import SearchCache
 from src.export.csv import CSVExporter
 from config.settings import Config
 
@@ -38,10 +41,21 @@ def test():
 @click.option('--local-authority', help='Local authority name (e.g., Surrey)')
 @click.option('--property-type', type=click.Choice(['domestic', 'non-domestic']), default='domestic')
 @click.option('--agricultural', is_flag=True, help='Search for agricultural buildings only')
-@click.option('--export', type=click.Choice(['csv', 'geojson']), default='csv')
+@click.option('--export', type=click.Choice(['csv', 'parquet', 'geojson', 'geojsonseq', 'mbtiles', 'grid']),
+              default='csv',
+              help='geojsonseq writes newline-delimited GeoJSON; mbtiles writes vector tiles; '
+                   'grid writes hexagon summaries at several resolutions')
+@click.option('--partition-by', type=click.Choice(['local-authority', 'lodgement-year']),
+              help='Split a Parquet export into one file per value')
+@click.option('--compress', type=click.Choice(['gzip', 'zstd']), help='Compress a CSV export')
+@click.option('--max-part-mb', type=int,
+              help='Split a CSV export into part files of about this many MB')
 @click.option('--filename', help='Output filename (without extension)')
-@click.option('--use-cache', is_flag=True, default=True, help='Use cached data when available')
-def search(postcode, local_authority, property_type, agricultural, export, filename, use_cache):
+@click.option('--use-cache/--no-cache', default=True, help='Use cached data when available')
+@click.option('--workers', type=int, default=1,
+              help='Fetch lodgement-year shards in parallel with this many workers')
+def search(postcode, local_authority, property_type, agricultural, export, partition_by, compress,
+           max_part_mb, filename, use_cache, workers):
     """Search for EPC certificates"""
     
     if not postcode and not local_authority:
@@ -49,63 +63,137 @@ def search(postcode, local_authority, property_type, agricultural, export, filen
         sys.exit(1)
     
     try:
-        client = EPCClient()
         db = EPCDatabase()
+        client = EPCClient(search_cache=SearchCache(db) if use_cache else None)
         
         if agricultural:
             if property_type == 'domestic':
                 property_type = 'non-domestic'
-            data = client.search_agricultural_buildings(
+            filters = client.agricultural_filters(
                 local_authority=local_authority,
                 postcode=postcode
             )
         elif postcode:
-            data = client.search_by_postcode(postcode, property_type)
+            filters = {'postcode': postcode}
         elif local_authority:
-            data = client.search_by_local_authority(local_authority, property_type)
+            filters = {'local-authority': local_authority}
         
-        if data.empty:
-            click.echo("❌ No records found")
-            return
+        endpoint = f'{property_type}/search'
+        area_name = local_authority or postcode or "unknown"
         
-        if use_cache:
-            db.store_certificates(data, property_type)
+        shards = None
+        if workers > 1:
+            shards = year_window_shards(filters, Config.EPC_FIRST_YEAR, datetime.now().year)
         
-        click.echo(f"✅ Found {len(data)} records")
+        # Stream pages straight through the cache and into the export so
+        # memory stays flat regardless of how many records come back.
+        counter = {'records': 0}
+        
+        def counted_frames():
+            for frame in client.iter_frames(endpoint, filters, shards=shards,
+                                            max_workers=workers):
+                counter['records'] += len(frame)
+                yield frame
         
         if export == 'csv':
             exporter = CSVExporter()
+            max_part_bytes = max_part_mb * 1024 ** 2 if max_part_mb else None
             
-            if not filename:
-                if agricultural:
-                    area_name = local_authority or postcode or "unknown"
-                    filepath = exporter.export_agricultural_summary(data, area_name)
-                else:
-                    filename = f"epc_search_{property_type}"
-                    filepath = exporter.export(data, filename)
+            if not filename and agricultural:
+                filepaths = exporter.export_parts(
+                    counted_frames(),
+                    exporter.agricultural_summary_filename(area_name),
+                    CSVExporter.AGRICULTURAL_SUMMARY_COLUMNS,
+                    compression=compress, max_part_bytes=max_part_bytes
+                )
             else:
-                filepath = exporter.export(data, filename)
+                filepaths = exporter.export_parts(
+                    counted_frames(),
+                    filename or f"epc_search_{property_type}",
+                    compression=compress, max_part_bytes=max_part_bytes
+                )
             
-            if filepath:
+            if not counter['records']:
+                click.echo("❌ No records found")
+                return
+            
+            click.echo(f"✅ Found {counter['records']} records")
+            
+            for filepath in filepaths:
                 click.echo(f"📄 Exported to: {filepath}")
         
-        elif export == 'geojson':
+        elif export == 'parquet':
+            from src.export.parquet import ParquetExporter
+            
+            filepath = ParquetExporter().export_stream(
+                counted_frames(),
+                filename or f"epc_search_{property_type}",
+                partition_by=partition_by
+            )
+            
+            if not counter['records']:
+                click.echo("❌ No records found")
+                return
+            
+            click.echo(f"✅ Found {counter['records']} records")
+            
+            if filepath:
+                click.echo(f"📦 Exported to: {filepath}")
+        
+        elif export in ('geojson', 'geojsonseq'):
             from src.export.geojson import GeoJSONExporter
             
             exporter = GeoJSONExporter()
+            sequence = export == 'geojsonseq'
             
-            if not filename:
-                if agricultural:
-                    area_name = local_authority or postcode or "unknown"
-                    filepath = exporter.export_agricultural_geojson(data, area_name)
-                else:
-                    filename = f"epc_search_{property_type}"
-                    filepath = exporter.export_for_landapp(data, filename)
+            if not filename and agricultural:
+                filepath = exporter.export_agricultural_geojson(
+                    counted_frames(), area_name, sequence=sequence
+                )
             else:
-                filepath = exporter.export_for_landapp(data, filename)
+                filepath = exporter.export_for_landapp(
+                    counted_frames(), filename or f"epc_search_{property_type}",
+                    sequence=sequence
+                )
+            
+            if not counter['records']:
+                click.echo("❌ No records found")
+                return
+            
+            click.echo(f"✅ Found {counter['records']} records")
             
             if filepath:
                 click.echo(f"🗺️  Exported to: {filepath}")
+        
+        elif export in ('mbtiles', 'grid'):
+            import pandas as pd
+            from src.export.geojson import GeoJSONExporter
+            
+            # Clustering and binning need every point at once, so these
+            # paths are not streamed
+            frames = [frame for frame in counted_frames() if not frame.empty]
+            
+            if not frames:
+                click.echo("❌ No records found")
+                return
+            
+            data = pd.concat(frames, ignore_index=True)
+            click.echo(f"✅ Found {len(data)} records")
+            
+            if export == 'grid':
+                filepaths = GeoJSONExporter().export_grid_geojson(
+                    data, filename or f"epc_grid_{property_type}"
+                )
+                for filepath in filepaths:
+                    click.echo(f"🗺️  Exported grid summary to: {filepath}")
+                return
+            
+            filepath = GeoJSONExporter().export_vector_tiles(
+                data, filename or f"epc_tiles_{property_type}"
+            )
+            
+            if filepath:
+                click.echo(f"🗺️  Exported vector tiles to: {filepath}")
     
     except Exception as e:
         click.echo(f"❌ Search failed: {str(e)}")
@@ -157,45 +245,59 @@ def trends(postcode, local_authority, from_year, to_year):
 @click.option('--template', type=click.Choice(['supply-chain', 'agricultural']), required=True)
 @click.option('--uprns', help='Path to CSV file containing UPRNs')
 @click.option('--area', help='Area name for the report')
-def report(template, uprns, area):
+@click.option('--workers', type=int, default=Config.ASYNC_MAX_CONCURRENCY,
+              help='Maximum concurrent API lookups for UPRNs not in the cache')
+@click.option('--restart', is_flag=True, help='Ignore any checkpoint and start the report afresh')
+def report(template, uprns, area, workers, restart):
     """Generate specialized reports"""
     
     try:
-        client = EPCClient()
-        
-        if uprns:
-            import pandas as pd
-            uprn_df = pd.read_csv(uprns)
-            
-            if 'uprn' not in uprn_df.columns:
-                click.echo("❌ UPRN CSV must contain 'uprn' column")
-                sys.exit(1)
-            
-            all_data = []
-            for uprn in uprn_df['uprn']:
-                data = client.search_by_uprn(str(uprn))
-                if not data.empty:
-                    all_data.append(data)
-            
-            if all_data:
-                combined_data = pd.concat(all_data, ignore_index=True)
-            else:
-                click.echo("❌ No data found for provided UPRNs")
-                return
-        else:
+        if not uprns:
             click.echo("❌ --uprns is required for reports")
             sys.exit(1)
         
+        import pandas as pd
+        from src.export.report import UPRNReportPipeline
+        
+        uprn_df = pd.read_csv(uprns, dtype={'uprn': str})
+        
+        if 'uprn' not in uprn_df.columns:
+            click.echo("❌ UPRN CSV must contain 'uprn' column")
+            sys.exit(1)
+        
         exporter = CSVExporter()
         area_name = area or "report"
         
         if template == 'supply-chain':
-            filepath = exporter.export_supply_chain_report(combined_data, area_name)
+            columns = CSVExporter.SUPPLY_CHAIN_COLUMNS
+            filename = exporter.supply_chain_filename(area_name)
         elif template == 'agricultural':
-            filepath = exporter.export_agricultural_summary(combined_data, area_name)
+            columns = CSVExporter.AGRICULTURAL_SUMMARY_COLUMNS
+            filename = exporter.agricultural_summary_filename(area_name)
         
-        if filepath:
-            click.echo(f"✅ {template} report exported to: {filepath}")
+        checkpoint_path = exporter.export_path / f"{Path(uprns).stem}_{template}.checkpoint"
+        if restart and checkpoint_path.exists():
+            checkpoint_path.unlink()
+        
+        pipeline = UPRNReportPipeline(EPCDatabase(), exporter.export_path, workers=workers)
+        filepath, rows, failed = pipeline.run(
+            uprn_df['uprn'].dropna().str.strip(),
+            columns,
+            filename,
+            checkpoint_path
+        )
+        
+        if failed:
+            click.echo(f"⚠️  {failed} UPRN lookups failed; rerun the same command to retry them")
+            click.echo(f"   Partial {template} report so far: {filepath}")
+            return
+        
+        if not rows:
+            Path(filepath).unlink(missing_ok=True)
+            click.echo("❌ No data found for provided UPRNs")
+            return
+        
+        click.echo(f"✅ {template} report exported to: {filepath}")
         
     except Exception as e:
         click.echo(f"❌ Report generation failed: {str(e)}")
@@ -219,6 +321,8 @@ def stats():
         click.echo("By property type:")
         for prop_type, count in stats['by_property_type'].items():
             click.echo(f"  {prop_type}: {count}")
+        click.echo(f"Payload size: {stats['payload_bytes'] / 1024 ** 2:.1f} MB "
+                   f"(file {stats['file_bytes'] / 1024 ** 2:.1f} MB)")
         click.echo(f"Database: {stats['database_path']}")
         
     except Exception as e:
@@ -236,5 +340,42 @@ def cleanup(max_age):
     except Exception as e:
         click.echo(f"❌ Cache cleanup failed: {str(e)}")
 
+@cache.command()
+def compact():
+    """Reclaim space left by cleanup and payload compression"""
+    try:
+        db = EPCDatabase()
+        reclaimed = db.compact()
+        click.echo(f"✅ Compacted cache, reclaimed {reclaimed / 1024 ** 2:.1f} MB")
+        
+    except Exception as e:
+        click.echo(f"❌ Cache compaction failed: {str(e)}")
+
+@cache.command('rebuild-analytics')
+def rebuild_analytics():
+    """Recompute the analytics rollups from the cached certificates"""
+    try:
+        db = EPCDatabase()
+        db.rebuild_analytics()
+        click.echo(f"✅ Rebuilt analytics for {db.get_cache_stats()['total_certificates']} certificates")
+        
+    except Exception as e:
+        click.echo(f"❌ Analytics rebuild failed: {str(e)}")
+
+@cache.command('load-parquet')
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--property-type', type=click.Choice(['domestic', 'non-domestic']), default='domestic')
+def load_parquet(path, property_type):
+    """Load a Parquet export (file or partitioned directory) into the cache"""
+    try:
+        from src.export.parquet import ParquetExporter
+        
+        db = EPCDatabase()
+        stored = db.store_certificate_stream(ParquetExporter.read_frames(path), property_type)
+        click.echo(f"✅ Loaded {stored} certificates from {path}")
+        
+    except Exception as e:
+        click.echo(f"❌ Parquet load failed: {str(e)}")
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
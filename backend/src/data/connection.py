@@ -0,0 +1,160 @@
+import queue
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, TypeVar
+import logging
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class SQLiteConnectionManager:
+    """Per-thread readers and a single queued writer for one SQLite file.
+    
+    Each thread reads through its own autocommit connection, opened once and
+    closed when the thread exits, so connections are never shared across
+    threads. ``close`` also closes any readers still open.
+    All writes run on one dedicated thread in submission order, which
+    removes "database is locked" contention between writers in this
+    process; the busy timeout covers other processes sharing the file.
+    """
+    
+    _managers: Dict[str, 'SQLiteConnectionManager'] = {}
+    _managers_lock = threading.Lock()
+    
+    def __init__(self, db_path: str, busy_timeout: Optional[float] = None):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout or Config.DB_BUSY_TIMEOUT
+        
+        self._local = threading.local()
+        self._readers: Set[sqlite3.Connection] = set()
+        self._readers_lock = threading.Lock()
+        # Bumped by ``close`` so other threads reopen their closed readers
+        self._generation = 0
+        self._writes = queue.Queue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+    
+    @classmethod
+    def for_path(cls, db_path: str) -> 'SQLiteConnectionManager':
+        key = str(Path(db_path).resolve())
+        
+        with cls._managers_lock:
+            if key not in cls._managers:
+                cls._managers[key] = cls(db_path)
+            return cls._managers[key]
+    
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, **kwargs)
+        conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+    
+    @contextmanager
+    def read(self):
+        reader = getattr(self._local, 'reader', None)
+        
+        if reader is None or reader.generation != self._generation:
+            # Only the owning thread uses the connection; it may be closed
+            # from another one once that thread has gone, or by ``close``
+            conn = self._connect(check_same_thread=False)
+            conn.isolation_level = None
+            reader = _Reader(conn, self._generation)
+            
+            with self._readers_lock:
+                self._readers.add(conn)
+            # Thread-local values are released when their thread exits
+            weakref.finalize(reader, self._close_reader, conn)
+            self._local.reader = reader
+        
+        yield reader.connection
+    
+    def _close_reader(self, conn: sqlite3.Connection):
+        with self._readers_lock:
+            if conn not in self._readers:
+                return
+            self._readers.discard(conn)
+        conn.close()
+    
+    def submit(self, func: Callable[[sqlite3.Connection], T]) -> 'Future[T]':
+        """Queue ``func(conn)`` on the writer thread; it is committed on success."""
+        future = Future()
+        self._ensure_writer()
+        self._writes.put((func, future))
+        return future
+    
+    def write(self, func: Callable[[sqlite3.Connection], T]) -> T:
+        if threading.current_thread() is self._writer:
+            return func(self._writer_connection)
+        return self.submit(func).result()
+    
+    def _ensure_writer(self):
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._run_writer,
+                    name=f"sqlite-writer-{Path(self.db_path).name}",
+                    daemon=True
+                )
+                self._writer.start()
+    
+    def _run_writer(self):
+        self._writer_connection = self._connect()
+        conn = self._writer_connection
+        
+        while True:
+            func, future = self._writes.get()
+            
+            if func is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            
+            try:
+                result = func(conn)
+                conn.commit()
+                
+                # A cursor handed back to another thread would be finalised
+                # there while this thread is still using the connection
+                if isinstance(result, sqlite3.Cursor):
+                    result.close()
+                    result = None
+                
+                future.set_result(result)
+            except BaseException as e:
+                conn.rollback()
+                # Fire-and-forget submit() callers never look at the future,
+                # so the traceback is logged here
+                logger.exception(f"Database write failed: {str(e)}")
+                future.set_exception(e)
+        
+        conn.close()
+    
+    def close(self):
+        with self._writer_lock:
+            if self._writer is not None and self._writer.is_alive():
+                self._writes.put((None, None))
+                self._writer.join()
+            self._writer = None
+        
+        with self._readers_lock:
+            readers, self._readers = self._readers, set()
+            self._generation += 1
+        for conn in readers:
+            conn.close()
+        self._local.reader = None
+
+class _Reader:
+    """Holds a thread's reader connection; closed once the thread drops it."""
+    
+    __slots__ = ('connection', 'generation', '__weakref__')
+    
+    def __init__(self, connection: sqlite3.Connection, generation: int):
+        self.connection = connection
+        self.generation = generation
@@ -1,119 +1,473 @@
 import sqlite3
 import pandas as pd
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 import json
 import logging
+import time
+import zlib
+from itertools import compress, repeat
 from pathlib import Path
 
 from config.settings import Config
+from .connection import SQLiteConnectionManager
+from .payload import decode_payload, encode_rows
+from .rollups import (ROLLUP_DIMENSIONS, apply_deltas, apply_matching, certificate_rows,
+                      create_rollup_schema, read_rollups, rebuild_rollups, rollup_deltas)
 
 logger = logging.getLogger(__name__)
 
+# Frequently filtered certificate fields kept as typed, indexed columns next
+# to the JSON payload: (JSON field, column name, SQL type)
+INDEXED_FIELDS = [
+    ('postcode', 'postcode', 'TEXT'),
+    ('local-authority', 'local_authority', 'TEXT'),
+    ('uprn', 'uprn', 'TEXT'),
+    ('current-energy-rating', 'current_energy_rating', 'TEXT'),
+    ('current-energy-efficiency', 'current_energy_efficiency', 'INTEGER'),
+    ('lodgement-date', 'lodgement_date', 'TEXT'),
+    ('property-type', 'building_type', 'TEXT'),
+]
+
+SCHEMA_VERSION = 5
+
 class EPCDatabase:
     def __init__(self, db_path: Optional[str] = None):
         self.db_path = db_path or Config.DATABASE_PATH
         self.ensure_database_exists()
+        self.connections = SQLiteConnectionManager.for_path(self.db_path)
         self._create_tables()
     
+    @staticmethod
+    def _cutoff(max_age: timedelta) -> str:
+        # Match SQLite's CURRENT_TIMESTAMP format (UTC, space separated) so
+        # the text comparison against cached_at is chronological
+        return (datetime.utcnow() - max_age).strftime('%Y-%m-%d %H:%M:%S')
+    
     def ensure_database_exists(self):
         db_dir = Path(self.db_path).parent
         db_dir.mkdir(parents=True, exist_ok=True)
     
     def _create_tables(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS epc_certificates (
-                    certificate_id TEXT PRIMARY KEY,
-                    property_type TEXT NOT NULL,
-                    data JSON NOT NULL,
-                    cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+        self.connections.write(self._create_schema)
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        cursor = conn.cursor()
+        
+        # WAL lets readers continue while bulk ingestion is writing
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS epc_certificates (
+                certificate_id TEXT PRIMARY KEY,
+                property_type TEXT NOT NULL,
+                data JSON NOT NULL,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache (
+                search_hash TEXT PRIMARY KEY,
+                search_params JSON NOT NULL,
+                result_count INTEGER,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS search_cache_members (
+                search_hash TEXT NOT NULL,
+                certificate_id TEXT NOT NULL,
+                PRIMARY KEY (search_hash, certificate_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # A generation counter bumped in the same transaction as every
+        # change to the cached certificates, for HTTP validators
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute("INSERT OR IGNORE INTO cache_meta (key, value) VALUES ('generation', 0)")
+        
+        # Every field ever stored per property type, in first-seen order, so
+        # frames read back keep columns that are null in all returned rows
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS certificate_columns (
+                property_type TEXT NOT NULL,
+                name TEXT NOT NULL,
+                UNIQUE (property_type, name)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_cached_at 
+            ON epc_certificates(cached_at)
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_property_type 
+            ON epc_certificates(property_type)
+        ''')
+        
+        create_rollup_schema(conn)
+        self._migrate(conn)
+        
+        for _, column, _ in INDEXED_FIELDS:
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_{column} 
+                ON epc_certificates({column})
             ''')
+    
+    def _migrate(self, conn: sqlite3.Connection):
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        
+        if version < 2:
+            self._migrate_indexed_columns(conn)
+        if version < 3:
+            self._migrate_compressed_payloads(conn)
+        if version < 4:
+            if version >= 2:
+                # building_type joined the indexed columns in version 4
+                self._migrate_indexed_columns(conn)
+            rebuild_rollups(conn)
+        if version < 5:
+            self._migrate_known_columns(conn)
+        
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    
+    def _migrate_indexed_columns(self, conn: sqlite3.Connection):
+        existing = {row[1] for row in conn.execute('PRAGMA table_info(epc_certificates)')}
+        
+        for _, column, sql_type in INDEXED_FIELDS:
+            if column not in existing:
+                conn.execute(f'ALTER TABLE epc_certificates ADD COLUMN {column} {sql_type}')
+        
+        # Backfill in Python rather than with json_extract: payloads written by
+        # older versions contain NaN tokens that SQLite's JSON parser rejects
+        assignments = ', '.join(f'{column} = ?' for _, column, _ in INDEXED_FIELDS)
+        last_rowid = 0
+        migrated = 0
+        
+        while True:
+            rows = conn.execute('''
+                SELECT rowid, data FROM epc_certificates 
+                WHERE rowid > ? ORDER BY rowid LIMIT ?
+            ''', (last_rowid, Config.DB_WRITE_BATCH_ROWS)).fetchall()
             
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS search_cache (
-                    search_hash TEXT PRIMARY KEY,
-                    search_params JSON NOT NULL,
-                    result_count INTEGER,
-                    cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            if not rows:
+                break
             
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_cached_at 
-                ON epc_certificates(cached_at)
-            ''')
+            rowids = [row[0] for row in rows]
+            records = [self._decode(row[1]) or {} for row in rows]
             
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_property_type 
-                ON epc_certificates(property_type)
-            ''')
+            values = self._indexed_values(pd.DataFrame(records, index=rowids))
+            conn.executemany(
+                f'UPDATE epc_certificates SET {assignments} WHERE rowid = ?',
+                zip(*values, rowids)
+            )
             
-            conn.commit()
+            migrated += len(rows)
+            last_rowid = rowids[-1]
+        
+        if migrated:
+            logger.info(f"Migrated {migrated} cached certificates to indexed columns")
+    
+    def _migrate_compressed_payloads(self, conn: sqlite3.Connection):
+        # Re-encode plain JSON payloads; the space is only returned to the
+        # filesystem by ``compact``
+        last_rowid = 0
+        migrated = 0
+        
+        while True:
+            rows = conn.execute('''
+                SELECT rowid, data FROM epc_certificates 
+                WHERE rowid > ? AND typeof(data) = 'text' ORDER BY rowid LIMIT ?
+            ''', (last_rowid, Config.DB_WRITE_BATCH_ROWS)).fetchall()
+            
+            if not rows:
+                break
+            
+            rowids = [row[0] for row in rows]
+            records = [self._decode(row[1]) or {} for row in rows]
+            conn.executemany(
+                'UPDATE epc_certificates SET data = ? WHERE rowid = ?',
+                zip(encode_rows(pd.DataFrame(records)), rowids)
+            )
+            
+            migrated += len(rows)
+            last_rowid = rowids[-1]
+        
+        if migrated:
+            logger.info(f"Compressed {migrated} cached certificate payloads")
+    
+    def _migrate_known_columns(self, conn: sqlite3.Connection):
+        # Version 1 payloads dropped null fields, so a column null in every
+        # cached row cannot be recovered; the rest are collected from keys
+        last_rowid = 0
+        
+        while True:
+            rows = conn.execute('''
+                SELECT rowid, data, property_type FROM epc_certificates 
+                WHERE rowid > ? ORDER BY rowid LIMIT ?
+            ''', (last_rowid, Config.DB_WRITE_BATCH_ROWS)).fetchall()
+            
+            if not rows:
+                break
+            
+            columns = {}
+            for _, payload, property_type in rows:
+                columns.setdefault(property_type, {}).update(
+                    dict.fromkeys(self._decode(payload) or {}))
+            
+            for property_type, names in columns.items():
+                self._record_columns(conn, property_type, names)
+            
+            last_rowid = rows[-1][0]
+    
+    @staticmethod
+    def _bump_generation(conn: sqlite3.Connection):
+        conn.execute("UPDATE cache_meta SET value = value + 1 WHERE key = 'generation'")
+    
+    @staticmethod
+    def _record_columns(conn: sqlite3.Connection, property_type: str, names: Iterable[str]):
+        conn.executemany('''
+            INSERT OR IGNORE INTO certificate_columns (property_type, name) VALUES (?, ?)
+        ''', ((property_type, name) for name in names))
+    
+    @staticmethod
+    def _known_columns(conn: sqlite3.Connection, property_type: str) -> List[str]:
+        return [row[0] for row in conn.execute('''
+            SELECT name FROM certificate_columns WHERE property_type = ? ORDER BY rowid
+        ''', (property_type,))]
     
-    def store_certificates(self, data: pd.DataFrame, property_type: str):
+    def _frame(self, conn: sqlite3.Connection, records: List[Dict],
+               property_type: str) -> pd.DataFrame:
+        # Keep the columns callers would have seen from the API, whatever
+        # the payloads themselves carry
+        data = pd.DataFrame(records)
+        columns = self._known_columns(conn, property_type)
+        known = set(columns)
+        extra = [column for column in data.columns if column not in known]
+        return data.reindex(columns=columns + extra)
+    
+    @staticmethod
+    def _decode(payload) -> Optional[Dict]:
+        try:
+            return decode_payload(payload)
+        except (ValueError, zlib.error) as e:
+            logger.warning(f"Skipping unreadable cached payload: {str(e)}")
+            return None
+    
+    def _decode_rows(self, rows: List[tuple]) -> List[Dict]:
+        records = (self._decode(row[0]) for row in rows)
+        return [record for record in records if record is not None]
+    
+    @staticmethod
+    def _indexed_values(rows: pd.DataFrame) -> List[list]:
+        values = []
+        
+        for field, _, sql_type in INDEXED_FIELDS:
+            if field not in rows.columns:
+                values.append([None] * len(rows))
+                continue
+            
+            column = rows[field]
+            
+            if sql_type == 'INTEGER':
+                column = pd.to_numeric(column, errors='coerce').round().astype('Int64')
+            else:
+                if pd.api.types.is_float_dtype(column):
+                    # Numeric UPRNs read back as floats must not gain a ".0"
+                    column = column.round().astype('Int64')
+                column = column.astype('string').str.strip().replace('', pd.NA)
+            
+            values.append(column.astype(object).where(column.notna(), None).tolist())
+        
+        return values
+    
+    def store_certificates(self, data: pd.DataFrame, property_type: str) -> int:
         if data.empty:
             logger.warning("No data to store")
-            return
+            return 0
+        
+        started = time.perf_counter()
+        # Rows are selected by label below; a caller's duplicated index
+        # (e.g. concat without ignore_index) would pull in extra rows
+        data = data.reset_index(drop=True)
+        certificate_ids = self.certificate_ids(data)
         
+        if certificate_ids.empty:
+            logger.warning("No certificate IDs found in data, nothing stored")
+            return 0
+        
+        rows = data.loc[certificate_ids.index]
+        batch_rows = Config.DB_WRITE_BATCH_ROWS
+        columns = ', '.join(column for _, column, _ in INDEXED_FIELDS)
+        placeholders = ', '.join('?' * len(INDEXED_FIELDS))
         records_stored = 0
         
-        with sqlite3.connect(self.db_path) as conn:
-            for _, row in data.iterrows():
-                try:
-                    certificate_id = row.get('lmk-key') or row.get('building-reference-number')
-                    
-                    if not certificate_id:
-                        continue
-                    
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO epc_certificates 
-                        (certificate_id, property_type, data, cached_at, last_accessed)
-                        VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                    ''', (
-                        certificate_id,
-                        property_type,
-                        json.dumps(row.to_dict())
-                    ))
-                    
-                    records_stored += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error storing certificate: {str(e)}")
-                    continue
+        sql = f'''
+            INSERT OR REPLACE INTO epc_certificates 
+            (certificate_id, property_type, data, {columns}, cached_at, last_accessed)
+            VALUES (?, ?, ?, {placeholders}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        '''
+        pending = []
+        
+        for start in range(0, len(rows), batch_rows):
+            batch_ids = certificate_ids.iloc[start:start + batch_rows]
+            batch = rows.iloc[start:start + batch_rows]
+            payloads = encode_rows(batch)
+            indexed = self._indexed_values(batch)
+            params = list(zip(batch_ids, repeat(property_type), payloads, *indexed))
+            added = rollup_deltas(self._rollup_rows(batch_ids, property_type, payloads, indexed))
             
-            conn.commit()
+            def write(conn: sqlite3.Connection, params=params, batch_ids=batch_ids.tolist(),
+                      added=added, fields=list(rows.columns)):
+                # Rollups move in the same transaction: certificates being
+                # replaced are taken out, then the batch's own rows added
+                replaced = certificate_rows(conn, batch_ids)
+                conn.executemany(sql, params)
+                self._record_columns(conn, property_type, fields)
+                self._bump_generation(conn)
+                if replaced:
+                    apply_deltas(conn, rollup_deltas(replaced, sign=-1))
+                apply_deltas(conn, added)
+            
+            # Each batch is one transaction on the writer thread, so the next
+            # batch is serialised here while the previous one is being written
+            pending.append(self.connections.submit(write))
+            records_stored += len(batch_ids)
+        
+        for future in pending:
+            future.result()
         
-        logger.info(f"Stored {records_stored} certificates in cache")
+        elapsed = time.perf_counter() - started
+        rate = records_stored / elapsed if elapsed > 0 else float(records_stored)
+        logger.info(f"Stored {records_stored} certificates in cache "
+                   f"({elapsed:.2f}s, {rate:,.0f} rows/s)")
+        return records_stored
+    
+    @staticmethod
+    def _rollup_rows(certificate_ids: pd.Series, property_type: str, payloads: List[bytes],
+                     indexed: List[list]) -> Iterator[tuple]:
+        """``ROLLUP_COLUMNS`` for a batch about to be written. A certificate
+        repeated within the batch only counts in its last, stored form."""
+        columns = dict(zip((column for _, column, _ in INDEXED_FIELDS), indexed))
+        rows = zip(repeat(property_type), columns['local_authority'],
+                   columns['current_energy_rating'], columns['building_type'],
+                   columns['lodgement_date'], columns['current_energy_efficiency'],
+                   map(len, payloads))
+        return compress(rows, ~certificate_ids.duplicated(keep='last').to_numpy())
+    
+    def store_certificate_stream(self, frames: Iterable[pd.DataFrame],
+                                 property_type: str) -> int:
+        records_stored = 0
+        
+        for frame in frames:
+            records_stored += self.store_certificates(frame, property_type)
+        
+        return records_stored
+    
+    @staticmethod
+    def certificate_ids(data: pd.DataFrame) -> pd.Series:
+        ids = pd.Series(None, index=data.index, dtype=object)
+        
+        for column in ('building-reference-number', 'lmk-key'):
+            if column in data.columns:
+                ids = data[column].where(data[column].notna() & (data[column] != ''), ids)
+        
+        return ids.dropna().astype(str)
+    
+    def record_search_members(self, search_hash: str, certificate_ids: Iterable[str]):
+        def write(conn: sqlite3.Connection):
+            conn.executemany('''
+                INSERT OR IGNORE INTO search_cache_members (search_hash, certificate_id)
+                VALUES (?, ?)
+            ''', ((search_hash, certificate_id) for certificate_id in certificate_ids))
+        
+        self.connections.write(write)
+    
+    def record_search(self, search_hash: str, search_params: Dict):
+        def write(conn: sqlite3.Connection):
+            conn.execute('''
+                INSERT OR REPLACE INTO search_cache 
+                (search_hash, search_params, result_count, cached_at, last_accessed)
+                SELECT ?, ?, COUNT(*), CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+                FROM search_cache_members WHERE search_hash = ?
+            ''', (search_hash, json.dumps(search_params, sort_keys=True), search_hash))
+        
+        self.connections.write(write)
+    
+    def clear_search(self, search_hash: str):
+        def write(conn: sqlite3.Connection):
+            conn.execute('DELETE FROM search_cache WHERE search_hash = ?', (search_hash,))
+            conn.execute('DELETE FROM search_cache_members WHERE search_hash = ?', (search_hash,))
+        
+        self.connections.write(write)
+    
+    def get_search_results(self, search_hash: str, 
+                           max_age_hours: float = 24) -> Optional[pd.DataFrame]:
+        cutoff_time = self._cutoff(timedelta(hours=max_age_hours))
+        
+        with self.connections.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT result_count FROM search_cache 
+                WHERE search_hash = ? AND cached_at > ?
+            ''', (search_hash, cutoff_time))
+            
+            result = cursor.fetchone()
+            if result is None:
+                return None
+            
+            cursor.execute('''
+                SELECT c.data, c.property_type FROM search_cache_members m
+                JOIN epc_certificates c ON c.certificate_id = m.certificate_id
+                WHERE m.search_hash = ?
+            ''', (search_hash,))
+            rows = cursor.fetchall()
+            
+            # Certificates evicted by cleanup leave the search incomplete
+            if len(rows) < result[0]:
+                return None
+            
+            data = self._frame(conn, self._decode_rows(rows), rows[0][1] if rows else '')
+            
+        self.connections.submit(lambda conn: conn.execute('''
+            UPDATE search_cache SET last_accessed = CURRENT_TIMESTAMP 
+            WHERE search_hash = ?
+        ''', (search_hash,)))
+        
+        return data
     
     def get_certificates(self, filters: Dict, property_type: str, 
                         max_age_hours: int = 24) -> pd.DataFrame:
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+        cutoff_time = self._cutoff(timedelta(hours=max_age_hours))
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connections.read() as conn:
             query = '''
                 SELECT data FROM epc_certificates 
                 WHERE property_type = ? AND cached_at > ?
             '''
-            params = [property_type, cutoff_time.isoformat()]
+            params = [property_type, cutoff_time]
             
             if 'postcode' in filters:
-                query += ' AND json_extract(data, "$.postcode") = ?'
+                query += ' AND postcode = ?'
                 params.append(filters['postcode'])
             
             if 'local-authority' in filters:
-                query += ' AND json_extract(data, "$.local-authority") = ?'
+                query += ' AND local_authority = ?'
                 params.append(filters['local-authority'])
             
             if 'uprn' in filters:
-                query += ' AND json_extract(data, "$.uprn") = ?'
-                params.append(filters['uprn'])
+                query += ' AND uprn = ?'
+                params.append(str(filters['uprn']))
             
             cursor = conn.cursor()
             cursor.execute(query, params)
@@ -121,93 +475,178 @@ class EPCDatabase:
             results = cursor.fetchall()
             
             if results:
-                data = []
-                for row in results:
-                    try:
-                        data.append(json.loads(row[0]))
-                    except json.JSONDecodeError:
-                        continue
+                data = self._decode_rows(results)
                 
                 if data:
                     logger.info(f"Retrieved {len(data)} certificates from cache")
-                    return pd.DataFrame(data)
+                    return self._frame(conn, data, property_type)
+        
+        return pd.DataFrame()
+    
+    def get_certificates_by_uprns(self, uprns: List[str], property_type: str,
+                                  max_age_hours: int = 24,
+                                  batch_size: int = 500) -> pd.DataFrame:
+        cutoff_time = self._cutoff(timedelta(hours=max_age_hours))
+        data = []
+        
+        with self.connections.read() as conn:
+            cursor = conn.cursor()
+            
+            for i in range(0, len(uprns), batch_size):
+                batch = [str(uprn) for uprn in uprns[i:i + batch_size]]
+                placeholders = ', '.join('?' * len(batch))
+                
+                cursor.execute(f'''
+                    SELECT data FROM epc_certificates 
+                    WHERE property_type = ? AND cached_at > ?
+                    AND uprn IN ({placeholders})
+                ''', [property_type, cutoff_time] + batch)
+                
+                data.extend(self._decode_rows(cursor.fetchall()))
+            
+            if data:
+                logger.info(f"Retrieved {len(data)} certificates for {len(uprns)} UPRNs from cache")
+                return self._frame(conn, data, property_type)
         
         return pd.DataFrame()
     
     def get_certificate_by_id(self, certificate_id: str, 
                              max_age_hours: int = 24) -> Optional[Dict]:
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+        cutoff_time = self._cutoff(timedelta(hours=max_age_hours))
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self.connections.read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT data FROM epc_certificates 
+                SELECT data, property_type FROM epc_certificates 
                 WHERE certificate_id = ? AND cached_at > ?
-            ''', (certificate_id, cutoff_time.isoformat()))
+            ''', (certificate_id, cutoff_time))
             
             result = cursor.fetchone()
+            record = self._decode(result[0]) if result else None
             
-            if result:
-                cursor.execute('''
-                    UPDATE epc_certificates 
-                    SET last_accessed = CURRENT_TIMESTAMP 
-                    WHERE certificate_id = ?
-                ''', (certificate_id,))
-                conn.commit()
-                
-                try:
-                    return json.loads(result[0])
-                except json.JSONDecodeError:
-                    return None
+            if record is not None:
+                # Payloads drop null fields; restore them as the API returned them
+                record = {**dict.fromkeys(self._known_columns(conn, result[1])), **record}
+            
+        if result:
+            self.connections.submit(lambda conn: conn.execute('''
+                UPDATE epc_certificates 
+                SET last_accessed = CURRENT_TIMESTAMP 
+                WHERE certificate_id = ?
+            ''', (certificate_id,)))
+            
+            return record
         
         return None
     
     def cleanup_old_data(self, max_age_days: int = 30):
-        cutoff_time = datetime.now() - timedelta(days=max_age_days)
+        cutoff_time = self._cutoff(timedelta(days=max_age_days))
         
-        with sqlite3.connect(self.db_path) as conn:
+        def write(conn: sqlite3.Connection):
+            apply_matching(conn, 'last_accessed < ?', (cutoff_time,), sign=-1)
+            
             cursor = conn.cursor()
             cursor.execute('''
                 DELETE FROM epc_certificates 
                 WHERE last_accessed < ?
-            ''', (cutoff_time.isoformat(),))
+            ''', (cutoff_time,))
             
             deleted_count = cursor.rowcount
             
             cursor.execute('''
                 DELETE FROM search_cache 
                 WHERE last_accessed < ?
-            ''', (cutoff_time.isoformat(),))
+            ''', (cutoff_time,))
             
             deleted_searches = cursor.rowcount
             
-            conn.commit()
+            cursor.execute('''
+                DELETE FROM search_cache_members 
+                WHERE search_hash NOT IN (SELECT search_hash FROM search_cache)
+            ''')
+            
+            if deleted_count:
+                self._bump_generation(conn)
             
             logger.info(f"Cleaned up {deleted_count} certificates and {deleted_searches} searches")
+        
+        self.connections.write(write)
     
     def get_cache_stats(self) -> Dict:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT COUNT(*) FROM epc_certificates')
-            total_certificates = cursor.fetchone()[0]
-            
-            cursor.execute('''
-                SELECT property_type, COUNT(*) 
-                FROM epc_certificates 
+        with self.connections.read() as conn:
+            # Totals come from the rollups rather than scanning the cache
+            totals = conn.execute('''
+                SELECT property_type, SUM(certificates), SUM(payload_bytes)
+                FROM analytics_rollups WHERE dimension = 'total'
                 GROUP BY property_type
-            ''')
-            by_type = dict(cursor.fetchall())
+            ''').fetchall()
             
-            cursor.execute('''
+            # A range over idx_cached_at, so only recent rows are counted
+            recent_certificates = conn.execute('''
                 SELECT COUNT(*) FROM epc_certificates 
                 WHERE cached_at > datetime('now', '-24 hours')
-            ''')
-            recent_certificates = cursor.fetchone()[0]
+            ''').fetchone()[0]
             
             return {
-                'total_certificates': total_certificates,
-                'by_property_type': by_type,
+                'total_certificates': sum(row[1] for row in totals),
+                'by_property_type': {row[0]: row[1] for row in totals},
                 'recent_certificates': recent_certificates,
+                'payload_bytes': sum(row[2] for row in totals),
+                'file_bytes': self.file_size(),
                 'database_path': self.db_path
-            }
\ No newline at end of file
+            }
+    
+    def data_version(self) -> Tuple[str, Optional[str]]:
+        """A token that changes whenever the cached certificates do, and the
+        time (UTC, as stored) of the most recent write."""
+        with self.connections.read() as conn:
+            # cached_at only has one-second resolution, so the generation
+            # counter is what moves on every store and cleanup
+            generation = conn.execute(
+                "SELECT value FROM cache_meta WHERE key = 'generation'").fetchone()[0]
+            latest = conn.execute('SELECT MAX(cached_at) FROM epc_certificates').fetchone()[0]
+        
+        return f"{generation}@{latest or ''}", latest
+    
+    def get_analytics(self, property_type: Optional[str] = None,
+                      local_authority: Optional[str] = None) -> Dict[str, Dict]:
+        """Rollup totals for every dimension, optionally for one property type
+        and local authority, plus certificates per local authority."""
+        with self.connections.read() as conn:
+            analytics = {
+                dimension: read_rollups(conn, dimension, property_type, local_authority)
+                for dimension in ROLLUP_DIMENSIONS
+            }
+            analytics['local-authority'] = read_rollups(conn, 'total', property_type,
+                                                        local_authority, by_local_authority=True)
+            return analytics
+    
+    def rebuild_analytics(self):
+        """Recompute the rollups from the cached certificates."""
+        def write(conn: sqlite3.Connection):
+            rebuild_rollups(conn)
+            self._bump_generation(conn)
+        
+        self.connections.write(write)
+    
+    def file_size(self) -> int:
+        return sum(path.stat().st_size for path in
+                   (Path(self.db_path), Path(f'{self.db_path}-wal'))
+                   if path.exists())
+    
+    def compact(self) -> int:
+        """Checkpoint the WAL and VACUUM; returns the bytes reclaimed."""
+        size_before = self.file_size()
+        
+        def write(conn: sqlite3.Connection):
+            # VACUUM cannot run inside the writer's transaction
+            conn.commit()
+            conn.isolation_level = None
+            try:
+                conn.execute('VACUUM')
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            finally:
+                conn.isolation_level = ''
+        
+        self.connections.write(write)
+        return max(size_before - self.file_size(), 0)
\ No newline at end of file
@@ -0,0 +1,210 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from config.settings import Config
+from .connection import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+Coordinates = Tuple[float, float]
+CacheKey = Tuple[str, str]
+
+def normalise_postcode(postcode: Optional[str]) -> str:
+    if postcode is None:
+        return ''
+    
+    compact = re.sub(r'[^A-Z0-9]', '', str(postcode).upper())
+    if compact in ('NAN', 'NONE'):
+        return ''
+    
+    # Outward and inward codes are separated by one space; the inward code
+    # is always the last three characters
+    return f"{compact[:-3]} {compact[-3:]}" if len(compact) >= 5 else compact
+
+def normalise_address(address: Optional[str]) -> str:
+    if address is None:
+        return ''
+    
+    normalised = re.sub(r'[^a-z0-9]+', ' ', str(address).lower()).strip()
+    return '' if normalised in ('nan', 'none') else normalised
+
+class GeocodeCache:
+    """Geocoding results in SQLite with an in-process LRU in front.
+    
+    Keys are the normalised postcode and address; postcode-only lookups use
+    an empty address. Failed lookups that returned no match are cached as
+    negative results with their own, shorter TTL.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, ttl_days: Optional[float] = None,
+                 negative_ttl_hours: Optional[float] = None, lru_size: Optional[int] = None):
+        self.db_path = db_path or Config.GEOCODE_CACHE_PATH
+        self.ttl = timedelta(days=ttl_days if ttl_days is not None
+                             else Config.GEOCODE_CACHE_TTL_DAYS)
+        self.negative_ttl = timedelta(hours=negative_ttl_hours if negative_ttl_hours is not None
+                                      else Config.GEOCODE_NEGATIVE_TTL_HOURS)
+        self.lru_size = lru_size if lru_size is not None else Config.GEOCODE_LRU_SIZE
+        
+        self._lru = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.connections = SQLiteConnectionManager.for_path(self.db_path)
+        self.connections.write(self._create_schema)
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS geocodes (
+                postcode TEXT NOT NULL,
+                address TEXT NOT NULL,
+                latitude REAL,
+                longitude REAL,
+                provider TEXT,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (postcode, address)
+            ) WITHOUT ROWID
+        ''')
+    
+    @staticmethod
+    def key(postcode: Optional[str], address: Optional[str] = None) -> CacheKey:
+        return (normalise_postcode(postcode), normalise_address(address))
+    
+    @staticmethod
+    def _cutoff(max_age: timedelta) -> str:
+        return (datetime.utcnow() - max_age).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def _remember(self, key: CacheKey, coords: Optional[Coordinates], expires_at: float):
+        with self._lru_lock:
+            self._lru[key] = (coords, expires_at)
+            self._lru.move_to_end(key)
+            
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+    
+    def _expiry(self, coords: Optional[Coordinates]) -> float:
+        ttl = self.ttl if coords is not None else self.negative_ttl
+        return time.time() + ttl.total_seconds()
+    
+    def get(self, key: CacheKey) -> Tuple[bool, Optional[Coordinates]]:
+        """Return ``(found, coords)``; a negative result is ``(True, None)``."""
+        found = self.get_many([key])
+        
+        if key in found:
+            return True, found[key]
+        return False, None
+    
+    def get_many(self, keys: Iterable[CacheKey]) -> Dict[CacheKey, Optional[Coordinates]]:
+        keys = list(keys)
+        found = {}
+        pending = []
+        now = time.time()
+        
+        with self._lru_lock:
+            for key in keys:
+                entry = self._lru.get(key)
+                
+                if entry is not None and entry[1] > now:
+                    self._lru.move_to_end(key)
+                    found[key] = entry[0]
+                else:
+                    pending.append(key)
+        
+        if pending:
+            found.update(self._load(pending))
+        
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+    
+    def _load(self, keys: List[CacheKey], batch_size: int = 400) -> Dict[CacheKey, Optional[Coordinates]]:
+        found = {}
+        positive_cutoff = self._cutoff(self.ttl)
+        negative_cutoff = self._cutoff(self.negative_ttl)
+        
+        with self.connections.read() as conn:
+            for i in range(0, len(keys), batch_size):
+                batch = set(keys[i:i + batch_size])
+                postcodes = list({postcode for postcode, _ in batch})
+                placeholders = ', '.join('?' * len(postcodes))
+                
+                # Seek on the leading primary key column, then keep only the
+                # requested addresses
+                rows = conn.execute(f'''
+                    SELECT postcode, address, latitude, longitude, cached_at FROM geocodes
+                    WHERE postcode IN ({placeholders})
+                    AND cached_at > CASE WHEN latitude IS NULL THEN ? ELSE ? END
+                ''', postcodes + [negative_cutoff, positive_cutoff]).fetchall()
+                
+                for postcode, address, latitude, longitude, cached_at in rows:
+                    if (postcode, address) not in batch:
+                        continue
+                    
+                    coords = (latitude, longitude) if latitude is not None else None
+                    ttl = self.ttl if coords is not None else self.negative_ttl
+                    cached = datetime.strptime(cached_at, '%Y-%m-%d %H:%M:%S')
+                    expires_at = time.time() + (
+                        ttl - (datetime.utcnow() - cached)
+                    ).total_seconds()
+                    
+                    found[(postcode, address)] = coords
+                    self._remember((postcode, address), coords, expires_at)
+        
+        return found
+    
+    def put(self, key: CacheKey, coords: Optional[Coordinates], provider: Optional[str] = None):
+        self.put_many({key: coords}, provider)
+    
+    def put_many(self, results: Dict[CacheKey, Optional[Coordinates]],
+                 provider: Optional[str] = None):
+        if not results:
+            return
+        
+        for key, coords in results.items():
+            self._remember(key, coords, self._expiry(coords))
+        
+        rows = [
+            (postcode, address,
+             coords[0] if coords else None, coords[1] if coords else None, provider)
+            for (postcode, address), coords in results.items()
+        ]
+        
+        self.connections.write(lambda conn: conn.executemany('''
+            INSERT OR REPLACE INTO geocodes
+            (postcode, address, latitude, longitude, provider, cached_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', rows))
+    
+    def cleanup(self):
+        def write(conn: sqlite3.Connection):
+            cursor = conn.execute('''
+                DELETE FROM geocodes
+                WHERE cached_at < CASE WHEN latitude IS NULL THEN ? ELSE ? END
+            ''', (self._cutoff(self.negative_ttl), self._cutoff(self.ttl)))
+            logger.info(f"Cleaned up {cursor.rowcount} expired geocodes")
+        
+        self.connections.write(write)
+    
+    def clear_memory(self):
+        with self._lru_lock:
+            self._lru.clear()
+
+_geocode_cache = None
+_geocode_cache_lock = threading.Lock()
+
+def get_geocode_cache() -> GeocodeCache:
+    global _geocode_cache
+    
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            _geocode_cache = GeocodeCache()
+        return _geocode_cache
@@ -1,131 +1,312 @@
 import requests
+from requests.adapters import HTTPAdapter
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import time
 import logging
 
 from config.settings import Config
+from src.api.rate_limit import AdaptiveRateLimiter
+from .geocode_cache import CacheKey, GeocodeCache, get_geocode_cache, normalise_postcode
+from .postcode_centroids import PostcodeCentroids, get_postcode_centroids
 
 logger = logging.getLogger(__name__)
 
+# Called with (completed, total) as lookups finish
+ProgressCallback = Callable[[int, int], None]
+
+_provider_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_provider_limiters_lock = threading.Lock()
+
+def provider_rate_limiter(provider: str) -> AdaptiveRateLimiter:
+    """One limiter per geocoding provider, shared by every geocoder in the process."""
+    with _provider_limiters_lock:
+        if provider not in _provider_limiters:
+            if provider == 'nominatim':
+                # Nominatim's usage policy allows at most one request a second
+                rate = Config.GEOCODE_NOMINATIM_RATE
+                limiter = AdaptiveRateLimiter(rate=rate, min_rate=rate / 10,
+                                              max_rate=rate, burst=1)
+            else:
+                rate = Config.GEOCODE_OS_PLACES_RATE
+                limiter = AdaptiveRateLimiter(rate=rate, max_rate=rate, burst=rate)
+            _provider_limiters[provider] = limiter
+        return _provider_limiters[provider]
+
 class AddressGeocoder:
-    def __init__(self, use_os_places: bool = True):
+    def __init__(self, use_os_places: bool = True, cache: Optional[GeocodeCache] = None,
+                 use_cache: bool = True, postcode_centroids: Optional[PostcodeCentroids] = None,
+                 use_offline: bool = True):
         self.use_os_places = use_os_places and bool(Config.OS_PLACES_API_KEY)
         self.os_api_key = Config.OS_PLACES_API_KEY
+        self.cache = (cache or get_geocode_cache()) if use_cache else None
+        self.postcode_centroids = (postcode_centroids or get_postcode_centroids()
+                                   if use_offline else None)
+        
+        # Also the fallback when an OS Places request fails
+        self.nominatim = Nominatim(user_agent="epc-tool-geocoder")
+        self.max_workers = Config.GEOCODE_OS_PLACES_WORKERS if self.use_os_places else 1
+        
+        # Pooled keep-alive connections for OS Places, sized to the workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
         
         if not self.use_os_places:
-            self.nominatim = Nominatim(user_agent="epc-tool-geocoder")
             logger.info("Using Nominatim geocoder (OS Places API key not available)")
         else:
             logger.info("Using OS Places API for geocoding")
     
+    def cache_key(self, address: str, postcode: str = None) -> CacheKey:
+        # OS Places only searches by postcode, so every address in a postcode
+        # shares one cache entry
+        if self.use_os_places and normalise_postcode(postcode):
+            return GeocodeCache.key(postcode)
+        return GeocodeCache.key(postcode, address)
+    
     def geocode_address(self, address: str, postcode: str = None) -> Optional[Tuple[float, float]]:
-        if self.use_os_places:
-            return self._geocode_with_os_places(address, postcode)
-        else:
-            return self._geocode_with_nominatim(address, postcode)
+        if self.postcode_centroids is not None:
+            coords = self.postcode_centroids.get(postcode)
+            if coords:
+                return coords
+        
+        key = self.cache_key(address, postcode)
+        
+        if self.cache is not None:
+            found, coords = self.cache.get(key)
+            if found:
+                return coords
+        
+        coords, provider = self._fetch(address, postcode)
+        
+        # Only a definite "no match" is cached as negative; errors are retried
+        if self.cache is not None and provider is not None:
+            self.cache.put(key, coords, provider)
+        
+        return coords
     
-    def _geocode_with_os_places(self, address: str, postcode: str = None) -> Optional[Tuple[float, float]]:
-        try:
-            base_url = "https://api.os.uk/search/places/v1/postcode"
-            
-            search_text = postcode if postcode else address
-            
-            params = {
-                'postcode': search_text,
-                'key': self.os_api_key,
-                'output_srs': 'WGS84'
-            }
-            
-            response = requests.get(base_url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data.get('results'):
-                    result = data['results'][0]
-                    if 'DPA' in result:
-                        lat = result['DPA']['LAT']
-                        lng = result['DPA']['LNG']
-                        return (float(lat), float(lng))
-                    elif 'LPI' in result:
-                        lat = result['LPI']['LAT']
-                        lng = result['LPI']['LNG']
-                        return (float(lat), float(lng))
-            
-            logger.warning(f"OS Places API: No results for {search_text}")
-            return None
+    def resolve(self, lookups: Dict[CacheKey, Tuple[str, str]],
+                max_workers: Optional[int] = None,
+                progress: Optional[ProgressCallback] = None,
+                flush_every: int = 500) -> Dict[CacheKey, Optional[Tuple[float, float]]]:
+        """Geocode each distinct key once, from the cache or concurrently over the network.
+        
+        ``lookups`` maps a cache key to a representative ``(address, postcode)``.
+        Results are written to the cache every ``flush_every`` lookups, so an
+        interrupted run keeps what it has resolved.
+        """
+        results = self.cache.get_many(lookups) if self.cache is not None else {}
+        missing = [key for key in lookups if key not in results]
+        
+        if progress:
+            progress(len(results), len(lookups))
+        
+        if not missing:
+            return results
+        
+        logger.info(f"Geocoding {len(missing)} uncached locations "
+                   f"({len(results)} served from cache)")
+        
+        fetched = defaultdict(dict)
+        workers = max_workers or self.max_workers
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._fetch, *lookups[key]): key for key in missing}
             
-        except Exception as e:
-            logger.error(f"OS Places geocoding failed for {address}: {str(e)}")
-            return self._geocode_with_nominatim(address, postcode)
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    key = futures[future]
+                    coords, provider = future.result()
+                    results[key] = coords
+                    
+                    if provider is not None:
+                        fetched[provider][key] = coords
+                    
+                    if done % flush_every == 0:
+                        self._store(fetched)
+                        fetched.clear()
+                    
+                    if progress:
+                        progress(len(results), len(lookups))
+                    if done % 100 == 0:
+                        logger.info(f"Geocoded {done}/{len(missing)} locations")
+            except BaseException:
+                # E.g. a progress callback cancelling the run: drop the queued
+                # lookups rather than waiting for them all
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                self._store(fetched)
+        
+        return results
     
-    def _geocode_with_nominatim(self, address: str, postcode: str = None) -> Optional[Tuple[float, float]]:
+    def _store(self, fetched: Dict[str, Dict[CacheKey, Optional[Tuple[float, float]]]]):
+        if self.cache is not None:
+            for provider, found in fetched.items():
+                self.cache.put_many(found, provider)
+    
+    def _fetch(self, address: str, postcode: str = None) -> Tuple[Optional[Tuple[float, float]], Optional[str]]:
+        """Network lookup; the provider is None when the lookup failed."""
         try:
-            search_address = f"{address}, {postcode}, UK" if postcode else f"{address}, UK"
-            
-            location = self.nominatim.geocode(search_address, timeout=10)
-            
-            if location:
-                return (location.latitude, location.longitude)
-            
-            if postcode and address != postcode:
-                location = self.nominatim.geocode(f"{postcode}, UK", timeout=10)
-                if location:
-                    return (location.latitude, location.longitude)
-            
-            return None
-            
+            return self._lookup(address, postcode)
         except (GeocoderTimedOut, GeocoderServiceError) as e:
             logger.warning(f"Nominatim geocoding failed for {address}: {str(e)}")
-            return None
         except Exception as e:
             logger.error(f"Unexpected geocoding error for {address}: {str(e)}")
-            return None
+        
+        return None, None
+    
+    def _lookup(self, address: str, postcode: str = None) -> Tuple[Optional[Tuple[float, float]], str]:
+        if self.use_os_places:
+            try:
+                return self._with_retries(self._geocode_with_os_places, address, postcode), 'os_places'
+            except Exception as e:
+                logger.error(f"OS Places geocoding failed for {address}: {str(e)}")
+        
+        return self._with_retries(self._geocode_with_nominatim, address, postcode), 'nominatim'
+    
+    @staticmethod
+    def _with_retries(lookup: Callable, address: str, postcode: str = None):
+        for attempt in range(Config.RETRY_ATTEMPTS):
+            try:
+                return lookup(address, postcode)
+            except (requests.RequestException, GeocoderTimedOut, GeocoderServiceError) as e:
+                response = getattr(e, 'response', None)
+                # Client errors other than throttling will not succeed on retry
+                permanent = (response is not None and response.status_code < 500
+                             and response.status_code != 429)
+                
+                if permanent or attempt == Config.RETRY_ATTEMPTS - 1:
+                    raise
+                
+                wait_time = (attempt + 1) * Config.RETRY_DELAY
+                logger.warning(f"Geocoding request failed, retrying in {wait_time}s: {str(e)}")
+                time.sleep(wait_time)
+    
+    def _geocode_with_os_places(self, address: str, postcode: str = None) -> Optional[Tuple[float, float]]:
+        base_url = "https://api.os.uk/search/places/v1/postcode"
+        
+        search_text = postcode if postcode else address
+        
+        params = {
+            'postcode': search_text,
+            'key': self.os_api_key,
+            'output_srs': 'WGS84'
+        }
+        
+        response = provider_rate_limiter('os_places').get(
+            self.session, base_url, params=params, timeout=10
+        )
+        
+        # 400 is how OS Places answers a malformed or unknown postcode
+        if response.status_code not in (400, 404):
+            response.raise_for_status()
+        
+        if response.status_code == 200:
+            data = response.json()
+            
+            if data.get('results'):
+                result = data['results'][0]
+                if 'DPA' in result:
+                    lat = result['DPA']['LAT']
+                    lng = result['DPA']['LNG']
+                    return (float(lat), float(lng))
+                elif 'LPI' in result:
+                    lat = result['LPI']['LAT']
+                    lng = result['LPI']['LNG']
+                    return (float(lat), float(lng))
+        
+        logger.warning(f"OS Places API: No results for {search_text}")
+        return None
+    
+    def _geocode_with_nominatim(self, address: str, postcode: str = None) -> Optional[Tuple[float, float]]:
+        search_address = f"{address}, {postcode}, UK" if postcode else f"{address}, UK"
+        
+        limiter = provider_rate_limiter('nominatim')
+        
+        limiter.acquire()
+        location = self.nominatim.geocode(search_address, timeout=10)
+        
+        if location:
+            return (location.latitude, location.longitude)
+        
+        if postcode and address != postcode:
+            limiter.acquire()
+            location = self.nominatim.geocode(f"{postcode}, UK", timeout=10)
+            if location:
+                return (location.latitude, location.longitude)
+        
+        return None
     
     def geocode_dataframe(self, df: pd.DataFrame, 
                          address_col: str = 'address1',
-                         postcode_col: str = 'postcode') -> pd.DataFrame:
+                         postcode_col: str = 'postcode',
+                         max_workers: Optional[int] = None,
+                         progress: Optional[ProgressCallback] = None) -> pd.DataFrame:
         if df.empty:
             return df
         
         df = df.copy()
-        df['latitude'] = None
-        df['longitude'] = None
-        
         total_rows = len(df)
-        geocoded_count = 0
         
         logger.info(f"Starting geocoding for {total_rows} addresses")
         
-        for idx, row in df.iterrows():
-            address = str(row.get(address_col, ''))
-            postcode = str(row.get(postcode_col, ''))
-            
-            if not address and not postcode:
-                continue
+        addresses = self._text_column(df, address_col)
+        postcodes = self._text_column(df, postcode_col)
+        coords = np.full((total_rows, 2), np.nan)
+        
+        if self.postcode_centroids is not None:
+            coords = self.postcode_centroids.lookup(postcodes)
+            logger.info(f"Resolved {int((~np.isnan(coords[:, 0])).sum())}/{total_rows} "
+                       f"addresses from offline postcode centroids")
+        
+        pending = np.isnan(coords[:, 0]) & ((addresses != '') | (postcodes != '')).to_numpy()
+        
+        if pending.any():
+            # Resolve each distinct location once, however many rows share it,
+            # then join the coordinates back onto every row
+            pairs = pd.DataFrame({'address': addresses[pending].to_numpy(),
+                                  'postcode': postcodes[pending].to_numpy()})
+            unique_pairs = pairs.drop_duplicates().reset_index(drop=True)
+            keys = [self.cache_key(address, postcode)
+                    for address, postcode in unique_pairs.itertuples(index=False)]
             
-            coords = self.geocode_address(address, postcode)
+            lookups = {}
+            for key, pair in zip(keys, unique_pairs.itertuples(index=False)):
+                lookups.setdefault(key, tuple(pair))
             
-            if coords:
-                df.at[idx, 'latitude'] = coords[0]
-                df.at[idx, 'longitude'] = coords[1]
-                geocoded_count += 1
+            logger.info(f"{int(pending.sum())} rows share {len(lookups)} distinct locations")
+            resolved = self.resolve(lookups, max_workers, progress)
             
-            if (idx + 1) % 10 == 0:
-                logger.info(f"Geocoded {idx + 1}/{total_rows} addresses "
-                           f"({geocoded_count} successful)")
+            unique_pairs['latitude'] = [(resolved.get(key) or (np.nan, np.nan))[0] for key in keys]
+            unique_pairs['longitude'] = [(resolved.get(key) or (np.nan, np.nan))[1] for key in keys]
             
-            time.sleep(0.1)
+            merged = pairs.merge(unique_pairs, how='left', on=['address', 'postcode'])
+            coords[pending] = merged[['latitude', 'longitude']].to_numpy(dtype=float)
+        
+        df['latitude'] = coords[:, 0]
+        df['longitude'] = coords[:, 1]
         
+        geocoded_count = int((~np.isnan(coords[:, 0])).sum())
         success_rate = (geocoded_count / total_rows) * 100 if total_rows > 0 else 0
         logger.info(f"Geocoding complete: {geocoded_count}/{total_rows} "
                    f"addresses geocoded ({success_rate:.1f}% success rate)")
         
         return df
     
+    @staticmethod
+    def _text_column(df: pd.DataFrame, column: str) -> pd.Series:
+        if column not in df.columns:
+            return pd.Series('', index=df.index)
+        return df[column].fillna('').astype(str).str.strip()
+    
     def create_address_string(self, row: pd.Series) -> str:
         address_parts = []
         
@@ -139,20 +320,22 @@ class AddressGeocoder:
         return ", ".join(address_parts)
     
     def batch_geocode(self, addresses: List[str], 
-                     batch_size: int = 50) -> List[Optional[Tuple[float, float]]]:
-        results = []
+                     batch_size: int = 50,
+                     max_workers: Optional[int] = None,
+                     progress: Optional[ProgressCallback] = None) -> List[Optional[Tuple[float, float]]]:
+        """Geocode free-text addresses concurrently; results follow the input order.
         
-        for i in range(0, len(addresses), batch_size):
-            batch = addresses[i:i + batch_size]
-            batch_results = []
-            
-            for address in batch:
-                coords = self.geocode_address(address)
-                batch_results.append(coords)
-                time.sleep(0.1)
-            
-            results.extend(batch_results)
-            logger.info(f"Geocoded batch {i//batch_size + 1}, "
-                       f"{len([r for r in batch_results if r])} successful")
+        Repeated addresses are looked up once. ``batch_size`` is how many
+        lookups complete between writes to the geocode cache.
+        """
+        keys = [self.cache_key(address) for address in addresses]
+        lookups = {}
+        for key, address in zip(keys, addresses):
+            lookups.setdefault(key, (address, None))
+        
+        resolved = self.resolve(lookups, max_workers, progress, flush_every=batch_size)
+        results = [resolved.get(key) for key in keys]
         
-        return results
\ No newline at end of file
+        logger.info(f"Geocoded {len(addresses)} addresses, "
+                   f"{len([r for r in results if r])} successful")
+        return results
@@ -0,0 +1,268 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import logging
+
+from config.settings import Config
+from .connection import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+class JobCancelled(Exception):
+    pass
+
+class JobContext:
+    """Handed to a running job for progress reporting and cancellation.
+    
+    Progress is written to the job row at most every
+    ``JOB_PROGRESS_INTERVAL`` seconds, or whenever the stage changes, so
+    per-page and per-lookup callbacks stay cheap.
+    """
+    
+    def __init__(self, queue: 'JobQueue', job_id: str, cancel_event: threading.Event):
+        self.queue = queue
+        self.job_id = job_id
+        self.cancel_event = cancel_event
+        self._stage = None
+        self._last_write = 0.0
+    
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+    
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+    
+    def progress(self, stage: str, completed: int, total: Optional[int] = None,
+                 message: Optional[str] = None):
+        """Record progress; raises ``JobCancelled`` once a cancel is requested."""
+        self.check()
+        
+        now = time.monotonic()
+        if (stage == self._stage and now - self._last_write < Config.JOB_PROGRESS_INTERVAL
+                and completed != total):
+            return
+        
+        self._stage = stage
+        self._last_write = now
+        self.queue._update(self.job_id, stage=stage, completed=completed,
+                           total=total, message=message, wait=False)
+    
+    def page_progress(self, pages: int, records: int):
+        """Progress callback for ``EPCClient`` searches."""
+        self.progress('fetching', records, None, f"{records:,} records from {pages:,} pages")
+    
+    def geocode_progress(self, completed: int, total: int):
+        """Progress callback for ``AddressGeocoder``."""
+        self.progress('geocoding', completed, total, f"Geocoded {completed:,} of {total:,} locations")
+
+JobFunction = Callable[[JobContext, Dict], Optional[Dict]]
+
+class JobQueue:
+    """Long-running web requests run on a local worker pool.
+    
+    Each job type is a registered function taking a ``JobContext`` and the
+    JSON parameters it was submitted with, and returning a JSON result. Job
+    state lives in SQLite, so status survives the request that started it;
+    jobs left queued or running by a previous process are marked failed at
+    startup, since their workers are gone.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, workers: Optional[int] = None,
+                 retention_hours: Optional[float] = None):
+        self.db_path = db_path or Config.JOB_DATABASE_PATH
+        self.retention = timedelta(hours=retention_hours if retention_hours is not None
+                                   else Config.JOB_RETENTION_HOURS)
+        
+        self._functions: Dict[str, JobFunction] = {}
+        self._running: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers or Config.JOB_WORKERS,
+                                            thread_name_prefix='job-worker')
+        
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.connections = SQLiteConnectionManager.for_path(self.db_path)
+        self.connections.write(self._create_schema)
+        self.connections.write(self._recover)
+        self.purge()
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT,
+                stage TEXT,
+                completed INTEGER DEFAULT 0,
+                total INTEGER,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                cancel_requested INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)')
+    
+    def _recover(self, conn: sqlite3.Connection):
+        cursor = conn.execute('''
+            UPDATE jobs SET status = ?, error = 'Interrupted by a restart',
+                   finished_at = CURRENT_TIMESTAMP
+            WHERE status IN (?, ?)
+        ''', (FAILED, QUEUED, RUNNING))
+        
+        if cursor.rowcount:
+            logger.warning(f"Marked {cursor.rowcount} interrupted jobs as failed")
+    
+    def register(self, kind: str, func: JobFunction):
+        self._functions[kind] = func
+    
+    def submit(self, kind: str, params: Optional[Dict] = None) -> str:
+        if kind not in self._functions:
+            raise ValueError(f"Unknown job type '{kind}', expected one of "
+                             f"{', '.join(sorted(self._functions))}")
+        
+        if time.monotonic() - self._last_purge >= Config.JOB_PURGE_INTERVAL:
+            self.purge()
+        
+        job_id = uuid.uuid4().hex
+        params = params or {}
+        
+        self.connections.write(lambda conn: conn.execute(
+            'INSERT INTO jobs (id, kind, status, params) VALUES (?, ?, ?, ?)',
+            (job_id, kind, QUEUED, json.dumps(params))
+        ))
+        
+        cancel_event = threading.Event()
+        with self._lock:
+            future = self._executor.submit(self._run, job_id, kind, params, cancel_event)
+            self._running[job_id] = (future, cancel_event)
+        
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+    
+    def status(self, job_id: str) -> Optional[Dict]:
+        with self.connections.read() as conn:
+            cursor = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+            columns = [column[0] for column in cursor.description]
+        
+        if row is None:
+            return None
+        
+        job = dict(zip(columns, row))
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        job['params'] = json.loads(job['params']) if job['params'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['percent'] = (round(100 * job['completed'] / job['total'], 1)
+                          if job['total'] else None)
+        return job
+    
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; False if the job is unknown or already finished."""
+        job = self.status(job_id)
+        if job is None or job['status'] in FINISHED:
+            return False
+        
+        with self._lock:
+            future, cancel_event = self._running.get(job_id, (None, None))
+        
+        if cancel_event is not None:
+            cancel_event.set()
+        
+        # A job that has not started yet is cancelled outright; a running one
+        # stops at its next progress report
+        if future is not None and future.cancel():
+            # _run never executes, so its entry would otherwise stay behind
+            with self._lock:
+                self._running.pop(job_id, None)
+            self._finish(job_id, CANCELLED)
+        else:
+            self._update(job_id, cancel_requested=1)
+        
+        logger.info(f"Cancellation requested for job {job_id}")
+        return True
+    
+    def purge(self, max_age: Optional[timedelta] = None) -> int:
+        """Delete finished jobs older than the retention period."""
+        self._last_purge = time.monotonic()
+        cutoff = (datetime.utcnow() - (max_age or self.retention)).strftime('%Y-%m-%d %H:%M:%S')
+        placeholders = ', '.join('?' for _ in FINISHED)
+        
+        return self.connections.write(lambda conn: conn.execute(
+            f'DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?',
+            (*FINISHED, cutoff)
+        ).rowcount)
+    
+    def shutdown(self, wait: bool = True):
+        # Queued jobs are cancelled by hand: cancel_futures needs Python 3.9
+        with self._lock:
+            for future, cancel_event in self._running.values():
+                cancel_event.set()
+                future.cancel()
+        self._executor.shutdown(wait=wait)
+    
+    def _run(self, job_id: str, kind: str, params: Dict, cancel_event: threading.Event):
+        context = JobContext(self, job_id, cancel_event)
+        
+        try:
+            context.check()
+            self._update(job_id, status=RUNNING, started_at=self._now())
+            
+            result = self._functions[kind](context, params)
+            context.check()
+            self._finish(job_id, COMPLETED, result=result)
+            logger.info(f"{kind} job {job_id} completed")
+        
+        except JobCancelled:
+            self._finish(job_id, CANCELLED)
+            logger.info(f"{kind} job {job_id} cancelled")
+        
+        except Exception as e:
+            self._finish(job_id, FAILED, error=str(e))
+            logger.error(f"{kind} job {job_id} failed: {str(e)}")
+        
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+    
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None,
+                error: Optional[str] = None):
+        self._update(job_id, status=status, finished_at=self._now(),
+                     result=json.dumps(result) if result is not None else None, error=error)
+    
+    def _update(self, job_id: str, wait: bool = True, **fields):
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        sql = f'UPDATE jobs SET {assignments} WHERE id = ?'
+        values = (*fields.values(), job_id)
+        
+        write = lambda conn: conn.execute(sql, values)
+        if wait:
+            self.connections.write(write)
+        else:
+            # Progress updates are fire-and-forget on the writer thread
+            self.connections.submit(write)
+    
+    @staticmethod
+    def _now() -> str:
+        return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
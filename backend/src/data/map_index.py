@@ -0,0 +1,227 @@
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+RATINGS = list('ABCDEFG')
+MISSING_RATING = '-'
+
+# West, south, east, north in degrees
+BBox = Tuple[float, float, float, float]
+
+class MapIndex:
+    """Geocoded rows of one result set, ready for viewport queries from the web map.
+    
+    Points are kept sorted by longitude so a bounding box is two binary
+    searches and a latitude mask. Up to ``MAP_CLUSTER_MAX_ZOOM``, or whenever
+    more than ``MAP_MAX_POINTS`` certificates are in view, points are merged
+    into grid clusters of ``MAP_CLUSTER_RADIUS`` screen pixels; the clusters
+    for each zoom are computed over the whole set once and then reused for
+    every viewport at that zoom.
+    """
+    
+    POINT_PROPERTIES = [
+        'address1', 'postcode', 'current-energy-rating', 'current-energy-efficiency',
+        'property-type', 'total-floor-area'
+    ]
+    
+    # Five decimal places is about a metre, finer than any geocoded postcode
+    PRECISION = 5
+    TILE_SIZE = 256
+    
+    def __init__(self, data: pd.DataFrame, cluster_max_zoom: Optional[int] = None,
+                 cluster_radius: Optional[int] = None, max_points: Optional[int] = None):
+        self.cluster_max_zoom = (cluster_max_zoom if cluster_max_zoom is not None
+                                 else Config.MAP_CLUSTER_MAX_ZOOM)
+        self.cluster_radius = cluster_radius or Config.MAP_CLUSTER_RADIUS
+        self.max_points = max_points or Config.MAP_MAX_POINTS
+        self.data = data
+        
+        lat = self._numeric(data, 'latitude')
+        lng = self._numeric(data, 'longitude')
+        valid = ~np.isnan(lat) & ~np.isnan(lng) & (np.abs(lat) < 85.05) & (np.abs(lng) <= 180)
+        
+        rows = np.flatnonzero(valid)
+        self.rows = rows[np.argsort(lng[rows], kind='stable')]
+        self.lat = lat[self.rows]
+        self.lng = lng[self.rows]
+        
+        # Web Mercator position in [0, 1) across the world at zoom 0
+        self.x = (self.lng + 180.0) / 360.0
+        sin_lat = np.sin(np.radians(self.lat))
+        self.y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+        
+        self.rating = np.full(len(self.rows), len(RATINGS), dtype=np.int64)
+        if 'current-energy-rating' in data.columns:
+            ratings = data['current-energy-rating'].iloc[self.rows].astype('string').str.strip().str.upper()
+            codes = pd.Categorical(ratings, categories=RATINGS).codes.astype(np.int64)
+            self.rating = np.where(codes >= 0, codes, len(RATINGS))
+        
+        self.efficiency = self._numeric(data, 'current-energy-efficiency')[self.rows]
+        
+        self.property_types: List[str] = []
+        self.property_type = np.full(len(self.rows), -1, dtype=np.int64)
+        if 'property-type' in data.columns:
+            codes, uniques = pd.factorize(data['property-type'].iloc[self.rows])
+            self.property_type = codes.astype(np.int64)
+            self.property_types = [str(value) for value in uniques]
+        
+        self._clusters: Dict[int, Dict[str, np.ndarray]] = {}
+        self._lock = threading.Lock()
+        
+        logger.info(f"Indexed {len(self.rows)}/{len(data)} geocoded rows for the map")
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    @staticmethod
+    def _numeric(data: pd.DataFrame, column: str) -> np.ndarray:
+        if column not in data.columns:
+            return np.full(len(data), np.nan)
+        return pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=float)
+    
+    def bounds(self) -> Optional[List[List[float]]]:
+        """``[[south, west], [north, east]]`` around every point, as Leaflet takes it."""
+        if not len(self.rows):
+            return None
+        return [[float(self.lat.min()), float(self.lng[0])],
+                [float(self.lat.max()), float(self.lng[-1])]]
+    
+    def query(self, bbox: BBox, zoom: int, packed: bool = False) -> Dict:
+        """Clusters or points inside ``bbox`` at ``zoom``, as GeoJSON or packed arrays.
+        
+        Packed responses hold one array per attribute instead of a feature
+        per point, with ratings as a single string of letters.
+        """
+        in_view = self._in_view(self.lng, self.lat, bbox)
+        clustered = zoom <= self.cluster_max_zoom or len(in_view) > self.max_points
+        
+        if clustered:
+            clusters = self.clusters(zoom)
+            members = self._in_view(clusters['lng'], clusters['lat'], bbox)
+            view = {name: values[members] for name, values in clusters.items()}
+        else:
+            view = {
+                'lng': self.lng[in_view], 'lat': self.lat[in_view],
+                'row': self.rows[in_view], 'rating': self.rating[in_view],
+                'efficiency': self.efficiency[in_view],
+                'type': self.property_type[in_view]
+            }
+        
+        response = {'zoom': zoom, 'clustered': bool(clustered), 'count': int(len(in_view))}
+        if packed:
+            response.update(self._packed(view, clustered))
+        else:
+            response.update(self._geojson(view, clustered))
+        return response
+    
+    def clusters(self, zoom: int) -> Dict[str, np.ndarray]:
+        """Every cluster at ``zoom``, sorted by longitude like the points."""
+        with self._lock:
+            if zoom not in self._clusters:
+                self._clusters[zoom] = self._cluster(zoom)
+            return self._clusters[zoom]
+    
+    def _cluster(self, zoom: int) -> Dict[str, np.ndarray]:
+        cell_size = self.cluster_radius / (self.TILE_SIZE * (1 << zoom))
+        cells_per_row = int(1 / cell_size) + 1
+        cell_ids = (np.floor(self.x / cell_size).astype(np.int64) * cells_per_row
+                    + np.floor(self.y / cell_size).astype(np.int64))
+        
+        _, inverse, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        n_cells = len(counts)
+        
+        # Clusters sit at their members' mean position
+        lng = np.bincount(inverse, weights=self.lng, minlength=n_cells) / counts
+        lat = np.bincount(inverse, weights=self.lat, minlength=n_cells) / counts
+        
+        rating_counts = np.bincount(inverse * (len(RATINGS) + 1) + self.rating,
+                                    minlength=n_cells * (len(RATINGS) + 1))
+        rating_counts = rating_counts.reshape(n_cells, len(RATINGS) + 1)[:, :len(RATINGS)]
+        rating = np.where(rating_counts.any(axis=1), rating_counts.argmax(axis=1), len(RATINGS))
+        
+        has_efficiency = ~np.isnan(self.efficiency)
+        efficiency_sum = np.bincount(inverse, weights=np.where(has_efficiency, self.efficiency, 0),
+                                     minlength=n_cells)
+        efficiency_count = np.bincount(inverse, weights=has_efficiency, minlength=n_cells)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            efficiency = np.where(efficiency_count > 0, efficiency_sum / efficiency_count, np.nan)
+        
+        order = np.argsort(lng, kind='stable')
+        logger.debug(f"Built {n_cells} map clusters at zoom {zoom} from {len(self.rows)} points")
+        return {'lng': lng[order], 'lat': lat[order], 'count': counts[order],
+                'rating': rating[order], 'efficiency': efficiency[order]}
+    
+    @staticmethod
+    def _in_view(lng: np.ndarray, lat: np.ndarray, bbox: BBox) -> np.ndarray:
+        """Positions inside ``bbox``; ``lng`` must be sorted."""
+        west, south, east, north = bbox
+        start = np.searchsorted(lng, west, side='left')
+        end = np.searchsorted(lng, east, side='right')
+        inside = (lat[start:end] >= south) & (lat[start:end] <= north)
+        return start + np.flatnonzero(inside)
+    
+    @classmethod
+    def _coordinates(cls, values: np.ndarray) -> List[float]:
+        return np.round(values, cls.PRECISION).tolist()
+    
+    @staticmethod
+    def _efficiencies(values: np.ndarray) -> List[Optional[float]]:
+        return [None if np.isnan(value) else round(float(value), 1) for value in values]
+    
+    def _packed(self, view: Dict[str, np.ndarray], clustered: bool) -> Dict:
+        packed = {
+            'lng': self._coordinates(view['lng']),
+            'lat': self._coordinates(view['lat']),
+            'rating': ''.join((RATINGS + [MISSING_RATING])[code] for code in view['rating']),
+            'efficiency': self._efficiencies(view['efficiency'])
+        }
+        
+        if clustered:
+            packed['count'] = view['count'].tolist()
+            return {'clusters': packed}
+        
+        # Rows are positions in the result set, so a popup can fetch the
+        # full certificate with one /api/results request
+        packed['row'] = view['row'].tolist()
+        packed['type'] = view['type'].tolist()
+        return {'points': packed, 'property_types': self.property_types}
+    
+    def _geojson(self, view: Dict[str, np.ndarray], clustered: bool) -> Dict:
+        coordinates = zip(self._coordinates(view['lng']), self._coordinates(view['lat']))
+        efficiencies = self._efficiencies(view['efficiency'])
+        
+        if clustered:
+            # Property names match the clusters in vector tile exports
+            properties = [
+                {'cluster': True, 'point_count': int(count),
+                 'current-energy-rating': RATINGS[code] if code < len(RATINGS) else None,
+                 'avg_energy_efficiency': efficiency}
+                for count, code, efficiency in zip(view['count'], view['rating'], efficiencies)
+            ]
+        else:
+            columns = [col for col in self.POINT_PROPERTIES if col in self.data.columns]
+            rows = self.data.iloc[view['row']][columns]
+            rows = rows.astype(object).where(rows.notna(), None)
+            properties = [
+                {'row': int(row), **dict(zip(columns, values))}
+                for row, values in zip(view['row'], rows.itertuples(index=False, name=None))
+            ]
+        
+        return {
+            'type': 'FeatureCollection',
+            'features': [
+                {'type': 'Feature',
+                 'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+                 'properties': feature_properties}
+                for (lng, lat), feature_properties in zip(coordinates, properties)
+            ]
+        }
@@ -0,0 +1,102 @@
+import json
+import re
+import zlib
+import pandas as pd
+from typing import Dict, List, Union
+
+# Cached certificate payloads are stored as a one-byte format marker followed
+# by compact JSON with nulls stripped, deflated against a preset dictionary.
+# Version 2 payloads kept nulls and are only read now. Payloads written
+# before compression are plain JSON text and still decode. Readers restore
+# the stripped fields from the columns recorded for each property type.
+FORMAT_ZLIB_V1 = b'\x01'
+FORMAT_ZLIB_V2 = b'\x02'
+
+# A null field preceded by a comma. Quotes inside JSON strings are always
+# escaped, so ',"' followed by a plain key and ':null' only matches structure
+_NULL_FIELD = re.compile(r',"[^"\\]*":null(?=[,}])')
+
+# Field names and common values from the domestic and non-domestic schemas.
+# zlib favours matches near the end of the dictionary, so the most frequent
+# fragments come last. Never edit this in place: add a new format marker.
+_DICTIONARY_FIELDS = [
+    'building-level', 'main-heating-fuel', 'asset-rating', 'asset-rating-band',
+    'new-build-benchmark', 'existing-stock-benchmark', 'standard-emissions',
+    'target-emissions', 'typical-emissions', 'building-emissions', 'primary-energy-value',
+    'aircon-present', 'aircon-kw-rating', 'ac-inspection-commissioned',
+    'other-fuel-desc', 'renewable-sources', 'special-energy-uses', 'floor-area',
+    'uprn-source', 'low-energy-fixed-light-count', 'fixed-lighting-outlets-count',
+    'tenure', 'lodgement-datetime', 'construction-age-band', 'posttown',
+    'constituency-label', 'local-authority-label', 'address', 'mechanical-ventilation',
+    'solar-water-heating-flag', 'photo-supply', 'floor-height', 'unheated-corridor-length',
+    'heat-loss-corridor', 'wind-turbine-count', 'lighting-env-eff', 'lighting-energy-eff',
+    'lighting-description', 'mainheatc-env-eff', 'mainheatc-energy-eff',
+    'mainheatcont-description', 'mainheat-env-eff', 'mainheat-energy-eff',
+    'mainheat-description', 'roof-env-eff', 'roof-energy-eff', 'roof-description',
+    'sheating-env-eff', 'sheating-energy-eff', 'secondheat-description', 'walls-env-eff',
+    'walls-energy-eff', 'walls-description', 'windows-env-eff', 'windows-energy-eff',
+    'windows-description', 'floor-env-eff', 'floor-energy-eff', 'floor-description',
+    'hot-water-env-eff', 'hot-water-energy-eff', 'hotwater-description',
+    'number-open-fireplaces', 'low-energy-lighting', 'number-heated-rooms',
+    'number-habitable-rooms', 'extension-count', 'glazed-area', 'glazed-type',
+    'multi-glaze-proportion', 'main-heating-controls', 'flat-storey-count',
+    'flat-top-storey', 'floor-level', 'mains-gas-flag', 'energy-tariff', 'main-fuel',
+    'hot-water-cost-potential', 'hot-water-cost-current', 'heating-cost-potential',
+    'heating-cost-current', 'lighting-cost-potential', 'lighting-cost-current',
+    'co2-emissions-potential', 'co2-emiss-curr-per-floor-area', 'co2-emissions-current',
+    'energy-consumption-potential', 'energy-consumption-current',
+    'environment-impact-potential', 'environment-impact-current', 'transaction-type',
+    'county', 'constituency', 'inspection-date', 'lodgement-date', 'total-floor-area',
+    'built-form', 'property-type', 'potential-energy-efficiency',
+    'current-energy-efficiency', 'potential-energy-rating', 'current-energy-rating',
+    'building-reference-number', 'local-authority', 'address3', 'address2', 'address1',
+    'postcode', 'uprn', 'lmk-key',
+]
+
+_DICTIONARY_VALUES = [
+    'NO DATA!', 'Not defined', 'not recorded', 'rental (social)', 'rental (private)',
+    'owner-occupied', 'marketed sale', 'new dwelling', 'Address Matched',
+    'Energy Assessor', 'England and Wales: ', 'double glazing installed during or after 2002',
+    'Fully double glazed', 'Programmer, room thermostat and TRVs',
+    'Boiler and radiators, mains gas', 'mains gas (not community)', 'From main system',
+    'Pitched, ', 'Solid, no insulation (assumed)', 'Cavity wall, filled cavity',
+    'Suspended, no insulation (assumed)', 'Low energy lighting in all fixed outlets',
+    'Semi-Detached', 'Mid-Terrace', 'End-Terrace', 'Detached', 'Bungalow', 'Maisonette',
+    'Flat', 'House', 'Very Good', 'Very Poor', 'Average', 'Good', 'Poor', 'Single',
+    'Standard tariff', 'Unknown', 'natural', 'N/A', 'false', 'true',
+]
+
+ZLIB_DICTIONARY = (
+    ''.join(f'"{value}",' for value in _DICTIONARY_VALUES) +
+    ''.join(f',"{field}":' for field in _DICTIONARY_FIELDS)
+).encode()
+
+def encode_rows(rows: pd.DataFrame, level: int = 6) -> List[bytes]:
+    # to_json serialises the whole batch in C; JSON escapes newlines inside
+    # strings, so splitting on them yields exactly one document per row
+    lines = rows.to_json(orient='records', lines=True, date_format='iso',
+                         force_ascii=False)
+    # Strip nulls from the whole batch in one regex pass rather than
+    # re-parsing each row; a comma after every opening brace lets the first
+    # field match like the rest, and is sliced off again below
+    lines = _NULL_FIELD.sub('', '{,' + lines[1:].replace('\n{', '\n{,'))
+    # Copying a primed compressor skips loading the dictionary for every row
+    primed = zlib.compressobj(level, zdict=ZLIB_DICTIONARY)
+    payloads = []
+    
+    for line in lines.rstrip('\n').split('\n'):
+        compressor = primed.copy()
+        # A row whose fields were all null is left as '{}'
+        body = ('{' + line[2:] if line[1:2] == ',' else line).encode()
+        payloads.append(FORMAT_ZLIB_V1 + compressor.compress(body) + compressor.flush())
+    
+    return payloads
+
+def decode_payload(value: Union[bytes, str]) -> Dict:
+    if isinstance(value, bytes):
+        if value[:1] in (FORMAT_ZLIB_V1, FORMAT_ZLIB_V2):
+            decompressor = zlib.decompressobj(zdict=ZLIB_DICTIONARY)
+            return json.loads(decompressor.decompress(value[1:]) + decompressor.flush())
+        raise ValueError(f"Unknown payload format {value[:1]!r}")
+    
+    return json.loads(value)
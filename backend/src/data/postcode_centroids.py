@@ -0,0 +1,144 @@
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+POSTCODE_COLUMNS = ('pcds', 'pcd', 'pcd2', 'postcode')
+LATITUDE_COLUMNS = ('lat', 'latitude')
+LONGITUDE_COLUMNS = ('long', 'lng', 'longitude')
+
+# Compact UK postcodes (no space) are at most seven characters
+KEY_DTYPE = 'S7'
+
+class PostcodeCentroids:
+    """Offline postcode centroid lookup built from a local CSV.
+    
+    Any postcode file with WGS84 columns works, e.g. the ONS Postcode
+    Directory (pcds, lat, long). The CSV is compiled once into a sorted key
+    array and a coordinate array saved as .npy files beside it; later loads
+    memory-map those and look postcodes up with a binary search.
+    """
+    
+    def __init__(self, keys: np.ndarray, coords: np.ndarray):
+        self.keys = keys
+        self.coords = coords
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    @staticmethod
+    def compact_postcodes(postcodes: Iterable) -> np.ndarray:
+        compact = (pd.Series(postcodes, dtype=object).astype(str).str.upper()
+                   .str.replace(' ', '', regex=False))
+        # Anything too long to be a postcode would otherwise be truncated
+        # into a false match, and non-ASCII text cannot be encoded as a key;
+        # both are misses
+        compact = compact.where(compact.str.fullmatch(r'[A-Z0-9]{5,7}'), '')
+        return compact.to_numpy().astype(KEY_DTYPE)
+    
+    @staticmethod
+    def index_paths(csv_path: Path) -> Tuple[Path, Path]:
+        return (csv_path.with_name(f'{csv_path.stem}.postcodes.npy'),
+                csv_path.with_name(f'{csv_path.stem}.coords.npy'))
+    
+    @classmethod
+    def load(cls, csv_path: str) -> 'PostcodeCentroids':
+        csv_path = Path(csv_path)
+        keys_path, coords_path = cls.index_paths(csv_path)
+        
+        if (keys_path.exists() and coords_path.exists() and
+                keys_path.stat().st_mtime >= csv_path.stat().st_mtime):
+            centroids = cls(np.load(keys_path, mmap_mode='r'),
+                            np.load(coords_path, mmap_mode='r'))
+        else:
+            centroids = cls.from_csv(csv_path)
+            np.save(keys_path, centroids.keys)
+            np.save(coords_path, centroids.coords)
+        
+        logger.info(f"Loaded {len(centroids)} postcode centroids from {csv_path}")
+        return centroids
+    
+    @classmethod
+    def from_csv(cls, csv_path: Path) -> 'PostcodeCentroids':
+        header = pd.read_csv(csv_path, nrows=0).columns
+        
+        def pick(candidates: Tuple[str, ...]) -> str:
+            lowered = {column.lower(): column for column in header}
+            for candidate in candidates:
+                if candidate in lowered:
+                    return lowered[candidate]
+            raise ValueError(f"{csv_path} has no column named any of {', '.join(candidates)}")
+        
+        postcode_col, lat_col, lng_col = (pick(POSTCODE_COLUMNS), pick(LATITUDE_COLUMNS),
+                                          pick(LONGITUDE_COLUMNS))
+        data = pd.read_csv(csv_path, usecols=[postcode_col, lat_col, lng_col],
+                           dtype={postcode_col: str, lat_col: 'float64', lng_col: 'float64'})
+        
+        keys = cls.compact_postcodes(data[postcode_col])
+        coords = data[[lat_col, lng_col]].to_numpy()
+        
+        # ONSPD marks postcodes without a grid reference with lat 99.999999
+        valid = (keys != b'') & (np.abs(coords[:, 0]) <= 90) & (np.abs(coords[:, 1]) <= 180)
+        keys, coords = keys[valid], coords[valid]
+        
+        order = np.argsort(keys, kind='stable')
+        keys, coords = keys[order], coords[order]
+        
+        # Keep the last row for a repeated postcode
+        last = np.append(keys[1:] != keys[:-1], True)
+        return cls(keys[last], coords[last].astype(np.float32))
+    
+    def lookup(self, postcodes: Iterable) -> np.ndarray:
+        """Return an ``(n, 2)`` array of latitude/longitude, NaN where unknown."""
+        # Normalise and search each distinct value once; exports repeat the
+        # same postcode many times
+        codes, uniques = pd.factorize(pd.Series(postcodes, dtype=object))
+        queries = self.compact_postcodes(uniques)
+        unique_coords = np.full((len(queries) + 1, 2), np.nan)
+        
+        if len(self.keys) and len(queries):
+            positions = np.searchsorted(self.keys, queries)
+            positions[positions == len(self.keys)] = 0
+            found = (self.keys[positions] == queries) & (queries != b'')
+            unique_coords[:-1][found] = self.coords[positions[found]]
+        
+        # Missing values are coded -1, which picks the trailing NaN row
+        return unique_coords[codes]
+    
+    def get(self, postcode: Optional[str]) -> Optional[Tuple[float, float]]:
+        if not postcode:
+            return None
+        
+        lat, lng = self.lookup([postcode])[0]
+        if np.isnan(lat):
+            return None
+        return (float(lat), float(lng))
+
+_centroids = None
+_centroids_failed = False
+_centroids_lock = threading.Lock()
+
+def get_postcode_centroids() -> Optional[PostcodeCentroids]:
+    """The configured offline lookup, or None when POSTCODE_CENTROIDS_PATH is unset."""
+    global _centroids, _centroids_failed
+    
+    if not Config.POSTCODE_CENTROIDS_PATH:
+        return None
+    
+    with _centroids_lock:
+        # A file that failed to load is not retried, and logged, on every call
+        if _centroids is None and not _centroids_failed:
+            try:
+                _centroids = PostcodeCentroids.load(Config.POSTCODE_CENTROIDS_PATH)
+            except (OSError, ValueError) as e:
+                logger.error(f"Failed to load postcode centroids, geocoding without "
+                             f"them: {str(e)}")
+                _centroids_failed = True
+        return _centroids
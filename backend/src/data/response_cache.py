@@ -0,0 +1,192 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+import logging
+
+from config.settings import Config
+from .connection import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+class CachedResponse:
+    def __init__(self, body: bytes, etag: str, version: str, last_modified: float,
+                 created_at: Optional[float] = None):
+        self.body = body
+        self.etag = etag
+        self.version = version
+        self.last_modified = last_modified
+        self.created_at = created_at if created_at is not None else time.time()
+    
+    def __len__(self) -> int:
+        return len(self.body)
+
+class ResponseCache:
+    """Serialised JSON responses of the web API, keyed on the normalised request.
+    
+    Entries live in an in-memory LRU bounded by count and size, and, with
+    ``RESPONSE_CACHE_PATH`` set, in SQLite as well so they outlive a restart.
+    Each entry records the certificate cache version it was computed
+    against; once the certificates change it is no longer served.
+    """
+    
+    def __init__(self, ttl_minutes: Optional[float] = None, max_entries: Optional[int] = None,
+                 max_mb: Optional[float] = None, db_path: Optional[str] = None):
+        self.ttl = 60 * (ttl_minutes if ttl_minutes is not None
+                         else Config.RESPONSE_CACHE_TTL_MINUTES)
+        self.max_entries = max_entries if max_entries is not None else Config.RESPONSE_CACHE_MAX_ENTRIES
+        self.max_bytes = int(1024 * 1024 * (max_mb if max_mb is not None
+                                            else Config.RESPONSE_CACHE_MAX_MB))
+        self.db_path = db_path or Config.RESPONSE_CACHE_PATH
+        
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        self.connections = None
+        if self.db_path and self.enabled:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self.connections = SQLiteConnectionManager.for_path(self.db_path)
+            self.connections.write(self._create_schema)
+            self.connections.write(self._purge)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT NOT NULL,
+                version TEXT NOT NULL,
+                last_modified REAL NOT NULL,
+                created_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    
+    def _purge(self, conn: sqlite3.Connection):
+        removed = conn.execute('DELETE FROM responses WHERE created_at < ?',
+                               (time.time() - self.ttl,)).rowcount
+        if removed:
+            logger.info(f"Removed {removed} expired cached responses")
+    
+    @staticmethod
+    def normalise(value: Any) -> Any:
+        """Request values with whitespace collapsed and empty fields dropped."""
+        if isinstance(value, dict):
+            return {str(key).strip(): ResponseCache.normalise(item)
+                    for key, item in sorted(value.items())
+                    if item is not None and item != ''}
+        if isinstance(value, (list, tuple)):
+            return [ResponseCache.normalise(item) for item in value]
+        if isinstance(value, str):
+            return re.sub(r'\s+', ' ', value.strip())
+        return value
+    
+    def key(self, endpoint: str, params: Dict) -> str:
+        payload = json.dumps({'endpoint': endpoint, 'params': self.normalise(params)},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def get(self, key: str, version: str) -> Optional[CachedResponse]:
+        """The entry for ``key`` if it is fresh and computed against ``version``."""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        
+        if entry is None and self.connections is not None:
+            entry = self._load(key)
+            if entry is not None:
+                self._remember(key, entry)
+        
+        if entry is None or entry.version != version or entry.created_at < time.time() - self.ttl:
+            if entry is not None:
+                self.discard(key)
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return entry
+    
+    def put(self, key: str, body: bytes, version: str,
+            last_modified: Optional[float] = None) -> CachedResponse:
+        entry = CachedResponse(body, hashlib.sha256(body).hexdigest()[:32], version,
+                               last_modified if last_modified is not None else time.time())
+        if not self.enabled:
+            return entry
+        
+        self._remember(key, entry)
+        
+        if self.connections is not None:
+            # Written in the background; the response need not wait for it
+            self.connections.submit(lambda conn: conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (key, zlib.compress(body), entry.etag, entry.version,
+                 entry.last_modified, entry.created_at)
+            ))
+        return entry
+    
+    def discard(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= len(entry)
+        
+        if self.connections is not None:
+            self.connections.submit(lambda conn: conn.execute(
+                'DELETE FROM responses WHERE key = ?', (key,)
+            ))
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        
+        if self.connections is not None:
+            self.connections.write(lambda conn: conn.execute('DELETE FROM responses'))
+    
+    def _load(self, key: str) -> Optional[CachedResponse]:
+        with self.connections.read() as conn:
+            row = conn.execute('''
+                SELECT body, etag, version, last_modified, created_at
+                FROM responses WHERE key = ?
+            ''', (key,)).fetchone()
+        
+        if row is None:
+            return None
+        return CachedResponse(zlib.decompress(row[0]), *row[1:])
+    
+    def _remember(self, key: str, entry: CachedResponse):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            
+            self._entries[key] = entry
+            self._bytes += len(entry)
+            
+            # Always keep the newest entry, even if it alone is over the size cap
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or
+                                              self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import pandas as pd
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+class ResultSet:
+    def __init__(self, result_id: str, data: pd.DataFrame, params: Optional[Dict] = None):
+        self.result_id = result_id
+        self.data = data
+        self.params = params or {}
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        # Built by the web map on first use, then reused for every viewport;
+        # the lock keeps concurrent first requests from geocoding twice
+        self.map_index = None
+        self.map_lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self.data)
+
+class ResultStore:
+    """Search results kept in memory between web requests.
+    
+    Clients hold a result ID instead of the rows. Sets idle for longer than
+    the TTL expire, and the least recently used sets are evicted once the
+    number of sets or the total row count goes over its cap.
+    """
+    
+    def __init__(self, ttl_minutes: Optional[float] = None, max_sets: Optional[int] = None,
+                 max_rows: Optional[int] = None):
+        self.ttl = 60 * (ttl_minutes if ttl_minutes is not None else Config.RESULT_SET_TTL_MINUTES)
+        self.max_sets = max_sets if max_sets is not None else Config.RESULT_SET_MAX_SETS
+        self.max_rows = max_rows if max_rows is not None else Config.RESULT_SET_MAX_ROWS
+        
+        self._sets = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+    
+    def put(self, data: pd.DataFrame, params: Optional[Dict] = None) -> str:
+        result_id = uuid.uuid4().hex
+        result = ResultSet(result_id, data.reset_index(drop=True), params)
+        
+        with self._lock:
+            self._sets[result_id] = result
+            self._rows += len(result)
+            self._evict()
+        
+        return result_id
+    
+    def get(self, result_id: str) -> Optional[ResultSet]:
+        with self._lock:
+            self._expire()
+            result = self._sets.get(result_id)
+            
+            if result is not None:
+                result.last_access = time.time()
+                self._sets.move_to_end(result_id)
+            return result
+    
+    def page(self, result_id: str, cursor: Optional[str] = None,
+             limit: Optional[int] = None) -> Optional[Dict]:
+        """One page of rows and the cursor for the next, or None if the set is gone."""
+        result = self.get(result_id)
+        if result is None:
+            return None
+        
+        offset = self.decode_cursor(cursor)
+        limit = min(limit or Config.RESULT_PAGE_SIZE, Config.RESULT_PAGE_MAX)
+        end = min(offset + limit, len(result))
+        
+        return {
+            'result_id': result_id,
+            'total_found': len(result),
+            'data': self.records(result.data.iloc[offset:end]),
+            'next_cursor': self.encode_cursor(end) if end < len(result) else None
+        }
+    
+    def discard(self, result_id: str):
+        with self._lock:
+            result = self._sets.pop(result_id, None)
+            if result is not None:
+                self._rows -= len(result)
+    
+    @staticmethod
+    def encode_cursor(offset: int) -> str:
+        return format(offset, 'x')
+    
+    @staticmethod
+    def decode_cursor(cursor: Optional[str]) -> int:
+        if not cursor:
+            return 0
+        
+        try:
+            offset = int(cursor, 16)
+        except ValueError:
+            raise ValueError(f"Invalid cursor '{cursor}'")
+        
+        if offset < 0:
+            raise ValueError(f"Invalid cursor '{cursor}'")
+        return offset
+    
+    @staticmethod
+    def records(data: pd.DataFrame) -> List[Dict]:
+        """Rows as JSON-safe dicts, with missing values as None rather than NaN."""
+        return data.astype(object).where(data.notna(), None).to_dict('records')
+    
+    def stats(self) -> Tuple[int, int]:
+        with self._lock:
+            self._expire()
+            return len(self._sets), self._rows
+    
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        
+        # Access order is also idle order, so expired sets are at the front
+        while self._sets:
+            result_id, result = next(iter(self._sets.items()))
+            if result.last_access > cutoff:
+                break
+            self._sets.popitem(last=False)
+            self._rows -= len(result)
+            logger.debug(f"Result set {result_id} expired")
+    
+    def _evict(self):
+        self._expire()
+        
+        # Always keep the newest set, even if it alone is over the row cap
+        while len(self._sets) > 1 and (len(self._sets) > self.max_sets or
+                                       self._rows > self.max_rows):
+            result_id, result = self._sets.popitem(last=False)
+            self._rows -= len(result)
+            logger.info(f"Evicted result set {result_id} ({len(result)} rows)")
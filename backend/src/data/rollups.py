@@ -0,0 +1,161 @@
+import sqlite3
+from typing import Dict, Iterable, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Every certificate counts once under each dimension. 'total' has a single
+# value, so counts by local authority and by cache property type (the two
+# key columns) need no dimension of their own.
+ROLLUP_DIMENSIONS = ['total', 'current-energy-rating', 'property-type',
+                     'lodgement-year', 'efficiency-band']
+
+# What a rollup needs from each cached certificate, read from the indexed
+# columns rather than the payload
+ROLLUP_COLUMNS = '''
+    property_type, local_authority, current_energy_rating, building_type,
+    lodgement_date, current_energy_efficiency, length(data)
+'''
+
+MEASURES = ['certificates', 'efficiency_sum', 'efficiency_count', 'payload_bytes']
+
+READ_CHUNK_ROWS = 50000
+
+def create_rollup_schema(conn: sqlite3.Connection):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analytics_rollups (
+            property_type TEXT NOT NULL,
+            local_authority TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            value TEXT NOT NULL,
+            certificates INTEGER NOT NULL,
+            efficiency_sum INTEGER NOT NULL,
+            efficiency_count INTEGER NOT NULL,
+            payload_bytes INTEGER NOT NULL,
+            PRIMARY KEY (property_type, local_authority, dimension, value)
+        ) WITHOUT ROWID
+    ''')
+
+def rollup_deltas(rows: Iterable[tuple], sign: int = 1) -> pd.DataFrame:
+    """Rollup rows for certificates given as ``ROLLUP_COLUMNS`` tuples."""
+    rows = pd.DataFrame(list(rows), columns=['property_type', 'local_authority', 'rating',
+                                             'building_type', 'lodgement_date',
+                                             'efficiency', 'payload_bytes'])
+    if rows.empty:
+        return pd.DataFrame(columns=['property_type', 'local_authority', 'dimension',
+                                     'value'] + MEASURES)
+    
+    band = Config.ANALYTICS_EFFICIENCY_BAND
+    efficiency = pd.to_numeric(rows['efficiency'], errors='coerce')
+    
+    def text(column: pd.Series) -> pd.Series:
+        return column.astype('string').fillna('').astype(object)
+    
+    values = {
+        'total': '',
+        'current-energy-rating': text(rows['rating']),
+        'property-type': text(rows['building_type']),
+        'lodgement-year': text(rows['lodgement_date']).str[:4],
+        'efficiency-band': text((efficiency // band * band).astype('Int64')),
+    }
+    
+    base = pd.DataFrame({
+        'property_type': rows['property_type'],
+        'local_authority': text(rows['local_authority']),
+        'certificates': sign,
+        'efficiency_sum': sign * efficiency.fillna(0).astype(np.int64),
+        'efficiency_count': sign * efficiency.notna().astype(np.int64),
+        'payload_bytes': sign * pd.to_numeric(rows['payload_bytes']).fillna(0).astype(np.int64),
+    })
+    
+    long = pd.concat([base.assign(dimension=dimension, value=values[dimension])
+                      for dimension in ROLLUP_DIMENSIONS], ignore_index=True)
+    return (long.groupby(['property_type', 'local_authority', 'dimension', 'value'],
+                         as_index=False)[MEASURES].sum())
+
+def apply_deltas(conn: sqlite3.Connection, deltas: pd.DataFrame):
+    if deltas.empty:
+        return
+    
+    conn.executemany('''
+        INSERT INTO analytics_rollups
+        (property_type, local_authority, dimension, value,
+         certificates, efficiency_sum, efficiency_count, payload_bytes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (property_type, local_authority, dimension, value) DO UPDATE SET
+            certificates = certificates + excluded.certificates,
+            efficiency_sum = efficiency_sum + excluded.efficiency_sum,
+            efficiency_count = efficiency_count + excluded.efficiency_count,
+            payload_bytes = payload_bytes + excluded.payload_bytes
+    ''', deltas.astype(object).itertuples(index=False, name=None))
+    
+    conn.execute('DELETE FROM analytics_rollups WHERE certificates <= 0')
+
+def certificate_rows(conn: sqlite3.Connection, certificate_ids: Iterable[str]) -> list:
+    """``ROLLUP_COLUMNS`` for the given certificates, as currently stored."""
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS rollup_batch (
+            certificate_id TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('DELETE FROM temp.rollup_batch')
+    conn.executemany('INSERT OR IGNORE INTO temp.rollup_batch VALUES (?)',
+                     ((certificate_id,) for certificate_id in certificate_ids))
+    
+    return conn.execute(f'''
+        SELECT {ROLLUP_COLUMNS} FROM temp.rollup_batch
+        JOIN epc_certificates USING (certificate_id)
+    ''').fetchall()
+
+def apply_matching(conn: sqlite3.Connection, where: str, params: Tuple = (), sign: int = 1):
+    """Add (or with ``sign=-1`` remove) every certificate matching ``where``."""
+    cursor = conn.execute(f'SELECT {ROLLUP_COLUMNS} FROM epc_certificates WHERE {where}', params)
+    
+    # Aggregated a chunk at a time, so memory stays bounded however many
+    # certificates match
+    while True:
+        rows = cursor.fetchmany(READ_CHUNK_ROWS)
+        if not rows:
+            break
+        apply_deltas(conn, rollup_deltas(rows, sign))
+
+def rebuild_rollups(conn: sqlite3.Connection):
+    conn.execute('DELETE FROM analytics_rollups')
+    apply_matching(conn, '1')
+    
+    count = conn.execute('SELECT COUNT(*) FROM analytics_rollups').fetchone()[0]
+    logger.info(f"Rebuilt analytics rollups ({count} rows)")
+
+def read_rollups(conn: sqlite3.Connection, dimension: str,
+                 property_type: Optional[str] = None,
+                 local_authority: Optional[str] = None,
+                 by_local_authority: bool = False) -> Dict[str, Dict[str, int]]:
+    """Totals per value of one dimension, summed over the matching rollup rows.
+    
+    With ``by_local_authority`` the key is the local authority instead of the
+    dimension value, e.g. certificates per authority from ``'total'``.
+    """
+    key = 'local_authority' if by_local_authority else 'value'
+    conditions = ['dimension = ?']
+    params = [dimension]
+    
+    if property_type:
+        conditions.append('property_type = ?')
+        params.append(property_type)
+    if local_authority:
+        conditions.append('local_authority = ?')
+        params.append(local_authority)
+    
+    rows = conn.execute(f'''
+        SELECT {key}, SUM(certificates), SUM(efficiency_sum),
+               SUM(efficiency_count), SUM(payload_bytes)
+        FROM analytics_rollups WHERE {' AND '.join(conditions)}
+        GROUP BY {key}
+    ''', params).fetchall()
+    
+    return {row[0]: dict(zip(MEASURES, row[1:])) for row in rows}
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import re
+import pandas as pd
+from typing import Dict, Optional
+import logging
+
+from .database import EPCDatabase
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+class SearchCache:
+    """Read-through cache of whole search results held in ``EPCDatabase``.
+    
+    A search is keyed on its endpoint and normalised filters; the certificate
+    IDs it returned are recorded in ``search_cache_members`` so a fresh hit
+    can be answered from SQLite without touching the API.
+    """
+    
+    def __init__(self, db: EPCDatabase, ttl_hours: Optional[float] = None):
+        self.db = db
+        self.ttl_hours = ttl_hours if ttl_hours is not None else Config.SEARCH_CACHE_TTL_HOURS
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalise_filters(params: Dict) -> Dict:
+        normalised = {}
+        
+        for key, value in params.items():
+            if value is None or key in ('size', 'search-after'):
+                continue
+            
+            value = re.sub(r'\s+', ' ', str(value).strip())
+            if key == 'postcode':
+                value = value.upper()
+            
+            normalised[key.strip().lower()] = value
+        
+        return dict(sorted(normalised.items()))
+    
+    def key(self, endpoint: str, params: Dict) -> str:
+        payload = json.dumps({
+            'endpoint': endpoint.strip('/'),
+            'filters': self.normalise_filters(params)
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def lookup(self, endpoint: str, params: Dict) -> Optional[pd.DataFrame]:
+        if self.ttl_hours <= 0:
+            return None
+        
+        search_hash = self.key(endpoint, params)
+        data = self.db.get_search_results(search_hash, self.ttl_hours)
+        
+        if data is None:
+            self.misses += 1
+            logger.info(f"Search cache miss: {endpoint} {params} [{search_hash[:12]}]")
+            return None
+        
+        self.hits += 1
+        logger.info(f"Search cache hit: {endpoint} {params} -> {len(data)} records "
+                    f"[{search_hash[:12]}]")
+        return data
+    
+    def begin(self, endpoint: str, params: Dict) -> str:
+        search_hash = self.key(endpoint, params)
+        self.db.clear_search(search_hash)
+        return search_hash
+    
+    def add_results(self, search_hash: str, data: pd.DataFrame, property_type: str):
+        if data.empty:
+            return
+        
+        self.db.store_certificates(data, property_type)
+        self.db.record_search_members(search_hash, EPCDatabase.certificate_ids(data))
+    
+    def complete(self, search_hash: str, endpoint: str, params: Dict):
+        self.db.record_search(search_hash, {
+            'endpoint': endpoint,
+            'filters': self.normalise_filters(params)
+        })
+    
+    def store(self, endpoint: str, params: Dict, data: pd.DataFrame, property_type: str):
+        search_hash = self.begin(endpoint, params)
+        self.add_results(search_hash, data, property_type)
+        self.complete(search_hash, endpoint, params)
@@ -1,5 +1,7 @@
+import gzip
+import io
 import pandas as pd
-from typing import List, Optional
+from typing import BinaryIO, Iterable, List, Optional, TextIO, Tuple
 from pathlib import Path
 import logging
 
@@ -8,69 +10,162 @@ from config.settings import Config
 logger = logging.getLogger(__name__)
 
 class CSVExporter:
+    AGRICULTURAL_SUMMARY_COLUMNS = [
+        'address1', 'address2', 'postcode', 'local-authority',
+        'current-energy-rating', 'potential-energy-rating',
+        'current-energy-efficiency', 'potential-energy-efficiency',
+        'total-floor-area', 'property-type', 'built-form',
+        'inspection-date', 'lodgement-date'
+    ]
+    
+    SUPPLY_CHAIN_COLUMNS = [
+        'uprn', 'address1', 'address2', 'postcode',
+        'current-energy-rating', 'current-energy-efficiency',
+        'co2-emissions-current', 'lighting-cost-current',
+        'heating-cost-current', 'hot-water-cost-current',
+        'total-floor-area', 'property-type',
+        'main-fuel', 'main-heating-controls',
+        'inspection-date'
+    ]
+    
+    COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+    
     def __init__(self, export_path: Optional[str] = None):
         self.export_path = Path(export_path or Config.DEFAULT_EXPORT_PATH)
         self.export_path.mkdir(parents=True, exist_ok=True)
     
     def export(self, data: pd.DataFrame, filename: str, 
-               columns: Optional[List[str]] = None) -> str:
+               columns: Optional[List[str]] = None,
+               compression: Optional[str] = None) -> str:
         if data.empty:
             logger.warning("No data to export")
             return ""
         
-        if columns:
-            available_columns = [col for col in columns if col in data.columns]
-            if available_columns:
-                data = data[available_columns]
-            else:
-                logger.warning("None of the specified columns found in data")
+        return self.export_stream([data], filename, columns, compression)
+    
+    def export_stream(self, frames: Iterable[pd.DataFrame], filename: str,
+                      columns: Optional[List[str]] = None,
+                      compression: Optional[str] = None) -> str:
+        """Append DataFrame chunks to a single CSV as they arrive."""
+        filepaths = self.export_parts(frames, filename, columns, compression)
+        return filepaths[0] if filepaths else ""
+    
+    def export_parts(self, frames: Iterable[pd.DataFrame], filename: str,
+                     columns: Optional[List[str]] = None,
+                     compression: Optional[str] = None,
+                     max_part_bytes: Optional[int] = None) -> List[str]:
+        """Append DataFrame chunks to CSV as they arrive, optionally compressed.
+        
+        The header is taken from the first non-empty chunk; later chunks are
+        aligned to it so pages with missing or extra fields stay consistent.
+        With ``max_part_bytes`` a new part file, with its own header, is
+        started once the current one reaches that size on disk, so parts
+        overshoot by at most one chunk.
+        """
+        if compression not in self.COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression '{compression}', expected one of "
+                             f"{', '.join(str(name) for name in self.COMPRESSION_SUFFIXES)}")
         
-        filepath = self.export_path / f"{filename}.csv"
+        suffix = '.csv' + self.COMPRESSION_SUFFIXES[compression]
+        filepaths = []
+        header = None
+        total_rows = 0
+        stream = raw = None
         
         try:
-            data.to_csv(filepath, index=False, encoding='utf-8')
-            logger.info(f"Exported {len(data)} records to {filepath}")
-            return str(filepath)
+            for chunk in frames:
+                if chunk.empty:
+                    continue
+                
+                if header is None:
+                    header = list(chunk.columns)
+                    if columns:
+                        selected = [col for col in columns if col in header]
+                        if selected:
+                            header = selected
+                        else:
+                            logger.warning("None of the specified columns found in data")
+                
+                new_part = stream is None or (max_part_bytes and raw.tell() >= max_part_bytes)
+                if new_part:
+                    if stream is not None:
+                        stream.close()
+                        raw.close()
+                    
+                    name = f"{filename}_part{len(filepaths) + 1:03d}" if max_part_bytes else filename
+                    filepath = self.export_path / f"{name}{suffix}"
+                    stream, raw = self._open(filepath, compression)
+                    filepaths.append(str(filepath))
+                
+                chunk.reindex(columns=header).to_csv(stream, index=False, header=new_part)
+                total_rows += len(chunk)
             
         except Exception as e:
+            # Errors from the frames themselves, e.g. a failed API page, are
+            # the caller's to report; no partial parts are left behind
             logger.error(f"Failed to export CSV: {str(e)}")
-            return ""
+            if stream is not None:
+                stream.close()
+                raw.close()
+                stream = None
+            for filepath in filepaths:
+                Path(filepath).unlink(missing_ok=True)
+            raise
+        
+        finally:
+            if stream is not None:
+                stream.close()
+                raw.close()
+        
+        if header is None:
+            logger.warning("No data to export")
+            return []
+        
+        logger.info(f"Exported {total_rows} records to {filepaths[0]}"
+                    + (f" and {len(filepaths) - 1} more parts" if len(filepaths) > 1 else ""))
+        return filepaths
+    
+    @staticmethod
+    def _open(filepath: Path, compression: Optional[str]) -> Tuple[TextIO, BinaryIO]:
+        """A text stream for writing plus the raw file, whose position is the size on disk."""
+        raw = open(filepath, 'wb')
+        
+        if compression == 'gzip':
+            binary = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+        elif compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raw.close()
+                filepath.unlink(missing_ok=True)
+                raise ImportError("zstd compression requires the zstandard package")
+            binary = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+        else:
+            binary = raw
+        
+        return io.TextIOWrapper(binary, encoding='utf-8', newline=''), raw
     
     def export_agricultural_summary(self, data: pd.DataFrame, 
                                   area_name: str = "area") -> str:
         if data.empty:
             return ""
         
-        summary_columns = [
-            'address1', 'address2', 'postcode', 'local-authority',
-            'current-energy-rating', 'potential-energy-rating',
-            'current-energy-efficiency', 'potential-energy-efficiency',
-            'total-floor-area', 'property-type', 'built-form',
-            'inspection-date', 'lodgement-date'
-        ]
-        
-        filename = f"agricultural_buildings_{area_name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        return self.export(data, filename, summary_columns)
+        return self.export(data, self.agricultural_summary_filename(area_name),
+                           self.AGRICULTURAL_SUMMARY_COLUMNS)
+    
+    def agricultural_summary_filename(self, area_name: str = "area") -> str:
+        return f"agricultural_buildings_{area_name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
     
     def export_supply_chain_report(self, data: pd.DataFrame, 
                                   supplier_name: str = "supplier") -> str:
         if data.empty:
             return ""
         
-        supply_chain_columns = [
-            'uprn', 'address1', 'address2', 'postcode',
-            'current-energy-rating', 'current-energy-efficiency',
-            'co2-emissions-current', 'lighting-cost-current',
-            'heating-cost-current', 'hot-water-cost-current',
-            'total-floor-area', 'property-type',
-            'main-fuel', 'main-heating-controls',
-            'inspection-date'
-        ]
-        
-        filename = f"supply_chain_{supplier_name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        return self.export(data, filename, supply_chain_columns)
+        return self.export(data, self.supply_chain_filename(supplier_name),
+                           self.SUPPLY_CHAIN_COLUMNS)
+    
+    def supply_chain_filename(self, supplier_name: str = "supplier") -> str:
+        return f"supply_chain_{supplier_name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
     
     def export_energy_trends(self, data: pd.DataFrame, 
                            area_name: str = "area") -> str:
@@ -1,42 +1,129 @@
 import pandas as pd
 import json
-from typing import Dict, List, Optional
+import textwrap
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 from pathlib import Path
 import logging
 
 from src.data.geocoder import AddressGeocoder
+from src.export.spatial_grid import SpatialGridAggregator
+from src.export.vector_tiles import VectorTileExporter
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
 class GeoJSONExporter:
+    ADDRESS_COLUMNS = ['address1', 'address2', 'address3', 'postcode']
+    
     def __init__(self, export_path: Optional[str] = None):
         self.export_path = Path(export_path or Config.DEFAULT_EXPORT_PATH)
         self.export_path.mkdir(parents=True, exist_ok=True)
         self.geocoder = AddressGeocoder()
     
     def export(self, data: pd.DataFrame, filename: str, 
-               include_properties: Optional[List[str]] = None) -> str:
+               include_properties: Optional[List[str]] = None,
+               indent: Optional[int] = None, sequence: bool = False) -> str:
         if data.empty:
             logger.warning("No data to export")
             return ""
         
-        geocoded_data = self._ensure_coordinates(data)
-        
-        geojson = self._create_geojson_structure(geocoded_data, include_properties)
+        return self.export_stream([data], filename, include_properties, indent, sequence)
+    
+    def export_stream(self, frames: Iterable[pd.DataFrame], filename: str,
+                      include_properties: Optional[List[str]] = None,
+                      indent: Optional[int] = None, sequence: bool = False) -> str:
+        """Write features chunk by chunk, so memory is bounded by one chunk.
         
-        filepath = self.export_path / f"{filename}.geojson"
+        ``sequence`` writes newline-delimited GeoJSON (GeoJSONSeq, one
+        feature per line, ``.geojsonl``) instead of a FeatureCollection.
+        Output is compact unless an ``indent`` is given.
+        """
+        filepath = self.export_path / f"{filename}.{'geojsonl' if sequence else 'geojson'}"
+        separators = (',', ': ') if indent else (',', ':')
+        rows_seen = False
+        feature_count = 0
         
         try:
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(geojson, f, indent=2, ensure_ascii=False)
-            
-            logger.info(f"Exported {len(geojson['features'])} features to {filepath}")
-            return str(filepath)
-            
+                if not sequence:
+                    header, footer = self._collection_wrapper(indent)
+                    f.write(header)
+                
+                for chunk in frames:
+                    if chunk.empty:
+                        continue
+                    rows_seen = True
+                    
+                    for feature in self._iter_features(self._ensure_coordinates(chunk),
+                                                       include_properties):
+                        if sequence:
+                            f.write(json.dumps(feature, separators=(',', ':'),
+                                               ensure_ascii=False))
+                            f.write('\n')
+                        else:
+                            text = json.dumps(feature, indent=indent, separators=separators,
+                                              ensure_ascii=False)
+                            if indent:
+                                text = textwrap.indent(text, ' ' * indent * 2)
+                            if feature_count:
+                                f.write(',\n' if indent else ',')
+                            f.write(text)
+                        
+                        feature_count += 1
+                
+                if not sequence:
+                    f.write(footer)
+        
         except Exception as e:
+            # The frames may be a live API stream; its errors are the caller's
             logger.error(f"Failed to export GeoJSON: {str(e)}")
+            filepath.unlink(missing_ok=True)
+            raise
+        
+        if not rows_seen:
+            filepath.unlink(missing_ok=True)
+            logger.warning("No data to export")
             return ""
+        
+        logger.info(f"Exported {feature_count} features to {filepath}")
+        return str(filepath)
+    
+    def export_record_stream(self, records: Iterable[Dict], filename: str,
+                             include_properties: Optional[List[str]] = None,
+                             chunk_rows: Optional[int] = None, **options) -> str:
+        """Stream records such as ``EPCClient.iter_records`` into a GeoJSON export."""
+        chunk_rows = chunk_rows or Config.PAGE_SIZE
+        
+        def frames() -> Iterator[pd.DataFrame]:
+            chunk = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= chunk_rows:
+                    yield pd.DataFrame(chunk)
+                    chunk = []
+            if chunk:
+                yield pd.DataFrame(chunk)
+        
+        return self.export_stream(frames(), filename, include_properties, **options)
+    
+    def _collection_wrapper(self, indent: Optional[int] = None):
+        # Everything around the feature array, split where the features go
+        empty = {
+            "type": "FeatureCollection",
+            "crs": {
+                "type": "name",
+                "properties": {
+                    "name": Config.GEOJSON_CRS
+                }
+            },
+            "features": []
+        }
+        text = json.dumps(empty, indent=indent, separators=(',', ': ') if indent else (',', ':'))
+        split = text.rindex('[]') + 1
+        
+        if indent:
+            return text[:split] + '\n', '\n' + ' ' * indent + text[split:]
+        return text[:split], text[split:]
     
     def _ensure_coordinates(self, data: pd.DataFrame) -> pd.DataFrame:
         if 'latitude' not in data.columns or 'longitude' not in data.columns:
@@ -53,30 +140,6 @@ class GeoJSONExporter:
     
     def _create_geojson_structure(self, data: pd.DataFrame, 
                                  include_properties: Optional[List[str]] = None) -> Dict:
-        features = []
-        
-        for _, row in data.iterrows():
-            try:
-                lat = float(row['latitude'])
-                lng = float(row['longitude'])
-                
-                properties = self._extract_properties(row, include_properties)
-                
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [lng, lat]
-                    },
-                    "properties": properties
-                }
-                
-                features.append(feature)
-                
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Invalid coordinates in row, skipping: {str(e)}")
-                continue
-        
         geojson = {
             "type": "FeatureCollection",
             "crs": {
@@ -85,49 +148,83 @@ class GeoJSONExporter:
                     "name": Config.GEOJSON_CRS
                 }
             },
-            "features": features
+            "features": list(self._iter_features(data, include_properties))
         }
         
         return geojson
     
-    def _extract_properties(self, row: pd.Series, 
-                          include_properties: Optional[List[str]] = None) -> Dict:
+    def _iter_features(self, data: pd.DataFrame,
+                       include_properties: Optional[List[str]] = None) -> Iterator[Dict]:
+        # Columnar: coordinates, null masks, value conversion and addresses are
+        # computed once per column, leaving only dict assembly per row
+        lat = pd.to_numeric(data['latitude'], errors='coerce')
+        lng = pd.to_numeric(data['longitude'], errors='coerce')
+        valid = lat.notna() & lng.notna()
+        
+        if not valid.all():
+            logger.warning(f"{int((~valid).sum())} rows with invalid coordinates skipped")
+            data, lat, lng = data[valid], lat[valid], lng[valid]
+        
         if include_properties:
-            properties = {}
-            for prop in include_properties:
-                if prop in row.index and pd.notna(row[prop]):
-                    properties[prop] = self._serialize_value(row[prop])
+            columns = [col for col in include_properties if col in data.columns]
         else:
-            properties = {}
-            for col, value in row.items():
-                if col not in ['latitude', 'longitude'] and pd.notna(value):
-                    properties[col] = self._serialize_value(value)
+            columns = [col for col in data.columns if col not in ('latitude', 'longitude')]
         
-        properties['full_address'] = self._create_full_address(row)
+        properties = self._property_records(data[columns])
+        addresses = self._full_addresses(data)
         
-        return properties
-    
-    def _serialize_value(self, value):
-        if pd.isna(value):
-            return None
-        elif isinstance(value, (int, float, str, bool)):
-            return value
-        else:
-            return str(value)
+        for lng_value, lat_value, props, address in zip(lng.tolist(), lat.tolist(),
+                                                        properties, addresses):
+            props['full_address'] = address
+            yield {
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [lng_value, lat_value]
+                },
+                "properties": props
+            }
     
-    def _create_full_address(self, row: pd.Series) -> str:
-        address_parts = []
+    def _property_records(self, data: pd.DataFrame) -> List[Dict]:
+        columns = {}
         
-        for col in ['address1', 'address2', 'address3']:
-            if col in row.index and pd.notna(row[col]) and str(row[col]).strip():
-                address_parts.append(str(row[col]).strip())
+        for col in data.columns:
+            column = data[col]
+            
+            if pd.api.types.is_object_dtype(column):
+                # Mixed object columns: keep JSON scalars, stringify the rest
+                plain = column.map(lambda value: isinstance(value, (str, int, float, bool)))
+                column = column.where(plain, column.astype(str))
+            elif not (pd.api.types.is_numeric_dtype(column) or
+                      pd.api.types.is_bool_dtype(column) or
+                      pd.api.types.is_string_dtype(column)):
+                column = column.astype(str)
+            
+            # Object-dtype lists hold native Python scalars, so nothing is
+            # boxed per cell; nulls become None and are dropped below
+            columns[col] = column.astype(object).where(data[col].notna(), None).tolist()
+        
+        names = list(columns)
+        return [{name: value for name, value in zip(names, row) if value is not None}
+                for row in zip(*columns.values())]
+    
+    def _full_addresses(self, data: pd.DataFrame) -> List[str]:
+        full_address = pd.Series('', index=data.index, dtype=object)
         
-        if 'postcode' in row.index and pd.notna(row['postcode']):
-            address_parts.append(str(row['postcode']).strip())
+        for col in self.ADDRESS_COLUMNS:
+            if col not in data.columns:
+                continue
+            
+            part = data[col].astype('string').str.strip().fillna('').astype(object)
+            separator = pd.Series(', ', index=data.index).where(
+                (full_address != '') & (part != ''), ''
+            )
+            full_address = full_address + separator + part
         
-        return ", ".join(address_parts)
+        return full_address.tolist()
     
-    def export_for_landapp(self, data: pd.DataFrame, filename: str) -> str:
+    def export_for_landapp(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                           filename: str, **options) -> str:
         landapp_properties = [
             'lmk-key',
             'address1',
@@ -148,10 +245,20 @@ class GeoJSONExporter:
             'uprn'
         ]
         
-        return self.export(data, filename, landapp_properties)
+        return self._export_any(data, filename, landapp_properties, **options)
     
-    def export_agricultural_geojson(self, data: pd.DataFrame, 
-                                  area_name: str = "area") -> str:
+    def export_vector_tiles(self, data: pd.DataFrame, filename: str, **options) -> str:
+        """Tiled counterpart of ``export_for_landapp`` for map clients (MBTiles)."""
+        if data.empty:
+            logger.warning("No data to export")
+            return ""
+        
+        return VectorTileExporter(str(self.export_path)).export(
+            self._ensure_coordinates(data), filename, **options
+        )
+    
+    def export_agricultural_geojson(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]], 
+                                  area_name: str = "area", **options) -> str:
         agricultural_properties = [
             'address1',
             'address2',
@@ -171,51 +278,49 @@ class GeoJSONExporter:
         
         filename = f"agricultural_buildings_{area_name}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}"
         
-        return self.export(data, filename, agricultural_properties)
+        return self._export_any(data, filename, agricultural_properties, **options)
+    
+    def _export_any(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]], filename: str,
+                    include_properties: List[str], **options) -> str:
+        if isinstance(data, pd.DataFrame):
+            return self.export(data, filename, include_properties, **options)
+        return self.export_stream(data, filename, include_properties, **options)
     
     def create_summary_geojson(self, data: pd.DataFrame, 
-                             group_by: str = 'postcode') -> Dict:
+                             group_by: str = 'postcode',
+                             cell_size: Optional[float] = None,
+                             shape: str = 'hex') -> Dict:
+        """Summary features per ``group_by`` value, or per grid cell when ``cell_size`` is set."""
         if data.empty:
             return {"type": "FeatureCollection", "features": []}
         
         geocoded_data = self._ensure_coordinates(data)
+        aggregator = SpatialGridAggregator(shape)
         
-        summary = geocoded_data.groupby(group_by).agg({
-            'latitude': 'mean',
-            'longitude': 'mean',
-            'current-energy-rating': lambda x: x.value_counts().to_dict(),
-            'lmk-key': 'count',
-            'current-energy-efficiency': 'mean'
-        }).reset_index()
-        
-        features = []
-        
-        for _, row in summary.iterrows():
-            properties = {
-                group_by: row[group_by],
-                'property_count': int(row['lmk-key']),
-                'avg_energy_efficiency': float(row['current-energy-efficiency']),
-                'energy_rating_distribution': row['current-energy-rating']
-            }
+        if cell_size:
+            return aggregator.to_geojson(aggregator.aggregate(geocoded_data, cell_size))
+        return aggregator.to_geojson(aggregator.summarise_by(geocoded_data, group_by))
+    
+    def export_grid_geojson(self, data: pd.DataFrame, filename: str,
+                            cell_sizes: Optional[List[float]] = None,
+                            shape: str = 'hex') -> List[str]:
+        """Write one polygon FeatureCollection per grid resolution."""
+        if data.empty:
+            logger.warning("No data to export")
+            return []
+        
+        aggregator = SpatialGridAggregator(shape)
+        levels = aggregator.aggregate_levels(self._ensure_coordinates(data), cell_sizes)
+        filepaths = []
+        
+        for cell_size, cells in levels.items():
+            filepath = self.export_path / f"{filename}_{shape}_{cell_size:g}m.geojson"
             
-            feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [float(row['longitude']), float(row['latitude'])]
-                },
-                "properties": properties
-            }
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(aggregator.to_geojson(cells), f, ensure_ascii=False,
+                          separators=(',', ':'))
             
-            features.append(feature)
+            logger.info(f"Exported {len(cells)} {shape} cells of {cell_size:g}m to {filepath}")
+            filepaths.append(str(filepath))
         
-        return {
-            "type": "FeatureCollection",
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": Config.GEOJSON_CRS
-                }
-            },
-            "features": features
-        }
\ No newline at end of file
+        return filepaths
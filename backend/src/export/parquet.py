@@ -0,0 +1,264 @@
+import shutil
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import quote
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+class ParquetExporter:
+    """Typed, columnar exports that keep dates, numbers and ratings intact.
+
+    Certificate fields arrive from the API as strings. Known numeric and date
+    fields are stored as such, low-cardinality fields as dictionary-encoded
+    categoricals and everything else as strings, so a file read back has the
+    same dtypes whichever chunk a column first appeared in. Partitioned
+    exports are Hive-style directories with one file per partition value.
+    """
+
+    PARTITIONS = ('local-authority', 'lodgement-year')
+    # Null partition values cannot be read back by pandas, so rows without
+    # one are filed under this value instead
+    MISSING_PARTITION = 'unknown'
+    ROW_GROUP_ROWS = 100000
+    COMPRESSION = 'zstd'
+    
+    CATEGORICAL_COLUMNS = [
+        'current-energy-rating', 'potential-energy-rating', 'asset-rating-band',
+        'property-type', 'built-form', 'local-authority', 'local-authority-label',
+        'constituency', 'constituency-label', 'county', 'tenure', 'transaction-type',
+        'main-fuel', 'energy-tariff', 'mains-gas-flag', 'glazed-type', 'glazed-area',
+        'mechanical-ventilation', 'solar-water-heating-flag', 'floor-level',
+        'flat-top-storey', 'heat-loss-corridor', 'building-level', 'main-heating-controls',
+        'construction-age-band', 'roof-energy-eff', 'walls-energy-eff',
+        'windows-energy-eff', 'mainheat-energy-eff', 'hot-water-energy-eff',
+        'lighting-energy-eff', 'floor-energy-eff', 'main-heating-fuel', 'aircon-present',
+        'report-type'
+    ]
+    
+    INTEGER_COLUMNS = [
+        'current-energy-efficiency', 'potential-energy-efficiency',
+        'environment-impact-current', 'environment-impact-potential',
+        'number-habitable-rooms', 'number-heated-rooms', 'number-open-fireplaces',
+        'extension-count', 'low-energy-lighting', 'multi-glaze-proportion',
+        'asset-rating'
+    ]
+    
+    FLOAT_COLUMNS = [
+        'energy-consumption-current', 'energy-consumption-potential',
+        'co2-emissions-current', 'co2-emissions-potential', 'co2-emiss-curr-per-floor-area',
+        'lighting-cost-current', 'lighting-cost-potential',
+        'heating-cost-current', 'heating-cost-potential',
+        'hot-water-cost-current', 'hot-water-cost-potential',
+        'total-floor-area', 'floor-area', 'floor-height', 'unheated-corridor-length',
+        'photo-supply', 'wind-turbine-count', 'building-emissions',
+        'primary-energy-value', 'latitude', 'longitude'
+    ]
+    
+    DATE_COLUMNS = ['lodgement-date', 'inspection-date']
+    DATETIME_COLUMNS = ['lodgement-datetime']
+    
+    def __init__(self, export_path: Optional[str] = None):
+        self.export_path = Path(export_path or Config.DEFAULT_EXPORT_PATH)
+        self.export_path.mkdir(parents=True, exist_ok=True)
+    
+    def export(self, data: pd.DataFrame, filename: str,
+               columns: Optional[List[str]] = None,
+               partition_by: Optional[str] = None) -> str:
+        if data.empty:
+            logger.warning("No data to export")
+            return ""
+        
+        return self.export_stream([data], filename, columns, partition_by)
+    
+    def export_stream(self, frames: Iterable[pd.DataFrame], filename: str,
+                      columns: Optional[List[str]] = None,
+                      partition_by: Optional[str] = None) -> str:
+        """Write DataFrame chunks to ``{filename}.parquet`` as they arrive.
+        
+        Rows are buffered per partition and written in row groups of
+        ``ROW_GROUP_ROWS``, so memory is bounded by the number of open
+        partitions rather than the size of the export. With ``partition_by``
+        the path is a directory of ``<partition>=<value>/part-0.parquet``.
+        """
+        if partition_by is not None and partition_by not in self.PARTITIONS:
+            raise ValueError(f"Cannot partition by '{partition_by}', "
+                             f"expected one of {', '.join(self.PARTITIONS)}")
+        
+        target = self.export_path / f"{filename}.parquet"
+        if target.is_dir():
+            shutil.rmtree(target)
+        else:
+            target.unlink(missing_ok=True)
+        
+        schema = None
+        writers = {}
+        buffers = {}
+        total_rows = 0
+        
+        def flush(key: str, minimum_rows: int = 0):
+            pending = buffers.get(key)
+            if not pending or sum(len(table) for table in pending) < minimum_rows:
+                return
+            
+            table = pa.concat_tables(pending)
+            if key not in writers:
+                path = target / key / 'part-0.parquet' if partition_by else target
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writers[key] = pq.ParquetWriter(path, table.schema, compression=self.COMPRESSION)
+            
+            writers[key].write_table(table, row_group_size=self.ROW_GROUP_ROWS)
+            buffers[key] = []
+        
+        try:
+            for chunk in frames:
+                if chunk.empty:
+                    continue
+                
+                if schema is None:
+                    header = list(chunk.columns)
+                    if columns:
+                        selected = [col for col in columns if col in header]
+                        if selected:
+                            header = selected
+                        else:
+                            logger.warning("None of the specified columns found in data")
+                    schema = self.schema(header)
+                
+                table = self.to_table(chunk.reindex(columns=schema.names), schema)
+                
+                for key, part in self._partitions(table, partition_by):
+                    buffers.setdefault(key, []).append(part)
+                    flush(key, self.ROW_GROUP_ROWS)
+                
+                total_rows += len(chunk)
+            
+            for key in list(buffers):
+                flush(key)
+        
+        except Exception as e:
+            # The frames may be a live API stream; its errors are the caller's
+            logger.error(f"Failed to export Parquet: {str(e)}")
+            for writer in writers.values():
+                writer.close()
+            writers = {}
+            if target.is_dir():
+                shutil.rmtree(target)
+            else:
+                target.unlink(missing_ok=True)
+            raise
+        
+        finally:
+            for writer in writers.values():
+                writer.close()
+        
+        if schema is None:
+            logger.warning("No data to export")
+            return ""
+        
+        logger.info(f"Exported {total_rows} records to {target}"
+                    + (f" in {len(writers)} partitions" if partition_by else ""))
+        return str(target)
+    
+    def schema(self, columns: List[str]) -> pa.Schema:
+        def field_type(column: str) -> pa.DataType:
+            if column in self.CATEGORICAL_COLUMNS:
+                return pa.dictionary(pa.int32(), pa.string())
+            if column in self.INTEGER_COLUMNS:
+                return pa.int64()
+            if column in self.FLOAT_COLUMNS:
+                return pa.float64()
+            if column in self.DATE_COLUMNS:
+                return pa.date32()
+            if column in self.DATETIME_COLUMNS:
+                return pa.timestamp('s')
+            return pa.string()
+        
+        return pa.schema([pa.field(column, field_type(column)) for column in columns])
+    
+    def to_table(self, data: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+        arrays = []
+        
+        for field in schema:
+            column = data[field.name]
+            
+            if pa.types.is_integer(field.type):
+                values = pa.array(pd.to_numeric(column, errors='coerce').round().astype('Int64'),
+                                  type=field.type)
+            elif pa.types.is_floating(field.type):
+                values = pa.array(pd.to_numeric(column, errors='coerce'), type=field.type,
+                                  from_pandas=True)
+            elif pa.types.is_date(field.type) or pa.types.is_timestamp(field.type):
+                parsed = pd.to_datetime(column, errors='coerce')
+                values = pa.array(parsed, from_pandas=True).cast(field.type, safe=False)
+            else:
+                values = pa.array(column.astype('string'), from_pandas=True).cast(pa.string())
+                if pa.types.is_dictionary(field.type):
+                    values = values.dictionary_encode()
+            
+            arrays.append(values)
+        
+        return pa.Table.from_arrays(arrays, schema=schema)
+    
+    def _partitions(self, table: pa.Table, partition_by: Optional[str]) -> Iterator:
+        if partition_by is None:
+            yield '', table
+            return
+        
+        source = 'lodgement-date' if partition_by == 'lodgement-year' else partition_by
+        if source in table.column_names:
+            keys = table.column(source).to_pandas()
+        else:
+            keys = pd.Series([None] * len(table), dtype=object)
+        
+        if partition_by == 'lodgement-year':
+            keys = pd.to_datetime(keys, errors='coerce').dt.year.astype('Int64')
+        elif source in table.column_names:
+            # Hive partitions carry the value in the path, not the file
+            table = table.drop_columns([source])
+        
+        codes, values = pd.factorize(keys)
+        codes = np.asarray(codes)
+        
+        for code in np.unique(codes):
+            value = self.MISSING_PARTITION if code < 0 else quote(str(values[code]), safe='')
+            yield f"{partition_by}={value}", table.take(np.flatnonzero(codes == code))
+    
+    @staticmethod
+    def read_frames(path: str, batch_rows: int = 50000) -> Iterator[pd.DataFrame]:
+        """Yield a Parquet export back as API-shaped frames of string fields.
+        
+        This is the inverse of ``export_stream``: values are formatted the way
+        the API returns them, so the frames can go straight into
+        ``EPCDatabase.store_certificates``.
+        """
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+        
+        def as_text(column: pa.Array) -> pd.Series:
+            # Arrow formats whole floats without ".0" and dates as ISO
+            # strings, matching the API's own text
+            if pa.types.is_timestamp(column.type):
+                column = column.cast(pa.timestamp('s'))
+            return column.cast(pa.string()).to_pandas().astype(object)
+        
+        for batch in dataset.to_batches(batch_size=batch_rows):
+            frame = pd.DataFrame({
+                name: as_text(column)
+                for name, column in zip(batch.schema.names, batch.columns)
+                # The year partition is derived, not a certificate field
+                if name != 'lodgement-year'
+            })
+            
+            if 'local-authority' in frame.columns:
+                frame['local-authority'] = frame['local-authority'].replace(
+                    ParquetExporter.MISSING_PARTITION, None
+                )
+            yield frame.where(frame.notna(), None)
@@ -0,0 +1,165 @@
+import asyncio
+import pandas as pd
+from typing import Iterable, List, Optional, Set, Tuple
+from pathlib import Path
+from tqdm import tqdm
+import logging
+
+from src.api.async_client import AsyncEPCClient, EPCRequestError
+from src.data.database import EPCDatabase
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+class UPRNReportPipeline:
+    """Build a UPRN report from the cache first, then concurrent API lookups.
+    
+    Rows are appended to the output CSV as each lookup completes and every
+    successful UPRN is recorded in a checkpoint file, so an interrupted run
+    picks up where it stopped. A UPRN whose rows were written just before a
+    crash may be repeated once on resume; none are lost. Failed lookups are
+    counted and left out of the checkpoint, which is then kept so the next
+    run retries them.
+    """
+    
+    def __init__(self, db: EPCDatabase, export_path: Path,
+                 property_type: str = 'domestic',
+                 workers: Optional[int] = None,
+                 max_age_hours: int = 24,
+                 cache_batch_rows: int = 1000):
+        self.db = db
+        self.export_path = Path(export_path)
+        self.property_type = property_type
+        self.workers = workers or Config.ASYNC_MAX_CONCURRENCY
+        self.max_age_hours = max_age_hours
+        self.cache_batch_rows = cache_batch_rows
+    
+    def run(self, uprns: Iterable[str], columns: List[str], filename: str,
+            checkpoint_path: Path) -> Tuple[str, int, int]:
+        uprns = list(dict.fromkeys(str(uprn) for uprn in uprns))
+        output_path, completed = self._load_checkpoint(checkpoint_path)
+        
+        if output_path is None:
+            output_path = self.export_path / f"{filename}.csv"
+            checkpoint_path.write_text(f"{output_path}\n", encoding='utf-8')
+            pd.DataFrame(columns=columns).to_csv(output_path, index=False)
+        else:
+            logger.info(f"Resuming report into {output_path}: "
+                        f"{len(completed)} of {len(uprns)} UPRNs already done")
+        
+        pending = [uprn for uprn in uprns if uprn not in completed]
+        rows_written = 0
+        failed = 0
+        
+        with open(output_path, 'a', encoding='utf-8', newline='') as output, \
+                open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                tqdm(total=len(uprns), initial=len(uprns) - len(pending),
+                     desc="Building report", unit="uprn") as progress:
+            
+            def write(data: pd.DataFrame, done: List[str]):
+                nonlocal rows_written
+                
+                if not data.empty:
+                    data.reindex(columns=columns).to_csv(output, index=False, header=False)
+                    output.flush()
+                    rows_written += len(data)
+                
+                checkpoint.writelines(f"{uprn}\n" for uprn in done)
+                checkpoint.flush()
+                progress.update(len(done))
+            
+            hits = self.db.get_certificates_by_uprns(pending, self.property_type,
+                                                     self.max_age_hours)
+            if not hits.empty:
+                cached_uprns = set(hits['uprn'].astype(str))
+                write(hits, [uprn for uprn in pending if uprn in cached_uprns])
+                pending = [uprn for uprn in pending if uprn not in cached_uprns]
+            
+            logger.info(f"Report: {len(uprns) - len(pending)} UPRNs served from cache, "
+                        f"fetching {len(pending)} from the API")
+            
+            if pending:
+                failed = asyncio.run(self._fetch_missing(pending, write, progress))
+        
+        if failed:
+            logger.warning(f"Report incomplete: {failed} UPRN lookups failed; "
+                           f"rerun to retry them from {checkpoint_path}")
+        else:
+            checkpoint_path.unlink()
+            logger.info(f"Report complete: {rows_written} rows written to {output_path}")
+        
+        return str(output_path), rows_written, failed
+    
+    async def _fetch_missing(self, uprns: List[str], write, progress) -> int:
+        """Look up ``uprns`` with a bounded window of in-flight requests.
+        
+        Returns the number of lookups that failed.
+        """
+        to_cache = []
+        cached_rows = 0
+        failed = 0
+        window = self.workers * 2
+        
+        async with AsyncEPCClient(max_concurrency=self.workers) as client:
+            async def lookup(uprn: str):
+                try:
+                    return uprn, await client.search_by_uprn(uprn, self.property_type,
+                                                             strict=True)
+                except EPCRequestError as e:
+                    logger.warning(f"Lookup failed for UPRN {uprn}: {str(e)}")
+                    return uprn, None
+            
+            remaining = iter(uprns)
+            in_flight = set()
+            
+            while True:
+                for uprn in remaining:
+                    in_flight.add(asyncio.ensure_future(lookup(uprn)))
+                    if len(in_flight) >= window:
+                        break
+                
+                if not in_flight:
+                    break
+                
+                done, in_flight = await asyncio.wait(in_flight,
+                                                     return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    uprn, data = task.result()
+                    
+                    if data is None:
+                        failed += 1
+                        progress.update(1)
+                        continue
+                    
+                    write(data, [uprn])
+                    
+                    if not data.empty:
+                        to_cache.append(data)
+                        cached_rows += len(data)
+                
+                if cached_rows >= self.cache_batch_rows:
+                    await self._store(to_cache)
+                    to_cache, cached_rows = [], 0
+        
+        if to_cache:
+            await self._store(to_cache)
+        
+        return failed
+    
+    async def _store(self, frames: List[pd.DataFrame]):
+        # Off the event loop, so in-flight lookups keep going during the write
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.db.store_certificates,
+                                   pd.concat(frames, ignore_index=True), self.property_type)
+    
+    def _load_checkpoint(self, checkpoint_path: Path) -> Tuple[Optional[Path], Set[str]]:
+        if not checkpoint_path.exists():
+            return None, set()
+        
+        lines = checkpoint_path.read_text(encoding='utf-8').splitlines()
+        if not lines or not Path(lines[0]).exists():
+            logger.warning(f"Ignoring stale checkpoint {checkpoint_path}")
+            return None, set()
+        
+        return Path(lines[0]), {line for line in lines[1:] if line}
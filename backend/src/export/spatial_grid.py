@@ -0,0 +1,241 @@
+import math
+from typing import Dict, Iterable, List, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+RATINGS = list('ABCDEFG')
+
+class SpatialGridAggregator:
+    """Summarise geocoded certificates over hexagonal or square grid cells.
+
+    Points are projected onto a plane (equirectangular at the mid latitude of
+    England and Wales) so cell sizes are in metres and a cell covers the same
+    ground on every call. Each point gets an integer cell id; the cell
+    statistics are then a handful of ``np.bincount`` passes over those ids.
+    """
+    
+    SHAPES = ('hex', 'square')
+    DEFAULT_CELL_SIZES = [500, 2000, 10000]
+    
+    REFERENCE_LATITUDE = 52.5
+    METRES_PER_DEGREE = 111320.0
+    
+    def __init__(self, shape: str = 'hex'):
+        if shape not in self.SHAPES:
+            raise ValueError(f"Unknown grid shape '{shape}', expected one of {', '.join(self.SHAPES)}")
+        
+        self.shape = shape
+        self.x_scale = self.METRES_PER_DEGREE * math.cos(math.radians(self.REFERENCE_LATITUDE))
+    
+    def aggregate(self, data: pd.DataFrame, cell_size: float) -> pd.DataFrame:
+        """One row per occupied cell; ``cell_size`` is the edge length in metres."""
+        return self.aggregate_levels(data, [cell_size])[cell_size]
+    
+    def aggregate_levels(self, data: pd.DataFrame,
+                         cell_sizes: Optional[Iterable[float]] = None) -> Dict[float, pd.DataFrame]:
+        """Aggregate at several resolutions, projecting and parsing columns once."""
+        measures = self._measures(data)
+        x = measures['longitude'] * self.x_scale
+        y = measures['latitude'] * self.METRES_PER_DEGREE
+        
+        levels = {}
+        for cell_size in (cell_sizes or self.DEFAULT_CELL_SIZES):
+            if self.shape == 'hex':
+                column, row, centre_x, centre_y = self._hex_cells(x, y, cell_size)
+            else:
+                column, row, centre_x, centre_y = self._square_cells(x, y, cell_size)
+            
+            # Pack both indices into one int64 and hash it; factorize avoids
+            # the sort np.unique would do
+            cell_ids = (column + 2**31) * 2**32 + (row + 2**31)
+            inverse, unique_ids = pd.factorize(cell_ids)
+            
+            # First member of each cell, to read its indices and centre from
+            first = np.empty(len(unique_ids), dtype=np.int64)
+            first[inverse[::-1]] = np.arange(len(inverse))[::-1]
+            
+            cells = self.summarise(inverse, len(unique_ids), measures)
+            cells.insert(0, 'cell_id', [f"{c}_{r}" for c, r in zip(column[first], row[first])])
+            cells['latitude'] = centre_y[first] / self.METRES_PER_DEGREE
+            cells['longitude'] = centre_x[first] / self.x_scale
+            cells.attrs.update(shape=self.shape, cell_size=cell_size)
+            levels[cell_size] = cells
+        
+        return levels
+    
+    def summarise_by(self, data: pd.DataFrame, group_by: str) -> pd.DataFrame:
+        """Aggregate by an attribute column instead of space, e.g. postcode."""
+        measures = self._measures(data)
+        codes, groups = pd.factorize(data[group_by].to_numpy()[measures['valid']])
+        
+        # Rows without a group value are coded -1; park them in a spare slot
+        codes = np.where(codes >= 0, codes, len(groups))
+        cells = self.summarise(codes, len(groups) + 1, measures).iloc[:len(groups)].copy()
+        cells.insert(0, group_by, groups)
+        
+        counts = cells['property_count'].to_numpy()
+        for col in ('latitude', 'longitude'):
+            cells[col] = np.bincount(codes, weights=measures[col],
+                                     minlength=len(groups) + 1)[:len(groups)] / counts
+        return cells
+    
+    def _measures(self, data: pd.DataFrame) -> Dict[str, np.ndarray]:
+        lat = pd.to_numeric(data['latitude'], errors='coerce').to_numpy(dtype=float)
+        lng = pd.to_numeric(data['longitude'], errors='coerce').to_numpy(dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lng))
+        
+        # Ratings and the numeric columns arrive as strings with few distinct
+        # values, so each is parsed once per distinct value
+        def distinct(col: str, parse, missing) -> np.ndarray:
+            if col not in data.columns:
+                return np.full(len(data), missing)
+            codes, uniques = pd.factorize(data[col])
+            parsed = np.append(parse(pd.Series(uniques, dtype=object)), missing)
+            return parsed[codes]
+        
+        def rating_codes(uniques: pd.Series) -> np.ndarray:
+            ratings = uniques.astype(str).str.strip().str.upper()
+            codes = pd.Categorical(ratings, categories=RATINGS).codes.astype(np.int64)
+            return np.where(codes >= 0, codes, len(RATINGS))
+        
+        def numeric(col: str) -> np.ndarray:
+            return distinct(col, lambda uniques: pd.to_numeric(uniques, errors='coerce')
+                            .to_numpy(dtype=float), np.nan)
+        
+        rating_index = distinct('current-energy-rating', rating_codes, len(RATINGS))
+        
+        measures = {
+            'latitude': lat,
+            'longitude': lng,
+            'rating_index': rating_index,
+            'efficiency': numeric('current-energy-efficiency'),
+            'co2': numeric('co2-emissions-current'),
+        }
+        
+        measures = {name: values[valid] for name, values in measures.items()}
+        measures['valid'] = valid
+        return measures
+    
+    def _hex_cells(self, x: np.ndarray, y: np.ndarray, size: float):
+        # Pointy-top hexagons are the union of two rectangular lattices, the
+        # second offset by half a step each way; a point belongs to whichever
+        # of its two candidate centres is nearer
+        step_x, step_y = math.sqrt(3) * size, 3 * size
+        
+        col_a, row_a = np.round(x / step_x), np.round(y / step_y)
+        col_b, row_b = np.floor(x / step_x), np.floor(y / step_y)
+        
+        distance_a = (x - col_a * step_x) ** 2 + (y - row_a * step_y) ** 2
+        distance_b = (x - (col_b + 0.5) * step_x) ** 2 + (y - (row_b + 0.5) * step_y) ** 2
+        use_a = distance_a <= distance_b
+        
+        # Index in half steps so both lattices share one integer grid
+        column = np.where(use_a, 2 * col_a, 2 * col_b + 1).astype(np.int64)
+        row = np.where(use_a, 2 * row_a, 2 * row_b + 1).astype(np.int64)
+        return column, row, column * step_x / 2, row * step_y / 2
+    
+    def _square_cells(self, x: np.ndarray, y: np.ndarray, size: float):
+        column = np.floor(x / size).astype(np.int64)
+        row = np.floor(y / size).astype(np.int64)
+        return column, row, (column + 0.5) * size, (row + 0.5) * size
+    
+    @staticmethod
+    def summarise(inverse: np.ndarray, n_groups: int, measures: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """Per-group statistics for points labelled ``0..n_groups-1`` by ``inverse``."""
+        counts = np.bincount(inverse, minlength=n_groups)
+        
+        # One bincount over (group, rating) pairs gives the whole distribution
+        width = len(RATINGS) + 1
+        rating_counts = np.bincount(inverse * width + measures['rating_index'],
+                                    minlength=n_groups * width).reshape(n_groups, width)
+        rated = rating_counts[:, :len(RATINGS)]
+        
+        def mean(values: np.ndarray) -> np.ndarray:
+            present = ~np.isnan(values)
+            total = np.bincount(inverse, weights=np.where(present, values, 0), minlength=n_groups)
+            count = np.bincount(inverse, weights=present, minlength=n_groups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return total / count
+        
+        co2 = measures['co2']
+        cells = pd.DataFrame({
+            'property_count': counts,
+            'current-energy-rating': np.where(rated.any(axis=1),
+                                              np.array(RATINGS, dtype=object)[rated.argmax(axis=1)],
+                                              None),
+            'avg_energy_efficiency': np.round(mean(measures['efficiency']), 1),
+            'co2_emissions_total': np.round(np.bincount(inverse, weights=np.nan_to_num(co2),
+                                                        minlength=n_groups), 1),
+        })
+        for i, rating in enumerate(RATINGS):
+            cells[f'rating_{rating.lower()}'] = rated[:, i]
+        
+        return cells
+    
+    def cell_polygons(self, cells: pd.DataFrame) -> np.ndarray:
+        """Closed rings of ``(lng, lat)`` vertices, shaped ``(cells, vertices, 2)``."""
+        size = cells.attrs['cell_size']
+        
+        if cells.attrs['shape'] == 'hex':
+            angles = np.radians(np.arange(30, 391, 60))
+            offsets = np.column_stack([np.cos(angles), np.sin(angles)]) * size
+        else:
+            offsets = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1], [-1, -1]]) * size / 2
+        
+        centre_x = cells['longitude'].to_numpy() * self.x_scale
+        centre_y = cells['latitude'].to_numpy() * self.METRES_PER_DEGREE
+        rings = np.empty((len(cells), len(offsets), 2))
+        rings[:, :, 0] = (centre_x[:, None] + offsets[:, 0]) / self.x_scale
+        rings[:, :, 1] = (centre_y[:, None] + offsets[:, 1]) / self.METRES_PER_DEGREE
+        return np.round(rings, 6)
+    
+    def to_geojson(self, cells: pd.DataFrame, polygons: bool = True) -> Dict:
+        """A FeatureCollection of cell polygons, or centre points for attribute groups."""
+        records = self.cell_properties(cells)
+        
+        if polygons and 'cell_size' in cells.attrs:
+            geometries = [{"type": "Polygon", "coordinates": [ring]}
+                          for ring in self.cell_polygons(cells).tolist()]
+        else:
+            geometries = [{"type": "Point", "coordinates": [lng, lat]}
+                          for lng, lat in zip(cells['longitude'].round(6).tolist(),
+                                              cells['latitude'].round(6).tolist())]
+        
+        return {
+            "type": "FeatureCollection",
+            "crs": {
+                "type": "name",
+                "properties": {
+                    "name": Config.GEOJSON_CRS
+                }
+            },
+            "features": [
+                {"type": "Feature", "geometry": geometry, "properties": properties}
+                for geometry, properties in zip(geometries, records)
+            ]
+        }
+    
+    @staticmethod
+    def cell_properties(cells: pd.DataFrame) -> List[Dict]:
+        rating_columns = [f'rating_{rating.lower()}' for rating in RATINGS]
+        columns = [col for col in cells.columns
+                   if col not in rating_columns and col not in ('latitude', 'longitude')]
+        
+        values = {col: cells[col].astype(object).where(cells[col].notna(), None).tolist()
+                  for col in columns}
+        distributions = cells[rating_columns].to_numpy().tolist()
+        
+        records = []
+        for i, counts in enumerate(distributions):
+            properties = {col: values[col][i] for col in columns}
+            properties['energy_rating_distribution'] = {
+                rating: count for rating, count in zip(RATINGS, counts) if count
+            }
+            records.append(properties)
+        return records
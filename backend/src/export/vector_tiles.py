@@ -0,0 +1,315 @@
+import gzip
+import json
+import math
+import sqlite3
+import struct
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+RATINGS = list('ABCDEFG')
+
+# Mapbox Vector Tile (protobuf) encoding, enough for a single point layer.
+# Field numbers follow vector_tile.proto v2.
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+def _key(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+def _packed_field(field: int, values: List[int]) -> bytes:
+    return _bytes_field(field, b''.join(_varint(value) for value in values))
+
+def _encode_value(value) -> bytes:
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode('utf-8'))
+
+def encode_point_layer(name: str, features: List[Tuple[int, int, Dict]],
+                       extent: int = 4096) -> bytes:
+    """Encode ``(x, y, properties)`` points, in tile coordinates, as one MVT layer."""
+    keys, values = {}, {}
+    encoded_features = []
+    
+    for x, y, properties in features:
+        tags = []
+        for key, value in properties.items():
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        
+        feature = (_packed_field(2, tags) +
+                   _key(3, 0) + _varint(1) +
+                   _packed_field(4, [9, _zigzag(x), _zigzag(y)]))
+        encoded_features.append(_bytes_field(2, feature))
+    
+    layer = (_key(15, 0) + _varint(2) +
+             _bytes_field(1, name.encode('utf-8')) +
+             b''.join(encoded_features) +
+             b''.join(_bytes_field(3, key.encode('utf-8')) for key in keys) +
+             b''.join(_bytes_field(4, _encode_value(value)) for _, value in values) +
+             _key(5, 0) + _varint(extent))
+    
+    return _bytes_field(3, layer)
+
+class VectorTileExporter:
+    """Point certificates as Mapbox Vector Tiles in an MBTiles archive.
+    
+    Every zoom level is precomputed. Up to ``cluster_max_zoom`` points are
+    merged into grid clusters carrying counts, the rating distribution and
+    mean efficiency; above it each certificate is its own feature.
+    MBTiles converts to PMTiles with ``pmtiles convert`` when a single
+    static file is preferred.
+    """
+    
+    LAYER_NAME = 'epc'
+    EXTENT = 4096
+    
+    TILE_PROPERTIES = [
+        'lmk-key', 'uprn', 'postcode', 'property-type',
+        'current-energy-rating', 'potential-energy-rating',
+        'current-energy-efficiency', 'potential-energy-efficiency',
+        'co2-emissions-current', 'lodgement-date'
+    ]
+    
+    def __init__(self, export_path: Optional[str] = None):
+        self.export_path = Path(export_path or Config.DEFAULT_EXPORT_PATH)
+        self.export_path.mkdir(parents=True, exist_ok=True)
+    
+    def export(self, data: pd.DataFrame, filename: str,
+               properties: Optional[List[str]] = None,
+               min_zoom: int = 0, max_zoom: int = 14,
+               cluster_max_zoom: int = 10, cluster_radius: int = 64) -> str:
+        """Write ``data`` (with latitude/longitude) to ``{filename}.mbtiles``.
+        
+        ``cluster_radius`` is the cluster cell size in tile units and must
+        divide the 4096 extent, so no cell straddles two tiles.
+        """
+        if self.EXTENT % cluster_radius:
+            raise ValueError(f"cluster_radius must divide {self.EXTENT}")
+        
+        if 'latitude' not in data.columns or 'longitude' not in data.columns:
+            logger.warning("No coordinates in data, nothing to export as vector tiles")
+            return ""
+        
+        lat = pd.to_numeric(data['latitude'], errors='coerce')
+        lng = pd.to_numeric(data['longitude'], errors='coerce')
+        valid = lat.notna() & lng.notna() & (lat.abs() < 85.05)
+        data, lat, lng = data[valid], lat[valid].to_numpy(), lng[valid].to_numpy()
+        
+        if data.empty:
+            logger.warning("No geocoded data to export as vector tiles")
+            return ""
+        
+        columns = [col for col in (properties or self.TILE_PROPERTIES) if col in data.columns]
+        filepath = self.export_path / f"{filename}.mbtiles"
+        filepath.unlink(missing_ok=True)
+        
+        # Web Mercator position in [0, 1) across the world at zoom 0
+        x = (lng + 180.0) / 360.0
+        sin_lat = np.sin(np.radians(lat))
+        y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+        
+        rating_index = np.full(len(data), len(RATINGS), dtype=np.int64)
+        if 'current-energy-rating' in data.columns:
+            ratings = data['current-energy-rating'].astype('string').str.strip().str.upper()
+            codes = pd.Categorical(ratings, categories=RATINGS).codes.astype(np.int64)
+            rating_index = np.where(codes >= 0, codes, len(RATINGS))
+        
+        efficiency = np.full(len(data), np.nan)
+        if 'current-energy-efficiency' in data.columns:
+            efficiency = pd.to_numeric(data['current-energy-efficiency'],
+                                       errors='coerce').to_numpy(dtype=float)
+        
+        point_properties = self._point_properties(data[columns])
+        tile_count = 0
+        
+        try:
+            # The connection's own context manager only commits; closing() releases it
+            with closing(sqlite3.connect(filepath)) as conn, conn:
+                self._create_schema(conn)
+                
+                for zoom in range(min_zoom, max_zoom + 1):
+                    if zoom <= cluster_max_zoom:
+                        tiles = self._cluster_tiles(zoom, x, y, rating_index, efficiency,
+                                                    cluster_radius)
+                    else:
+                        tiles = self._point_tiles(zoom, x, y, point_properties)
+                    
+                    rows = [
+                        (zoom, tile_x, (1 << zoom) - 1 - tile_y,
+                         gzip.compress(encode_point_layer(self.LAYER_NAME, features,
+                                                          self.EXTENT)))
+                        for tile_x, tile_y, features in tiles
+                    ]
+                    conn.executemany('INSERT INTO tiles VALUES (?, ?, ?, ?)', rows)
+                    tile_count += len(rows)
+                
+                self._write_metadata(conn, filename, lat, lng, min_zoom, max_zoom, columns)
+        
+        except Exception as e:
+            logger.error(f"Failed to export vector tiles: {str(e)}")
+            return ""
+        
+        logger.info(f"Exported {len(data)} certificates as {tile_count} vector tiles "
+                    f"(z{min_zoom}-{max_zoom}) to {filepath}")
+        return str(filepath)
+    
+    def _point_properties(self, data: pd.DataFrame) -> List[Dict]:
+        columns = {}
+        for col in data.columns:
+            column = data[col]
+            if not pd.api.types.is_numeric_dtype(column):
+                column = column.astype(str)
+            columns[col] = column.astype(object).where(data[col].notna(), None).tolist()
+        
+        names = list(columns)
+        return [{name: value for name, value in zip(names, row) if value is not None}
+                for row in zip(*columns.values())]
+    
+    def _tile_positions(self, zoom: int, x: np.ndarray, y: np.ndarray):
+        scale = (1 << zoom) * self.EXTENT
+        px = np.clip(np.floor(x * scale), 0, scale - 1).astype(np.int64)
+        py = np.clip(np.floor(y * scale), 0, scale - 1).astype(np.int64)
+        return px, py
+    
+    def _group_by_tile(self, zoom: int, px: np.ndarray, py: np.ndarray) -> Iterator[Tuple[int, int, np.ndarray]]:
+        tile_x, tile_y = px // self.EXTENT, py // self.EXTENT
+        tile_ids = tile_x * (1 << zoom) + tile_y
+        order = np.argsort(tile_ids, kind='stable')
+        boundaries = np.flatnonzero(np.diff(tile_ids[order])) + 1
+        
+        for members in np.split(order, boundaries):
+            yield int(tile_x[members[0]]), int(tile_y[members[0]]), members
+    
+    def _point_tiles(self, zoom: int, x: np.ndarray, y: np.ndarray,
+                     point_properties: List[Dict]):
+        px, py = self._tile_positions(zoom, x, y)
+        
+        for tile_x, tile_y, members in self._group_by_tile(zoom, px, py):
+            local_x = px[members] - tile_x * self.EXTENT
+            local_y = py[members] - tile_y * self.EXTENT
+            features = [(int(fx), int(fy), point_properties[i])
+                        for fx, fy, i in zip(local_x, local_y, members)]
+            yield tile_x, tile_y, features
+    
+    def _cluster_tiles(self, zoom: int, x: np.ndarray, y: np.ndarray,
+                       rating_index: np.ndarray, efficiency: np.ndarray, radius: int):
+        px, py = self._tile_positions(zoom, x, y)
+        
+        # Bin into square cells, then aggregate every cell with bincount
+        cells_per_row = ((1 << zoom) * self.EXTENT) // radius + 1
+        cell_ids = (px // radius) * cells_per_row + (py // radius)
+        _, inverse, counts = np.unique(cell_ids, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        n_cells = len(counts)
+        
+        # Clusters sit at their members' mean position, inside their cell
+        centre_x = (np.bincount(inverse, weights=px, minlength=n_cells) / counts).astype(np.int64)
+        centre_y = (np.bincount(inverse, weights=py, minlength=n_cells) / counts).astype(np.int64)
+        
+        rating_counts = np.bincount(inverse * (len(RATINGS) + 1) + rating_index,
+                                    minlength=n_cells * (len(RATINGS) + 1))
+        rating_counts = rating_counts.reshape(n_cells, len(RATINGS) + 1)
+        
+        has_efficiency = ~np.isnan(efficiency)
+        efficiency_sum = np.bincount(inverse, weights=np.where(has_efficiency, efficiency, 0),
+                                     minlength=n_cells)
+        efficiency_count = np.bincount(inverse, weights=has_efficiency, minlength=n_cells)
+        
+        cluster_properties = []
+        for i in range(n_cells):
+            properties = {'point_count': int(counts[i]), 'cluster': bool(counts[i] > 1)}
+            rated = rating_counts[i, :len(RATINGS)]
+            if rated.any():
+                properties['current-energy-rating'] = RATINGS[int(rated.argmax())]
+            for rating, count in zip(RATINGS, rated):
+                if count:
+                    properties[f'rating_{rating.lower()}'] = int(count)
+            if efficiency_count[i]:
+                properties['avg_energy_efficiency'] = round(
+                    float(efficiency_sum[i] / efficiency_count[i]), 1
+                )
+            cluster_properties.append(properties)
+        
+        for tile_x, tile_y, members in self._group_by_tile(zoom, centre_x, centre_y):
+            local_x = centre_x[members] - tile_x * self.EXTENT
+            local_y = centre_y[members] - tile_y * self.EXTENT
+            features = [(int(fx), int(fy), cluster_properties[i])
+                        for fx, fy, i in zip(local_x, local_y, members)]
+            yield tile_x, tile_y, features
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute('CREATE TABLE metadata (name TEXT, value TEXT)')
+        conn.execute('''
+            CREATE TABLE tiles (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+            )
+        ''')
+        conn.execute('''
+            CREATE UNIQUE INDEX tile_index
+            ON tiles (zoom_level, tile_column, tile_row)
+        ''')
+    
+    def _write_metadata(self, conn: sqlite3.Connection, name: str, lat: np.ndarray,
+                        lng: np.ndarray, min_zoom: int, max_zoom: int, columns: List[str]):
+        bounds = [float(lng.min()), float(lat.min()), float(lng.max()), float(lat.max())]
+        fields = {column: 'String' for column in columns}
+        fields.update({'point_count': 'Number', 'cluster': 'Boolean',
+                       'avg_energy_efficiency': 'Number'})
+        
+        metadata = {
+            'name': name,
+            'format': 'pbf',
+            'type': 'overlay',
+            'minzoom': str(min_zoom),
+            'maxzoom': str(max_zoom),
+            'bounds': ','.join(f'{value:.6f}' for value in bounds),
+            'center': f'{(bounds[0] + bounds[2]) / 2:.6f},{(bounds[1] + bounds[3]) / 2:.6f},'
+                      f'{min(max_zoom, 10)}',
+            'json': json.dumps({'vector_layers': [{
+                'id': self.LAYER_NAME,
+                'fields': fields,
+                'minzoom': min_zoom,
+                'maxzoom': max_zoom
+            }]})
+        }
+        conn.executemany('INSERT INTO metadata VALUES (?, ?)', metadata.items())
+    
+    @staticmethod
+    def read_tile(mbtiles_path: str, zoom: int, x: int, y: int) -> Optional[bytes]:
+        """Gzipped tile for XYZ coordinates, or None when the tile is empty."""
+        with closing(sqlite3.connect(f'file:{mbtiles_path}?mode=ro', uri=True)) as conn:
+            row = conn.execute('''
+                SELECT tile_data FROM tiles
+                WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?
+            ''', (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+# Modules import ``config`` and ``src`` from the backend directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+import pytest
+
+from src.data.database import EPCDatabase
+
+def make_certificates(count, start=0, **overrides):
+    """Domestic certificate rows shaped like the API's search results."""
+    rows = []
+    
+    for i in range(start, start + count):
+        row = {
+            'lmk-key': f'LMK{i:06d}',
+            'uprn': str(100000 + i),
+            'postcode': f'GU5 {i % 10}AA',
+            'local-authority': 'E07000209' if i % 2 else 'E07000216',
+            'current-energy-rating': 'ABCDEFG'[i % 7],
+            'current-energy-efficiency': 40 + i % 50,
+            'lodgement-date': f'{2010 + i % 12}-03-01',
+            'property-type': 'House' if i % 3 else 'Flat',
+            'address1': f'{i} High Street',
+            'roof-description': None,
+        }
+        row.update(overrides)
+        rows.append(row)
+    
+    return pd.DataFrame(rows)
+
+@pytest.fixture
+def db(tmp_path):
+    database = EPCDatabase(str(tmp_path / 'epc_cache.db'))
+    yield database
+    database.connections.close()
@@ -0,0 +1,107 @@
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+from src.data.connection import SQLiteConnectionManager
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteConnectionManager(str(tmp_path / 'test.db'))
+    manager.write(lambda conn: conn.execute('CREATE TABLE items (value INTEGER)'))
+    yield manager
+    manager.close()
+
+def in_thread(func):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=func()))
+    thread.start()
+    thread.join()
+    return result.get('value')
+
+def test_for_path_shares_one_manager_per_file(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    assert SQLiteConnectionManager.for_path(path) is SQLiteConnectionManager.for_path(path)
+
+def test_each_thread_reads_through_its_own_connection(manager):
+    with manager.read() as main_conn:
+        with manager.read() as again:
+            assert again is main_conn
+    
+    def other():
+        with manager.read() as conn:
+            return id(conn)
+    
+    assert in_thread(other) != id(main_conn)
+
+def test_reader_is_closed_when_its_thread_exits(manager):
+    def read():
+        with manager.read() as conn:
+            conn.execute('SELECT 1')
+    
+    for _ in range(5):
+        in_thread(read)
+    gc.collect()
+    
+    assert manager._readers == set()
+
+def test_readers_reopen_after_close(manager):
+    opened = threading.Event()
+    resume = threading.Event()
+    values = []
+    
+    def reader():
+        with manager.read() as conn:
+            conn.execute('SELECT 1')
+        opened.set()
+        resume.wait()
+        with manager.read() as conn:
+            values.append(conn.execute('SELECT COUNT(*) FROM items').fetchone()[0])
+    
+    thread = threading.Thread(target=reader)
+    thread.start()
+    opened.wait()
+    manager.close()
+    resume.set()
+    thread.join()
+    
+    assert values == [0]
+
+def test_writes_are_committed_and_visible_to_readers(manager):
+    manager.write(lambda conn: conn.executemany('INSERT INTO items VALUES (?)',
+                                                [(1,), (2,), (3,)]))
+    with manager.read() as conn:
+        assert conn.execute('SELECT SUM(value) FROM items').fetchone()[0] == 6
+
+def test_failed_write_rolls_back_and_raises(manager):
+    def write(conn):
+        conn.execute('INSERT INTO items VALUES (1)')
+        conn.execute('INSERT INTO missing VALUES (1)')
+    
+    with pytest.raises(sqlite3.OperationalError):
+        manager.write(write)
+    with manager.read() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+
+def test_failed_submit_is_logged(manager, caplog):
+    future = manager.submit(lambda conn: conn.execute('INSERT INTO missing VALUES (1)'))
+    with pytest.raises(sqlite3.OperationalError):
+        future.result()
+    assert 'Database write failed' in caplog.text
+
+def test_nested_write_runs_on_the_writer_thread(manager):
+    def outer(conn):
+        conn.execute('INSERT INTO items VALUES (1)')
+        return manager.write(lambda inner: inner.execute('SELECT COUNT(*) FROM items').fetchone()[0])
+    
+    assert manager.write(outer) == 1
+
+def test_concurrent_submits_are_serialised(manager):
+    futures = [manager.submit(lambda conn, i=i: conn.execute('INSERT INTO items VALUES (?)', (i,)))
+               for i in range(200)]
+    for future in futures:
+        future.result()
+    
+    with manager.read() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 200
@@ -0,0 +1,156 @@
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pytest
+
+from src.data.job_queue import (CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING,
+                                JobQueue)
+
+WAIT = 5
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), workers=1)
+    yield queue
+    queue.shutdown()
+    queue.connections.close()
+
+def wait_for(queue: JobQueue, job_id: str, status: str) -> dict:
+    for _ in range(WAIT * 100):
+        # Progress is written on the writer thread; a blocking write flushes it
+        queue.connections.write(lambda conn: None)
+        job = queue.status(job_id)
+        if job['status'] == status:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"Job {job_id} is {job['status']}, expected {status}")
+
+def test_job_result_and_progress(queue):
+    def count(context, params):
+        for i in range(params['n']):
+            context.progress('counting', i + 1, params['n'])
+        return {'counted': params['n']}
+    
+    queue.register('count', count)
+    job_id = queue.submit('count', {'n': 4})
+    job = wait_for(queue, job_id, COMPLETED)
+    
+    assert job['result'] == {'counted': 4}
+    assert job['params'] == {'n': 4}
+    assert (job['stage'], job['completed'], job['total'], job['percent']) == ('counting', 4, 4, 100.0)
+    assert job['started_at'] and job['finished_at']
+    assert job_id not in queue._running
+
+def test_failed_job_records_the_error(queue):
+    def fail(context, params):
+        raise RuntimeError('API unavailable')
+    
+    queue.register('fail', fail)
+    job = wait_for(queue, queue.submit('fail'), FAILED)
+    assert job['error'] == 'API unavailable'
+
+def test_unknown_job_type_is_rejected(queue):
+    with pytest.raises(ValueError):
+        queue.submit('missing')
+    assert queue.status('missing') is None
+
+def test_running_job_stops_at_its_next_progress_report(queue):
+    started, release = threading.Event(), threading.Event()
+    
+    def loop(context, params):
+        started.set()
+        release.wait(WAIT)
+        context.progress('looping', 1)
+        return {'finished': True}
+    
+    queue.register('loop', loop)
+    job_id = queue.submit('loop')
+    assert started.wait(WAIT)
+    
+    assert queue.cancel(job_id)
+    assert queue.status(job_id)['cancel_requested']
+    release.set()
+    
+    job = wait_for(queue, job_id, CANCELLED)
+    assert job['result'] is None
+    assert job_id not in queue._running
+    assert not queue.cancel(job_id)
+
+def test_queued_job_is_cancelled_before_it_starts(queue):
+    release = threading.Event()
+    ran = []
+    
+    queue.register('block', lambda context, params: release.wait(WAIT) and None)
+    queue.register('record', lambda context, params: ran.append(params))
+    
+    blocker = queue.submit('block')
+    job_id = queue.submit('record', {'x': 1})
+    assert queue.status(job_id)['status'] == QUEUED
+    
+    assert queue.cancel(job_id)
+    assert queue.status(job_id)['status'] == CANCELLED
+    assert job_id not in queue._running
+    
+    release.set()
+    wait_for(queue, blocker, COMPLETED)
+    assert ran == []
+
+def test_restart_marks_interrupted_jobs_failed(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path, workers=1)
+    queue.shutdown()
+    
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany('INSERT INTO jobs (id, kind, status) VALUES (?, ?, ?)',
+                         [('a', 'search', QUEUED), ('b', 'search', RUNNING),
+                          ('c', 'search', COMPLETED)])
+    conn.close()
+    
+    restarted = JobQueue(db_path, workers=1)
+    try:
+        assert restarted.status('a')['status'] == FAILED
+        assert restarted.status('b')['error'] == 'Interrupted by a restart'
+        assert restarted.status('c')['status'] == COMPLETED
+    finally:
+        restarted.shutdown()
+        restarted.connections.close()
+
+def test_purge_removes_only_old_finished_jobs(queue):
+    queue.register('noop', lambda context, params: None)
+    job_id = wait_for(queue, queue.submit('noop'), COMPLETED)['id']
+    queue.connections.write(lambda conn: conn.executemany(
+        "INSERT INTO jobs (id, kind, status, finished_at) VALUES (?, 'noop', ?, ?)",
+        [('old', COMPLETED, '2000-01-01 00:00:00'), ('stuck', RUNNING, None)]
+    ))
+    
+    assert queue.purge() == 1
+    assert queue.status('old') is None
+    assert queue.status(job_id) is not None and queue.status('stuck') is not None
+    
+    assert queue.purge(timedelta(seconds=-60)) == 1
+    assert queue.status(job_id) is None
+
+def test_shutdown_cancels_queued_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), workers=1)
+    started = threading.Event()
+    ran = []
+    
+    def block(context, params):
+        started.set()
+        while not context.cancelled:
+            threading.Event().wait(0.01)
+        context.check()
+    
+    queue.register('block', block)
+    queue.register('record', lambda context, params: ran.append(params))
+    blocker = queue.submit('block')
+    queue.submit('record')
+    assert started.wait(WAIT)
+    
+    queue.shutdown()
+    try:
+        assert ran == []
+        assert queue.status(blocker)['status'] == CANCELLED
+    finally:
+        queue.connections.close()
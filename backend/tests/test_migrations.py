@@ -0,0 +1,94 @@
+import json
+import sqlite3
+
+from src.data.database import SCHEMA_VERSION, EPCDatabase
+from src.data.rollups import rebuild_rollups
+
+# The cache schema before any migrations: certificates as plain JSON text
+BASELINE_SCHEMA = '''
+    CREATE TABLE epc_certificates (
+        certificate_id TEXT PRIMARY KEY,
+        property_type TEXT NOT NULL,
+        data JSON NOT NULL,
+        cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE search_cache (
+        search_hash TEXT PRIMARY KEY,
+        search_params JSON NOT NULL,
+        result_count INTEGER,
+        cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_accessed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+LEGACY_ROWS = [
+    ('LMK1', 'domestic', {'lmk-key': 'LMK1', 'postcode': 'GU5 0AA', 'uprn': 1001.0,
+                          'local-authority': 'E07000209', 'current-energy-rating': 'C',
+                          'current-energy-efficiency': 72, 'lodgement-date': '2019-05-01',
+                          'property-type': 'House', 'roof-description': None}),
+    ('LMK2', 'domestic', {'lmk-key': 'LMK2', 'postcode': 'GU5 0AB', 'uprn': None,
+                          'local-authority': 'E07000209', 'current-energy-rating': 'E',
+                          'current-energy-efficiency': float('nan'),
+                          'lodgement-date': '2012-01-09', 'property-type': 'Flat'}),
+]
+
+def make_baseline(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany('INSERT INTO epc_certificates (certificate_id, property_type, data) '
+                     'VALUES (?, ?, ?)',
+                     [(key, kind, json.dumps(data)) for key, kind, data in LEGACY_ROWS])
+    conn.commit()
+    conn.close()
+
+def rollups(conn):
+    return conn.execute('SELECT * FROM analytics_rollups ORDER BY 1, 2, 3, 4').fetchall()
+
+def test_baseline_cache_migrates_to_current_schema(tmp_path):
+    path = str(tmp_path / 'epc_cache.db')
+    make_baseline(path)
+    
+    db = EPCDatabase(path)
+    try:
+        with db.connections.read() as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+            
+            # Hot fields are backfilled into typed columns; float UPRNs lose their ".0"
+            assert conn.execute('''
+                SELECT uprn, postcode, current_energy_rating, current_energy_efficiency,
+                       building_type
+                FROM epc_certificates ORDER BY certificate_id
+            ''').fetchall() == [('1001', 'GU5 0AA', 'C', 72, 'House'),
+                                (None, 'GU5 0AB', 'E', None, 'Flat')]
+            
+            # Payloads are compressed
+            assert {row[0] for row in conn.execute(
+                'SELECT typeof(data) FROM epc_certificates')} == {'blob'}
+            
+            # Rollups agree with a rebuild from scratch
+            migrated = rollups(conn)
+        
+        db.connections.write(rebuild_rollups)
+        with db.connections.read() as conn:
+            assert rollups(conn) == migrated
+        
+        data = db.get_certificates({'postcode': 'GU5 0AA'}, 'domestic')
+        assert data['lmk-key'].tolist() == ['LMK1']
+        assert data['uprn'].tolist() == [1001.0]
+        
+        # Columns are recorded from the legacy payloads, so a field missing
+        # from one certificate is still a column when reading another
+        assert 'property-type' in db.get_certificates({'postcode': 'GU5 0AB'}, 'domestic')
+    finally:
+        db.connections.close()
+
+def test_reopening_a_current_cache_is_a_no_op(tmp_path, db):
+    db.connections.close()
+    reopened = EPCDatabase(db.db_path)
+    try:
+        with reopened.connections.read() as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+            assert conn.execute('SELECT COUNT(*) FROM certificate_columns').fetchone()[0] == 0
+    finally:
+        reopened.connections.close()
@@ -0,0 +1,83 @@
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.payload import (FORMAT_ZLIB_V1, FORMAT_ZLIB_V2, ZLIB_DICTIONARY,
+                              decode_payload, encode_rows)
+from conftest import make_certificates
+
+def test_round_trip_strips_nulls():
+    rows = pd.DataFrame([
+        {'lmk-key': 'A', 'postcode': 'GU5 0AA', 'uprn': None, 'floor-height': np.nan,
+         'current-energy-efficiency': 71},
+        {'lmk-key': 'B', 'postcode': None, 'uprn': '1001', 'floor-height': 2.4,
+         'current-energy-efficiency': None},
+    ])
+    
+    payloads = encode_rows(rows)
+    
+    assert all(payload[:1] == FORMAT_ZLIB_V1 for payload in payloads)
+    assert [decode_payload(payload) for payload in payloads] == [
+        {'lmk-key': 'A', 'postcode': 'GU5 0AA', 'current-energy-efficiency': 71.0},
+        {'lmk-key': 'B', 'uprn': '1001', 'floor-height': 2.4},
+    ]
+
+def test_all_null_row_encodes_as_empty_object():
+    rows = pd.DataFrame([{'lmk-key': None, 'postcode': None}])
+    assert decode_payload(encode_rows(rows)[0]) == {}
+
+@pytest.mark.parametrize('value', [
+    'a,"b":null',
+    'quote " and backslash \\',
+    '{,"x":null}',
+    'line\nbreak',
+    'Café – St Mary’s',
+])
+def test_string_values_survive_null_stripping(value):
+    rows = pd.DataFrame([{'address': value, 'postcode': None, 'uprn': '1'}])
+    assert decode_payload(encode_rows(rows)[0]) == {'address': value, 'uprn': '1'}
+
+def test_dates_are_iso_formatted():
+    rows = pd.DataFrame({'lodgement-datetime': pd.to_datetime(['2020-01-02 03:04:05'])})
+    assert decode_payload(encode_rows(rows)[0])['lodgement-datetime'].startswith(
+        '2020-01-02T03:04:05')
+
+def test_compressed_payload_is_smaller_than_json():
+    rows = make_certificates(50)
+    plain = rows.to_json(orient='records', lines=True).encode()
+    assert sum(map(len, encode_rows(rows))) < len(plain) / 2
+
+def test_plain_json_text_still_decodes():
+    assert decode_payload('{"lmk-key": "A", "uprn": null}') == {'lmk-key': 'A', 'uprn': None}
+
+def test_version_2_payload_still_decodes():
+    compressor = zlib.compressobj(zdict=ZLIB_DICTIONARY)
+    body = json.dumps({'lmk-key': 'A', 'uprn': None}).encode()
+    payload = FORMAT_ZLIB_V2 + compressor.compress(body) + compressor.flush()
+    assert decode_payload(payload) == {'lmk-key': 'A', 'uprn': None}
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        decode_payload(b'\x7fdata')
+
+def test_cache_reads_restore_stripped_columns(db):
+    rows = make_certificates(3)
+    db.store_certificates(rows, 'domestic')
+    
+    data = db.get_certificates({'local-authority': 'E07000216'}, 'domestic')
+    assert list(data.columns) == list(rows.columns)
+    assert data['roof-description'].isna().all()
+    
+    record = db.get_certificate_by_id('LMK000000')
+    assert set(record) == set(rows.columns)
+    assert record['roof-description'] is None
+
+def test_duplicated_index_stores_each_certificate_under_its_own_key(db):
+    rows = pd.concat([make_certificates(2), make_certificates(2, start=2)])
+    assert db.store_certificates(rows, 'domestic') == 4
+    
+    for i in range(4):
+        assert db.get_certificate_by_id(f'LMK{i:06d}')['address1'] == f'{i} High Street'
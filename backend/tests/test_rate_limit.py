@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from src.api.rate_limit import AdaptiveRateLimiter, parse_retry_after
+from config.settings import Config
+
+def make_limiter(**kwargs):
+    options = dict(rate=10, min_rate=1, max_rate=20, burst=2, latency_target=1.0)
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options)
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('', None),
+    ('5', 5.0),
+    ('0.5', 0.5),
+    ('-3', 0.0),
+    ('soon', None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+def test_parse_retry_after_past_date_is_zero():
+    retry_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == 0.0
+
+def test_initial_rate_is_clamped():
+    assert make_limiter(rate=100).current_rate == 20
+    assert make_limiter(rate=0.1).current_rate == 1
+
+def test_fast_success_increases_rate_additively():
+    limiter = make_limiter()
+    limiter.record_response(200, 0.1)
+    assert limiter.current_rate == pytest.approx(10 + Config.RATE_LIMIT_INCREASE)
+
+def test_rate_never_exceeds_maximum():
+    limiter = make_limiter(rate=19.9)
+    for _ in range(5):
+        limiter.record_response(200, 0.1)
+    assert limiter.current_rate == 20
+
+def test_slow_success_eases_rate():
+    limiter = make_limiter()
+    limiter.record_response(200, 5.0)
+    assert limiter.current_rate == pytest.approx(9.0)
+
+def test_throttle_halves_rate_down_to_minimum():
+    limiter = make_limiter(rate=3)
+    limiter.record_response(429, 0.1)
+    assert limiter.current_rate == pytest.approx(1.5)
+    limiter.record_response(429, 0.1)
+    assert limiter.current_rate == 1
+    assert limiter.stats()['throttled'] == 2
+
+def test_server_errors_leave_rate_unchanged():
+    limiter = make_limiter()
+    limiter.record_response(503, 0.1)
+    assert limiter.current_rate == 10
+
+def test_retry_after_pauses_every_caller():
+    limiter = make_limiter()
+    limiter.record_response(429, 0.1, retry_after=30)
+    assert 29 < limiter.try_acquire() <= 30
+    assert limiter.stats()['paused_for'] > 29
+
+def test_try_acquire_spends_burst_then_reports_wait():
+    limiter = make_limiter()
+    assert limiter.try_acquire() == 0.0
+    assert limiter.try_acquire() == 0.0
+    
+    wait_time = limiter.try_acquire()
+    assert 0 < wait_time <= 1 / 10
+    assert limiter.stats()['requests'] == 2
+
+def test_get_records_response_and_retry_after():
+    class Response:
+        status_code = 429
+        headers = {'Retry-After': '10'}
+    
+    class Session:
+        def get(self, url, **kwargs):
+            return Response()
+    
+    limiter = make_limiter()
+    assert limiter.get(Session(), 'https://example.test').status_code == 429
+    assert limiter.current_rate == 5
+    assert limiter.try_acquire() > 9
@@ -0,0 +1,159 @@
+import importlib
+import time
+
+import pytest
+
+from config.settings import Config
+from src.data import response_cache as response_cache_module
+from src.data.database import EPCDatabase
+from src.data.response_cache import ResponseCache
+from src.data.result_store import ResultStore
+from conftest import make_certificates
+
+def test_key_ignores_formatting_and_empty_fields():
+    cache = ResponseCache(ttl_minutes=1)
+    key = cache.key('analytics', {'local_authority': ' E07000216 ', 'postcode': ''})
+    
+    assert key == cache.key('analytics', {'postcode': None, 'local_authority': 'E07000216'})
+    assert key != cache.key('search', {'local_authority': 'E07000216'})
+    assert key != cache.key('analytics', {'local_authority': 'E07000209'})
+
+def test_entry_is_served_for_its_version_only():
+    cache = ResponseCache(ttl_minutes=1)
+    entry = cache.put('k', b'{"a": 1}', '1@2024-01-01 00:00:00')
+    
+    assert cache.get('k', '1@2024-01-01 00:00:00') is entry
+    assert cache.get('k', '2@2024-01-01 00:00:00') is None
+    # A stale entry is dropped rather than kept for the old version
+    assert cache.get('k', '1@2024-01-01 00:00:00') is None
+    assert cache.stats() == {'entries': 0, 'bytes': 0, 'hits': 1, 'misses': 2}
+
+def test_etag_follows_the_body():
+    cache = ResponseCache(ttl_minutes=1)
+    assert cache.put('a', b'{}', 'v').etag == cache.put('b', b'{}', 'v').etag
+    assert cache.put('a', b'{}', 'v').etag != cache.put('a', b'[]', 'v').etag
+
+def test_entries_expire(monkeypatch):
+    cache = ResponseCache(ttl_minutes=1)
+    cache.put('k', b'{}', 'v')
+    
+    now = time.time()
+    monkeypatch.setattr(response_cache_module.time, 'time', lambda: now + 61)
+    assert cache.get('k', 'v') is None
+
+def test_zero_ttl_disables_the_cache():
+    cache = ResponseCache(ttl_minutes=0)
+    assert cache.put('k', b'{}', 'v').etag
+    assert cache.get('k', 'v') is None
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(ttl_minutes=1, max_entries=2)
+    cache.put('a', b'1', 'v')
+    cache.put('b', b'2', 'v')
+    cache.get('a', 'v')
+    cache.put('c', b'3', 'v')
+    
+    assert cache.get('b', 'v') is None
+    assert cache.get('a', 'v') is not None and cache.get('c', 'v') is not None
+
+def test_size_cap_keeps_the_newest_entry():
+    cache = ResponseCache(ttl_minutes=1, max_mb=10 / (1024 * 1024))
+    cache.put('a', b'12345', 'v')
+    cache.put('b', b'123456789012', 'v')
+    
+    assert cache.get('a', 'v') is None
+    assert cache.get('b', 'v').body == b'123456789012'
+
+def test_entries_outlive_a_restart_with_a_database(tmp_path):
+    db_path = str(tmp_path / 'responses.db')
+    cache = ResponseCache(ttl_minutes=1, db_path=db_path)
+    entry = cache.put('k', b'{"a": 1}', 'v', last_modified=1700000000)
+    cache.connections.write(lambda conn: None)
+    
+    restarted = ResponseCache(ttl_minutes=1, db_path=db_path)
+    try:
+        loaded = restarted.get('k', 'v')
+        assert (loaded.body, loaded.etag, loaded.last_modified) == (entry.body, entry.etag,
+                                                                     1700000000)
+        
+        restarted.clear()
+        assert ResponseCache(ttl_minutes=1, db_path=db_path).get('k', 'v') is None
+    finally:
+        cache.connections.close()
+
+@pytest.fixture
+def webapp(tmp_path, monkeypatch):
+    # The app builds its components at import; point them at scratch files
+    for name, filename in [('DATABASE_PATH', 'epc_cache.db'), ('JOB_DATABASE_PATH', 'jobs.db'),
+                           ('GEOCODE_CACHE_PATH', 'geocode_cache.db')]:
+        monkeypatch.setattr(Config, name, str(tmp_path / filename))
+    monkeypatch.setattr(Config, 'RESPONSE_CACHE_PATH', None)
+    monkeypatch.setattr(Config, 'EPC_API_EMAIL', 'test@example.com')
+    monkeypatch.setattr(Config, 'EPC_API_KEY', 'key')
+    monkeypatch.setattr(Config, 'DEFAULT_EXPORT_PATH', str(tmp_path / 'exports'))
+    
+    app = importlib.import_module('webapp.app')
+    database = EPCDatabase(str(tmp_path / 'epc_cache.db'))
+    monkeypatch.setattr(app, 'epc_db', database)
+    monkeypatch.setattr(app, 'response_cache', ResponseCache(ttl_minutes=1))
+    monkeypatch.setattr(app, 'result_store', ResultStore())
+    
+    yield app
+    database.connections.close()
+
+def post_analytics(client, payload, **headers):
+    return client.post('/api/analytics', json=payload, headers=headers)
+
+def test_conditional_request_gets_not_modified(webapp):
+    webapp.epc_db.store_certificates(make_certificates(6), 'domestic')
+    client = webapp.app.test_client()
+    payload = {'source': 'cache', 'property_type': 'domestic'}
+    
+    first = post_analytics(client, payload)
+    assert first.status_code == 200 and first.headers['X-Cache'] == 'MISS'
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+    
+    second = post_analytics(client, payload)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_data() == first.get_data() and second.headers['ETag'] == etag
+    
+    not_modified = post_analytics(client, payload, **{'If-None-Match': etag})
+    assert not_modified.status_code == 304 and not_modified.get_data() == b''
+    
+    changed = post_analytics(client, payload, **{'If-None-Match': '"something-else"'})
+    assert changed.status_code == 200
+    
+    since = post_analytics(client, payload, **{'If-Modified-Since': first.headers['Last-Modified']})
+    assert since.status_code == 304
+
+def test_storing_certificates_invalidates_responses(webapp):
+    webapp.epc_db.store_certificates(make_certificates(6), 'domestic')
+    client = webapp.app.test_client()
+    payload = {'source': 'cache'}
+    
+    etag = post_analytics(client, payload).headers['ETag']
+    # Within the same second as the first store; the generation still moves
+    webapp.epc_db.store_certificates(make_certificates(3, start=6), 'domestic')
+    
+    refreshed = post_analytics(client, payload, **{'If-None-Match': etag})
+    assert refreshed.status_code == 200
+    assert refreshed.headers['X-Cache'] == 'MISS'
+    assert refreshed.headers['ETag'] != etag
+
+def test_errors_are_not_cached(webapp):
+    client = webapp.app.test_client()
+    
+    assert post_analytics(client, {}).status_code == 400
+    assert webapp.response_cache.stats()['entries'] == 0
+
+def test_expired_result_set_is_not_served_from_the_cache(webapp):
+    client = webapp.app.test_client()
+    result_id = webapp.result_store.put(make_certificates(6))
+    payload = {'result_id': result_id}
+    
+    assert post_analytics(client, payload).status_code == 200
+    assert post_analytics(client, payload).headers['X-Cache'] == 'HIT'
+    
+    webapp.result_store.discard(result_id)
+    assert post_analytics(client, payload).status_code == 404
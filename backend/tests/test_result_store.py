@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config.settings import Config
+from src.data import result_store
+from src.data.result_store import ResultStore
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_store.time, 'time', clock)
+    return clock
+
+def frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({'lmk-key': [f'LMK{i}' for i in range(rows)],
+                         'floor-height': [np.nan if i % 2 else 2.5 for i in range(rows)]},
+                        index=range(100, 100 + rows))
+
+def test_pages_follow_cursors_to_the_end(monkeypatch):
+    monkeypatch.setattr(Config, 'RESULT_PAGE_MAX', 100)
+    store = ResultStore()
+    result_id = store.put(frame(25))
+    
+    keys, cursor, pages = [], None, 0
+    while True:
+        page = store.page(result_id, cursor, limit=10)
+        assert page['total_found'] == 25
+        keys += [row['lmk-key'] for row in page['data']]
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    
+    assert pages == 3
+    assert keys == [f'LMK{i}' for i in range(25)]
+
+def test_page_limit_is_capped(monkeypatch):
+    monkeypatch.setattr(Config, 'RESULT_PAGE_MAX', 5)
+    store = ResultStore()
+    page = store.page(store.put(frame(12)), limit=1000)
+    
+    assert len(page['data']) == 5
+    assert ResultStore.decode_cursor(page['next_cursor']) == 5
+
+def test_records_use_none_for_missing_values():
+    store = ResultStore()
+    page = store.page(store.put(frame(2)))
+    assert [row['floor-height'] for row in page['data']] == [2.5, None]
+
+def test_cursor_past_the_end_gives_an_empty_last_page():
+    store = ResultStore()
+    page = store.page(store.put(frame(3)), ResultStore.encode_cursor(10))
+    assert page['data'] == [] and page['next_cursor'] is None
+
+@pytest.mark.parametrize('cursor', ['zz', '-a', '1.5'])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        ResultStore.decode_cursor(cursor)
+
+def test_unknown_or_discarded_set_is_gone():
+    store = ResultStore()
+    result_id = store.put(frame(3))
+    assert store.page('missing') is None
+    
+    store.discard(result_id)
+    assert store.get(result_id) is None
+    assert store.stats() == (0, 0)
+
+def test_idle_sets_expire(clock):
+    store = ResultStore(ttl_minutes=1)
+    first = store.put(frame(2))
+    clock.now += 30
+    second = store.put(frame(3))
+    
+    clock.now += 40
+    assert store.get(first) is None
+    assert store.get(second) is not None
+    assert store.stats() == (1, 3)
+    
+    clock.now += 61
+    assert store.get(second) is None
+    assert store.stats() == (0, 0)
+
+def test_access_keeps_a_set_alive(clock):
+    store = ResultStore(ttl_minutes=1)
+    result_id = store.put(frame(2))
+    
+    for _ in range(3):
+        clock.now += 50
+        assert store.get(result_id) is not None
+
+def test_least_recently_used_set_is_evicted(clock):
+    store = ResultStore(max_sets=2)
+    first, second = store.put(frame(1)), store.put(frame(1))
+    store.get(first)
+    third = store.put(frame(1))
+    
+    assert store.get(second) is None
+    assert store.get(first) is not None and store.get(third) is not None
+
+def test_row_cap_evicts_but_keeps_the_newest_set(clock):
+    store = ResultStore(max_rows=10)
+    first = store.put(frame(6))
+    second = store.put(frame(6))
+    assert store.get(first) is None
+    assert store.stats() == (1, 6)
+    
+    largest = store.put(frame(20))
+    assert store.get(second) is None
+    assert store.get(largest) is not None
+    assert store.stats() == (1, 20)
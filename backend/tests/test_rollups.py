@@ -0,0 +1,102 @@
+import pandas as pd
+
+from config.settings import Config
+from src.data.rollups import rollup_deltas
+from conftest import make_certificates as make_rows
+
+def rollup_rows(db) -> list:
+    with db.connections.read() as conn:
+        return conn.execute('SELECT * FROM analytics_rollups ORDER BY 1, 2, 3, 4').fetchall()
+
+def assert_matches_rebuild(db):
+    incremental = rollup_rows(db)
+    db.rebuild_analytics()
+    assert incremental == rollup_rows(db)
+    return incremental
+
+def test_store_matches_rebuild(db):
+    db.store_certificates(make_rows(30), 'domestic')
+    db.store_certificates(make_rows(5, start=100), 'non-domestic')
+    assert assert_matches_rebuild(db)
+
+def test_replacing_certificates_matches_rebuild(db):
+    db.store_certificates(make_rows(20), 'domestic')
+    # Re-lodged with a new rating and efficiency, some not yet cached
+    db.store_certificates(make_rows(15, start=10, **{'current-energy-rating': 'B',
+                                                     'current-energy-efficiency': 85}),
+                          'domestic')
+    
+    assert_matches_rebuild(db)
+    assert db.get_analytics()['total']['']['certificates'] == 25
+
+def test_certificate_repeated_in_a_batch_counts_once(db):
+    rows = pd.concat([make_rows(3), make_rows(1, **{'current-energy-rating': 'G'})])
+    db.store_certificates(rows, 'domestic')
+    
+    assert_matches_rebuild(db)
+    ratings = db.get_analytics()['current-energy-rating']
+    assert sum(value['certificates'] for value in ratings.values()) == 3
+    assert 'A' not in ratings and ratings['G']['certificates'] == 1
+
+def test_small_write_batches_match_rebuild(db, monkeypatch):
+    monkeypatch.setattr(Config, 'DB_WRITE_BATCH_ROWS', 4)
+    db.store_certificates(make_rows(10), 'domestic')
+    db.store_certificates(make_rows(10, start=5), 'domestic')
+    assert_matches_rebuild(db)
+
+def test_cleanup_matches_rebuild(db):
+    db.store_certificates(make_rows(20), 'domestic')
+    db.connections.write(lambda conn: conn.execute(
+        "UPDATE epc_certificates SET last_accessed = '2000-01-01 00:00:00' "
+        "WHERE certificate_id < 'LMK000008'"))
+    
+    db.cleanup_old_data()
+    
+    assert_matches_rebuild(db)
+    assert db.get_cache_stats()['total_certificates'] == 12
+
+def test_cleanup_of_everything_leaves_no_rollups(db):
+    db.store_certificates(make_rows(5), 'domestic')
+    db.cleanup_old_data(max_age_days=-1)
+    assert rollup_rows(db) == []
+
+def test_get_analytics(db):
+    rows = make_rows(4)
+    rows['current-energy-efficiency'] = [62, 68, None, 71]
+    db.store_certificates(rows, 'domestic')
+    db.store_certificates(make_rows(2, start=50), 'non-domestic')
+    
+    analytics = db.get_analytics(property_type='domestic')
+    
+    assert analytics['total']['']['certificates'] == 4
+    assert analytics['total']['']['efficiency_sum'] == 62 + 68 + 71
+    assert analytics['total']['']['efficiency_count'] == 3
+    assert analytics['efficiency-band'] == {
+        '60': {**analytics['efficiency-band']['60'], 'certificates': 1},
+        '65': {**analytics['efficiency-band']['65'], 'certificates': 1},
+        '70': {**analytics['efficiency-band']['70'], 'certificates': 1},
+        '': {**analytics['efficiency-band'][''], 'certificates': 1},
+    }
+    assert {year: value['certificates'] for year, value in
+            analytics['lodgement-year'].items()} == {'2010': 1, '2011': 1, '2012': 1, '2013': 1}
+    assert {authority: value['certificates'] for authority, value in
+            analytics['local-authority'].items()} == {'E07000216': 2, 'E07000209': 2}
+    
+    one_authority = db.get_analytics(local_authority='E07000209')
+    assert one_authority['total']['']['certificates'] == 3
+
+def test_rollup_deltas_sign():
+    rows = [('domestic', 'E1', 'C', 'House', '2020-01-01', 72, 100),
+            ('domestic', 'E1', 'D', 'House', '2021-01-01', None, 50)]
+    
+    added = rollup_deltas(rows).set_index(['dimension', 'value'])
+    removed = rollup_deltas(rows, sign=-1).set_index(['dimension', 'value'])
+    
+    total = added.loc[('total', '')]
+    assert (total['certificates'], total['efficiency_sum'], total['efficiency_count'],
+            total['payload_bytes']) == (2, 72, 1, 150)
+    assert added.loc[('efficiency-band', '70'), 'certificates'] == 1
+    assert added.loc[('efficiency-band', ''), 'certificates'] == 1
+    assert (removed[['certificates', 'efficiency_sum']] ==
+            -added[['certificates', 'efficiency_sum']]).all().all()
+    assert rollup_deltas([]).empty
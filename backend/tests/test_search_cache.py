@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+from src.api.client import EPCClient
+from src.api.pagination import PaginationError
+from src.data.search_cache import SearchCache
+from config.settings import Config
+from conftest import make_certificates
+
+ENDPOINT = 'domestic/search'
+
+@pytest.fixture
+def cache(db):
+    return SearchCache(db, ttl_hours=24)
+
+@pytest.fixture
+def client(cache, monkeypatch):
+    monkeypatch.setattr(Config, 'EPC_API_EMAIL', 'test@example.com')
+    monkeypatch.setattr(Config, 'EPC_API_KEY', 'key')
+    return EPCClient(search_cache=cache)
+
+def script_pages(client, monkeypatch, responses):
+    """Answer the paginator's requests from ``responses`` in order."""
+    responses = iter(responses)
+    
+    def make_request(endpoint, params):
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    monkeypatch.setattr(client.paginator, '_make_request', make_request)
+
+def page(frame, next_search_after=None):
+    return {'data': frame.to_dict('records'), 'next-search-after': next_search_after}
+
+def test_key_ignores_paging_and_normalises_filters(cache):
+    assert (cache.key(ENDPOINT, {'postcode': ' gu5  0aa ', 'size': 5000})
+            == cache.key('/domestic/search/', {'postcode': 'GU5 0AA', 'search-after': 'x'}))
+    assert cache.key(ENDPOINT, {'postcode': 'GU5 0AA'}) != cache.key(ENDPOINT, {'postcode': 'GU5 0AB'})
+
+def test_search_is_only_served_once_complete(cache):
+    params = {'postcode': 'GU5 0AA'}
+    search_hash = cache.begin(ENDPOINT, params)
+    cache.add_results(search_hash, make_certificates(3), 'domestic')
+    
+    assert cache.lookup(ENDPOINT, params) is None
+    
+    cache.complete(search_hash, ENDPOINT, params)
+    hit = cache.lookup(ENDPOINT, params)
+    
+    assert sorted(hit['lmk-key']) == ['LMK000000', 'LMK000001', 'LMK000002']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_begin_discards_the_previous_result(cache):
+    params = {'postcode': 'GU5 0AA'}
+    cache.store(ENDPOINT, params, make_certificates(3), 'domestic')
+    
+    search_hash = cache.begin(ENDPOINT, params)
+    assert cache.lookup(ENDPOINT, params) is None
+    
+    cache.add_results(search_hash, make_certificates(1, start=10), 'domestic')
+    cache.complete(search_hash, ENDPOINT, params)
+    assert list(cache.lookup(ENDPOINT, params)['lmk-key']) == ['LMK000010']
+
+def test_empty_search_is_cached(cache):
+    cache.store(ENDPOINT, {'postcode': 'ZZ9 9ZZ'}, pd.DataFrame(), 'domestic')
+    assert cache.lookup(ENDPOINT, {'postcode': 'ZZ9 9ZZ'}).empty
+
+def test_evicted_certificate_invalidates_search(cache, db):
+    params = {'postcode': 'GU5 0AA'}
+    cache.store(ENDPOINT, params, make_certificates(2), 'domestic')
+    db.connections.write(lambda conn: conn.execute(
+        "DELETE FROM epc_certificates WHERE certificate_id = 'LMK000000'"))
+    
+    assert cache.lookup(ENDPOINT, params) is None
+
+def test_zero_ttl_disables_lookup(db):
+    cache = SearchCache(db, ttl_hours=0)
+    cache.store(ENDPOINT, {'postcode': 'GU5 0AA'}, make_certificates(1), 'domestic')
+    assert cache.lookup(ENDPOINT, {'postcode': 'GU5 0AA'}) is None
+
+def test_client_caches_a_completed_search(client, cache, monkeypatch):
+    frame = make_certificates(4)
+    script_pages(client, monkeypatch, [page(frame[:2], 'a'), page(frame[2:])])
+    
+    assert len(client.search_by_postcode('GU5 0AA')) == 4
+    
+    script_pages(client, monkeypatch, [])
+    assert len(client.search_by_postcode('GU5 0AA')) == 4
+    assert cache.hits == 1
+
+def test_client_does_not_cache_a_failed_search(client, cache, monkeypatch):
+    frame = make_certificates(4)
+    script_pages(client, monkeypatch, [page(frame[:2], 'a'), PaginationError('API error 500')])
+    
+    with pytest.raises(PaginationError):
+        client.search_by_postcode('GU5 0AA')
+    assert cache.lookup(ENDPOINT, {'postcode': 'GU5 0AA'}) is None
+
+def test_streamed_search_is_cached_only_after_a_clean_finish(client, cache, monkeypatch):
+    frame = make_certificates(4)
+    params = {'postcode': 'GU5 0AA'}
+    
+    script_pages(client, monkeypatch, [page(frame[:2], 'a'), PaginationError('timed out')])
+    frames = client.iter_frames(ENDPOINT, params, chunk_rows=2)
+    assert len(next(frames)) == 2
+    with pytest.raises(PaginationError):
+        next(frames)
+    assert cache.lookup(ENDPOINT, params) is None
+    
+    script_pages(client, monkeypatch, [page(frame[:2], 'a'), page(frame[2:])])
+    assert sum(len(chunk) for chunk in client.iter_frames(ENDPOINT, params, chunk_rows=2)) == 4
+    assert len(cache.lookup(ENDPOINT, params)) == 4
+
+class FakeResponse:
+    def __init__(self, status_code, body=b''):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode()
+        self.headers = {}
+    
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+    
+    def get(self, url, **kwargs):
+        return self.response
+
+def test_paginator_raises_on_api_error(client):
+    client.paginator.session = FakeSession(FakeResponse(500, b'oops'))
+    with pytest.raises(PaginationError):
+        list(client.paginator.paginate(ENDPOINT, {'postcode': 'GU5 0AA'}))
+
+def test_paginator_treats_an_empty_body_as_no_results(client):
+    client.paginator.session = FakeSession(FakeResponse(200))
+    assert list(client.paginator.paginate(ENDPOINT, {'postcode': 'ZZ9 9ZZ'})) == []
@@ -3,31 +3,45 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, Response, make_response
 from flask_cors import CORS
 import pandas as pd
+import numpy as np
 import plotly.graph_objs as go
 import plotly.express as px
-import folium
-from folium import plugins
 import json
 import io
 import base64
-from datetime import datetime
+from datetime import datetime, timezone
 
 from src.api.client import EPCClient
 from src.data.database import EPCDatabase
+from src.data.job_queue import JobQueue, COMPLETED
+from src.data.map_index import MapIndex
+from src.data.response_cache import ResponseCache
+from src.data.result_store import ResultStore
+from src.data.search_cache import SearchCache
 from src.export.csv import CSVExporter
 from src.export.geojson import GeoJSONExporter
+from src.export.vector_tiles import VectorTileExporter
+from config.settings import Config
 
 app = Flask(__name__)
 CORS(app)
 
 # Initialize components
-epc_client = EPCClient()
 epc_db = EPCDatabase()
+epc_client = EPCClient(search_cache=SearchCache(epc_db))
 csv_exporter = CSVExporter()
 geojson_exporter = GeoJSONExporter()
+result_store = ResultStore()
+response_cache = ResponseCache()
+job_queue = JobQueue()
+
+SEARCH_TYPES = ('postcode', 'local_authority', 'uprn')
+EXPORT_FORMATS = ('csv', 'geojson', 'mbtiles')
+MAP_FORMATS = ('geojson', 'packed')
+EXPIRED_RESULTS = 'Search results have expired, please search again'
 
 @app.route('/')
 def dashboard():
@@ -43,182 +57,399 @@ def search_page():
     """Search interface"""
     return render_template('search.html')
 
+def search_params(payload):
+    """Validated search parameters from a request body; raises ValueError."""
+    params = {
+        'search_type': payload.get('search_type'),
+        'query': (payload.get('query') or '').strip(),
+        'property_type': payload.get('property_type', 'domestic'),
+        'agricultural': bool(payload.get('agricultural', False))
+    }
+    
+    if not params['query']:
+        raise ValueError('Search query is required')
+    if params['search_type'] not in SEARCH_TYPES:
+        raise ValueError('Invalid search type')
+    return params
+
+def run_search(params, progress=None):
+    """Run a search; ``progress`` is called with (pages, records) as pages arrive."""
+    query = params['query']
+    property_type = params['property_type']
+    
+    if params['search_type'] == 'postcode':
+        if params['agricultural']:
+            return epc_client.search_agricultural_buildings(postcode=query, progress=progress)
+        return epc_client.search_by_postcode(query, property_type, progress=progress)
+    elif params['search_type'] == 'local_authority':
+        if params['agricultural']:
+            return epc_client.search_agricultural_buildings(local_authority=query,
+                                                            progress=progress)
+        return epc_client.search_by_local_authority(query, property_type, progress=progress)
+    return epc_client.search_by_uprn(query, property_type, progress=progress)
+
+def search_response(result_id):
+    """First page of a stored search, shaped as the search endpoint returns it."""
+    if result_id is None:
+        return {
+            'success': True,
+            'count': 0,
+            'data': [],
+            'message': 'No records found'
+        }
+    
+    page = result_store.page(result_id)
+    if page is None:
+        return None
+    return {'success': True, 'count': page['total_found'], **page}
+
+def certificate_cache_version():
+    """(version, last modified as a Unix time) of the certificate cache."""
+    version, latest = epc_db.data_version()
+    last_modified = (datetime.strptime(latest, '%Y-%m-%d %H:%M:%S')
+                     .replace(tzinfo=timezone.utc).timestamp() if latest else None)
+    return version, last_modified
+
+def cached_json(endpoint, params, compute, valid=None):
+    """Answer a request from the response cache, or with ``compute()`` and cache it.
+    
+    Only 200 responses are cached. ``valid`` is given a cached body and can
+    reject it, e.g. when it refers to a result set that has since expired.
+    Conditional requests get a 304 when the client's copy is current.
+    """
+    key = response_cache.key(endpoint, params)
+    version, _ = certificate_cache_version()
+    entry = response_cache.get(key, version)
+    
+    if entry is not None and valid is not None and not valid(json.loads(entry.body)):
+        response_cache.discard(key)
+        entry = None
+    
+    cache_status = 'HIT'
+    if entry is None:
+        response = make_response(compute())
+        if response.status_code != 200:
+            return response
+        
+        # Searches store certificates as they run, so the version is read
+        # again for the state the response was computed against
+        version, last_modified = certificate_cache_version()
+        entry = response_cache.put(key, response.get_data(), version, last_modified)
+        cache_status = 'MISS'
+    
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(entry.etag)
+    elif request.if_modified_since:
+        not_modified = int(entry.last_modified) <= request.if_modified_since.timestamp()
+    else:
+        not_modified = False
+    
+    response = Response(status=304) if not_modified else Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.last_modified = int(entry.last_modified)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Cache'] = cache_status
+    return response
+
 @app.route('/api/search', methods=['POST'])
 def api_search():
     """API endpoint for searching EPC data"""
     try:
-        data = request.json
-        search_type = data.get('search_type')
-        query = data.get('query', '').strip()
-        property_type = data.get('property_type', 'domestic')
-        agricultural = data.get('agricultural', False)
-        
-        if not query:
-            return jsonify({'error': 'Search query is required'}), 400
-        
-        # Perform search based on type
-        if search_type == 'postcode':
-            if agricultural:
-                results = epc_client.search_agricultural_buildings(postcode=query)
-            else:
-                results = epc_client.search_by_postcode(query, property_type)
-        elif search_type == 'local_authority':
-            if agricultural:
-                results = epc_client.search_agricultural_buildings(local_authority=query)
-            else:
-                results = epc_client.search_by_local_authority(query, property_type)
-        elif search_type == 'uprn':
-            results = epc_client.search_by_uprn(query, property_type)
-        else:
-            return jsonify({'error': 'Invalid search type'}), 400
-        
-        if results.empty:
-            return jsonify({
-                'success': True,
-                'count': 0,
-                'data': [],
-                'message': 'No records found'
-            })
-        
-        # Cache results
-        epc_db.store_certificates(results, property_type)
-        
-        # Convert to JSON-serializable format
-        results_json = results.head(100).to_dict('records')  # Limit to 100 for display
-        
-        return jsonify({
-            'success': True,
-            'count': len(results),
-            'data': results_json,
-            'total_found': len(results)
-        })
+        params = search_params(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def search():
+        try:
+            results = run_search(params)
+            
+            # Keep the rows server-side; the client pages through them and
+            # refers to them by ID for export, map and analytics
+            result_id = result_store.put(results, params) if not results.empty else None
+            return jsonify(search_response(result_id))
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    key_params = dict(params)
+    if params['search_type'] == 'postcode':
+        key_params['query'] = params['query'].upper()
+    
+    # Identical searches share one result set, for as long as it is held
+    return cached_json('search', key_params, search,
+                       valid=lambda body: body.get('result_id') is None
+                       or result_store.get(body['result_id']) is not None)
+
+@app.route('/api/results/<result_id>')
+def api_results(result_id):
+    """Page through a stored search result"""
+    try:
+        page = result_store.page(result_id, request.args.get('cursor'),
+                                 request.args.get('limit', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if page is None:
+        return jsonify({'error': EXPIRED_RESULTS}), 404
+    
+    return jsonify({'success': True, **page})
+
+def request_data(payload, rows_key):
+    """Rows for a request: the stored result set named by ``result_id``, or
+    rows posted inline under ``rows_key``. Returns (DataFrame, error response)."""
+    result_id = payload.get('result_id')
+    
+    if result_id:
+        result = result_store.get(result_id)
+        if result is None:
+            return None, (jsonify({'error': EXPIRED_RESULTS}), 404)
+        return result.data, None
+    
+    rows = payload.get(rows_key, [])
+    if not rows:
+        return None, (jsonify({'error': 'No data provided'}), 400)
+    return pd.DataFrame(rows), None
+
+def export_params(payload):
+    """Validated export format and filename from a request body; raises ValueError."""
+    params = {
+        'format': payload.get('format', 'csv'),
+        'filename': payload.get('filename') or f'epc_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    }
+    
+    if params['format'] not in EXPORT_FORMATS:
+        raise ValueError('Invalid export format')
+    return params
+
+def export_results(df, export_format, filename, progress=None):
+    """Write an export and describe it for the client; raises ValueError.
+    
+    ``progress`` is called with (completed, total) while addresses are geocoded.
+    """
+    if export_format != 'csv' and not {'latitude', 'longitude'} <= set(df.columns):
+        df = geojson_exporter.geocoder.geocode_dataframe(df, progress=progress)
+    
+    if export_format == 'csv':
+        filepath = csv_exporter.export(df, filename)
+    elif export_format == 'geojson':
+        filepath = geojson_exporter.export_for_landapp(df, filename)
+    else:
+        filepath = geojson_exporter.export_vector_tiles(df, filename)
+        if not filepath:
+            raise ValueError('No geocoded records to tile')
+    
+    result = {
+        'success': True,
+        'filepath': filepath,
+        'download_url': f'/download/{Path(filepath).name}'
+    }
+    if export_format == 'mbtiles':
+        result['tile_url'] = f'/tiles/{Path(filepath).stem}/{{z}}/{{x}}/{{y}}.pbf'
+    return result
 
 @app.route('/api/export', methods=['POST'])
 def api_export():
     """Export search results"""
     try:
         data = request.json
-        export_format = data.get('format', 'csv')
-        search_data = data.get('search_data', [])
-        filename = data.get('filename', f'epc_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
         
-        if not search_data:
-            return jsonify({'error': 'No data to export'}), 400
+        try:
+            params = export_params(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        df = pd.DataFrame(search_data)
+        df, error = request_data(data, 'search_data')
+        if error:
+            return error
         
-        if export_format == 'csv':
-            filepath = csv_exporter.export(df, filename)
-            return jsonify({
-                'success': True,
-                'filepath': filepath,
-                'download_url': f'/download/{Path(filepath).name}'
-            })
-        elif export_format == 'geojson':
-            filepath = geojson_exporter.export_for_landapp(df, filename)
-            return jsonify({
-                'success': True,
-                'filepath': filepath,
-                'download_url': f'/download/{Path(filepath).name}'
-            })
-        else:
-            return jsonify({'error': 'Invalid export format'}), 400
-            
+        try:
+            return jsonify(export_results(df, params['format'], params['filename']))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def search_job(job, params):
+    results = run_search(params, progress=job.page_progress)
+    job.check()
+    
+    if results.empty:
+        return {'result_id': None, 'total_found': 0}
+    return {'result_id': result_store.put(results, params), 'total_found': len(results)}
+
+def export_job(job, params):
+    result = result_store.get(params['result_id'])
+    if result is None:
+        raise ValueError(EXPIRED_RESULTS)
+    
+    return export_results(result.data, params['format'], params['filename'],
+                          progress=job.geocode_progress)
+
+job_queue.register('search', search_job)
+job_queue.register('export', export_job)
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """Start a search or export in the background; poll its status by job ID"""
+    data = request.json or {}
+    kind = data.get('kind')
+    
+    try:
+        if kind == 'search':
+            params = search_params(data)
+        elif kind == 'export':
+            params = export_params(data)
+            # Jobs refer to stored results; inline rows are not queued
+            if result_store.get(data.get('result_id') or '') is None:
+                return jsonify({'error': EXPIRED_RESULTS}), 404
+            params['result_id'] = data['result_id']
+        else:
+            return jsonify({'error': 'Invalid job type'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job_id = job_queue.submit(kind, params)
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('api_job_status', job_id=job_id)
+    }), 202
+
+@app.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """Status and progress of a background job"""
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({'success': True, **job})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    """Cancel a queued or running background job"""
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not job_queue.cancel(job_id):
+        return jsonify({'error': f"Job already {job['status']}"}), 409
+    return jsonify({'success': True, 'job_id': job_id})
+
+@app.route('/api/jobs/<job_id>/result')
+def api_job_result(job_id):
+    """Result of a completed job: the first page of a search, or the export file"""
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if job['status'] != COMPLETED:
+        return jsonify({'error': job['error'] or f"Job is {job['status']}",
+                        'status': job['status']}), 409
+    
+    if job['kind'] == 'search':
+        response = search_response(job['result']['result_id'])
+        if response is None:
+            return jsonify({'error': EXPIRED_RESULTS}), 404
+        return jsonify(response)
+    
+    return jsonify(job['result'])
+
 @app.route('/map')
 def map_page():
     """Interactive map page"""
     return render_template('map.html')
 
+def result_map_index(result):
+    """The map index for a result set, geocoding the rows the first time."""
+    if result.map_index is not None:
+        return result.map_index
+    
+    with result.map_lock:
+        if result.map_index is None:
+            data = result.data
+            if not {'latitude', 'longitude'} <= set(data.columns):
+                data = geojson_exporter.geocoder.geocode_dataframe(data)
+            result.map_index = MapIndex(data)
+    return result.map_index
+
+def map_query_params(args):
+    """Bounding box, zoom and format for a map query; raises ValueError."""
+    bbox = args.get('bbox', '-180,-90,180,90')
+    try:
+        west, south, east, north = (float(value) for value in bbox.split(','))
+    except ValueError:
+        raise ValueError('bbox must be west,south,east,north')
+    
+    try:
+        zoom = int(args.get('zoom', 6))
+    except ValueError:
+        raise ValueError('zoom must be an integer')
+    if not 0 <= zoom <= 22:
+        raise ValueError('zoom must be between 0 and 22')
+    
+    map_format = args.get('format', 'geojson')
+    if map_format not in MAP_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(MAP_FORMATS)}")
+    
+    return (west, south, east, north), zoom, map_format
+
 @app.route('/api/map_data', methods=['POST'])
 def api_map_data():
-    """Generate map data for visualization"""
+    """Prepare a result set for the map: bounds and summary, no features"""
     try:
-        data = request.json
-        search_results = data.get('data', [])
-        
-        if not search_results:
-            return jsonify({'error': 'No data provided'}), 400
+        data = request.json or {}
+        result_id = data.get('result_id')
         
-        df = pd.DataFrame(search_results)
-        
-        # Create map centered on UK
-        m = folium.Map(
-            location=[54.5, -3.0],  # UK center
-            zoom_start=6,
-            tiles='OpenStreetMap'
-        )
+        if not result_id:
+            df, error = request_data(data, 'data')
+            if error:
+                return error
+            result_id = result_store.put(df)
         
-        # Add EPC data points
-        for idx, row in df.head(1000).iterrows():  # Limit to 1000 points for performance
-            # Create popup content
-            popup_html = f"""
-            <div style="font-family: Arial; width: 250px;">
-                <h4 style="color: #2c3e50; margin-bottom: 10px;">
-                    {row.get('address1', 'Unknown Address')}
-                </h4>
-                <p><strong>Postcode:</strong> {row.get('postcode', 'N/A')}</p>
-                <p><strong>Energy Rating:</strong> 
-                   <span style="background-color: {get_energy_color(row.get('current-energy-rating', 'N/A'))}; 
-                         color: white; padding: 2px 6px; border-radius: 3px;">
-                     {row.get('current-energy-rating', 'N/A')}
-                   </span>
-                </p>
-                <p><strong>Efficiency Score:</strong> {row.get('current-energy-efficiency', 'N/A')}</p>
-                <p><strong>Property Type:</strong> {row.get('property-type', 'N/A')}</p>
-                <p><strong>Floor Area:</strong> {row.get('total-floor-area', 'N/A')} m²</p>
-            </div>
-            """
-            
-            # Use postcode for rough location (would need geocoding for exact coords)
-            postcode = row.get('postcode', '')
-            if postcode:
-                # For now, use approximate UK postcode locations
-                # In production, you'd geocode these
-                lat, lng = get_approximate_postcode_location(postcode)
-                
-                folium.CircleMarker(
-                    location=[lat, lng],
-                    radius=6,
-                    popup=folium.Popup(popup_html, max_width=300),
-                    color=get_energy_color(row.get('current-energy-rating', 'N/A')),
-                    fillColor=get_energy_color(row.get('current-energy-rating', 'N/A')),
-                    fillOpacity=0.7,
-                    weight=2
-                ).add_to(m)
+        result = result_store.get(result_id)
+        if result is None:
+            return jsonify({'error': EXPIRED_RESULTS}), 404
         
-        # Add legend
-        legend_html = '''
-        <div style="position: fixed; 
-                    bottom: 50px; right: 50px; width: 150px; height: 90px; 
-                    background-color: white; border:2px solid grey; z-index:9999; 
-                    font-size:14px; padding: 10px">
-        <p style="margin: 0;"><b>Energy Ratings</b></p>
-        <p style="margin: 5px 0;"><i style="background:#2d5aa0;width:12px;height:12px;float:left;margin-right:8px;"></i>A</p>
-        <p style="margin: 5px 0;"><i style="background:#2f7ed8;width:12px;height:12px;float:left;margin-right:8px;"></i>B</p>
-        <p style="margin: 5px 0;"><i style="background:#0d8ecf;width:12px;height:12px;float:left;margin-right:8px;"></i>C</p>
-        <p style="margin: 5px 0;"><i style="background:#2b908f;width:12px;height:12px;float:left;margin-right:8px;"></i>D</p>
-        <p style="margin: 5px 0;"><i style="background:#90ed7d;width:12px;height:12px;float:left;margin-right:8px;"></i>E</p>
-        <p style="margin: 5px 0;"><i style="background:#f7a35c;width:12px;height:12px;float:left;margin-right:8px;"></i>F</p>
-        <p style="margin: 5px 0;"><i style="background:#8085e9;width:12px;height:12px;float:left;margin-right:8px;"></i>G</p>
-        </div>
-        '''
-        m.get_root().html.add_child(folium.Element(legend_html))
+        index = result_map_index(result)
+        df = result.data
         
-        # Convert map to HTML
-        map_html = m._repr_html_()
+        efficiency = pd.to_numeric(df.get('current-energy-efficiency', pd.Series(dtype=float)),
+                                   errors='coerce')
+        ratings = df.get('current-energy-rating', pd.Series(dtype=object)).dropna()
         
         return jsonify({
             'success': True,
-            'map_html': map_html,
-            'point_count': len(df.head(1000))
+            'result_id': result_id,
+            'point_count': len(index),
+            'bounds': index.bounds(),
+            'features_url': f'/api/map/{result_id}',
+            'summary': {
+                'total_properties': len(df),
+                'most_common_rating': ratings.mode().iloc[0] if not ratings.empty else 'N/A',
+                'avg_efficiency': round(float(efficiency.mean()), 1) if efficiency.notna().any() else None,
+                'property_types': df.get('property-type', pd.Series(dtype=object))
+                                    .value_counts().head(3).to_dict()
+            }
         })
-        
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/map/<result_id>')
+def api_map_features(result_id):
+    """Clusters or certificates in a viewport: ?bbox=west,south,east,north&zoom=&format="""
+    try:
+        bbox, zoom, map_format = map_query_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    result = result_store.get(result_id)
+    if result is None:
+        return jsonify({'error': EXPIRED_RESULTS}), 404
+    
+    try:
+        return jsonify(result_map_index(result).query(bbox, zoom, packed=map_format == 'packed'))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -230,75 +461,207 @@ def analytics_page():
 @app.route('/api/analytics', methods=['POST'])
 def api_analytics():
     """Generate analytics charts"""
+    payload = request.json or {}
+    result_id = payload.get('result_id')
+    
+    # Charts for an expired result set are not served from the cache; the
+    # request falls through to the usual 404
+    return cached_json('analytics', payload, lambda: analytics_response(payload),
+                       valid=lambda body: not result_id
+                       or result_store.get(result_id) is not None)
+
+def analytics_response(payload):
     try:
-        data = request.json
-        search_results = data.get('data', [])
-        
-        if not search_results:
-            return jsonify({'error': 'No data provided'}), 400
+        if payload.get('source') == 'cache':
+            return jsonify(cache_analytics(payload.get('property_type'),
+                                           payload.get('local_authority')))
         
-        df = pd.DataFrame(search_results)
+        df, error = request_data(payload, 'data')
+        if error:
+            return error
         
         charts = {}
+        ratings = df.get('current-energy-rating', pd.Series(index=df.index, dtype=object))
+        potential_ratings = df.get('potential-energy-rating', pd.Series(index=df.index, dtype=object))
+        efficiency = pd.to_numeric(df.get('current-energy-efficiency', pd.Series(index=df.index, dtype=float)),
+                                   errors='coerce')
+        potential_efficiency = pd.to_numeric(
+            df.get('potential-energy-efficiency', pd.Series(index=df.index, dtype=float)), errors='coerce'
+        )
+        floor_area = pd.to_numeric(df.get('total-floor-area', pd.Series(index=df.index, dtype=float)),
+                                   errors='coerce')
         
         # Energy Rating Distribution
         if 'current-energy-rating' in df.columns:
-            rating_counts = df['current-energy-rating'].value_counts()
-            charts['energy_ratings'] = {
-                'data': [{
-                    'x': rating_counts.index.tolist(),
-                    'y': rating_counts.values.tolist(),
-                    'type': 'bar',
-                    'marker': {'color': [get_energy_color(rating) for rating in rating_counts.index]}
-                }],
-                'layout': {
-                    'title': 'Energy Rating Distribution',
-                    'xaxis': {'title': 'Energy Rating'},
-                    'yaxis': {'title': 'Number of Properties'}
-                }
-            }
+            charts['energy_ratings'] = rating_chart(df['current-energy-rating'].value_counts())
         
         # Property Type Distribution  
         if 'property-type' in df.columns:
-            property_counts = df['property-type'].value_counts().head(10)
-            charts['property_types'] = {
-                'data': [{
-                    'labels': property_counts.index.tolist(),
-                    'values': property_counts.values.tolist(),
-                    'type': 'pie'
-                }],
-                'layout': {'title': 'Property Type Distribution'}
-            }
+            charts['property_types'] = property_type_chart(df['property-type'].value_counts())
         
-        # Energy Efficiency Histogram
-        if 'current-energy-efficiency' in df.columns:
-            efficiency_scores = df['current-energy-efficiency'].dropna()
-            charts['efficiency_histogram'] = {
-                'data': [{
-                    'x': efficiency_scores.tolist(),
-                    'type': 'histogram',
-                    'nbinsx': 20
-                }],
-                'layout': {
-                    'title': 'Energy Efficiency Score Distribution',
-                    'xaxis': {'title': 'Efficiency Score'},
-                    'yaxis': {'title': 'Frequency'}
-                }
-            }
+        # Energy Efficiency Histogram, binned here rather than shipping every score
+        efficiency_scores = efficiency.dropna()
+        if not efficiency_scores.empty:
+            counts, edges = np.histogram(efficiency_scores, bins=20)
+            charts['efficiency_histogram'] = efficiency_histogram_chart(
+                (edges[:-1] + edges[1:]) / 2, counts, float(edges[1] - edges[0])
+            )
+        
+        # Per-rating summary table, over the whole result set
+        rating_summary = []
+        by_rating = pd.DataFrame({
+            'rating': ratings.fillna('Unknown'),
+            'efficiency': efficiency,
+            'floor_area': floor_area
+        }).groupby('rating').agg(count=('rating', 'size'), avg_efficiency=('efficiency', 'mean'),
+                                 avg_floor_area=('floor_area', 'mean'))
+        for rating in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'Unknown']:
+            if rating in by_rating.index:
+                row = by_rating.loc[rating]
+                rating_summary.append({
+                    'rating': rating,
+                    'count': int(row['count']),
+                    'percentage': round(100 * row['count'] / len(df), 1),
+                    'avg_efficiency': None if pd.isna(row['avg_efficiency']) else round(row['avg_efficiency'], 1),
+                    'avg_floor_area': None if pd.isna(row['avg_floor_area']) else round(row['avg_floor_area'])
+                })
+        
+        # Properties whose potential rating beats their current one (A is best)
+        rating_rank = {rating: rank for rank, rating in enumerate('GFEDCBA', start=1)}
+        can_improve = potential_ratings.map(rating_rank) > ratings.map(rating_rank)
+        
+        # Current vs potential scatter, sampled so large result sets stay light
+        paired = pd.DataFrame({'current': efficiency, 'potential': potential_efficiency}).dropna()
+        if len(paired) > 2000:
+            paired = paired.sample(2000, random_state=0)
+        
+        property_types = df.get('property-type', pd.Series(dtype=object)).dropna()
         
         return jsonify({
             'success': True,
             'charts': charts,
             'data_summary': {
                 'total_records': len(df),
-                'avg_efficiency': df.get('current-energy-efficiency', pd.Series([0])).mean(),
-                'most_common_rating': df.get('current-energy-rating', pd.Series(['N/A'])).mode().iloc[0] if not df.empty else 'N/A'
+                'avg_efficiency': float(efficiency.mean()) if efficiency.notna().any() else None,
+                'most_common_rating': ratings.mode().iloc[0] if ratings.notna().any() else 'N/A',
+                'improvement_potential': round(100 * can_improve.sum() / len(df)) if len(df) else 0,
+                'dominant_property_type': property_types.mode().iloc[0] if not property_types.empty else None
+            },
+            'rating_summary': rating_summary,
+            'efficiency_comparison': {
+                'current': paired['current'].tolist(),
+                'potential': paired['potential'].tolist()
             }
         })
-        
+    
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def rating_chart(rating_counts):
+    return {
+        'data': [{
+            'x': rating_counts.index.tolist(),
+            'y': rating_counts.values.tolist(),
+            'type': 'bar',
+            'marker': {'color': [get_energy_color(rating) for rating in rating_counts.index]}
+        }],
+        'layout': {
+            'title': 'Energy Rating Distribution',
+            'xaxis': {'title': 'Energy Rating'},
+            'yaxis': {'title': 'Number of Properties'}
+        }
+    }
+
+def property_type_chart(property_counts):
+    property_counts = property_counts.head(10)
+    return {
+        'data': [{
+            'labels': property_counts.index.tolist(),
+            'values': property_counts.values.tolist(),
+            'type': 'pie'
+        }],
+        'layout': {'title': 'Property Type Distribution'}
+    }
+
+def efficiency_histogram_chart(centres, counts, width):
+    return {
+        'data': [{
+            'x': np.round(centres, 1).tolist(),
+            'y': np.asarray(counts).tolist(),
+            'type': 'bar',
+            'width': width
+        }],
+        'layout': {
+            'title': 'Energy Efficiency Score Distribution',
+            'xaxis': {'title': 'Efficiency Score'},
+            'yaxis': {'title': 'Frequency'}
+        }
+    }
+
+def cache_analytics(property_type=None, local_authority=None):
+    """Analytics over every cached certificate, read from the rollup tables.
+    
+    Only rolled-up measures are available: there is no improvement potential,
+    floor area or current/potential comparison, which need every row.
+    """
+    rollups = epc_db.get_analytics(property_type, local_authority)
+    total = sum(row['certificates'] for row in rollups['total'].values())
+    efficiency_count = sum(row['efficiency_count'] for row in rollups['total'].values())
+    efficiency_sum = sum(row['efficiency_sum'] for row in rollups['total'].values())
+    
+    def counts(dimension):
+        # Sorted by count, with certificates missing the field left out
+        values = {value: row['certificates'] for value, row in rollups[dimension].items() if value}
+        return pd.Series(values, dtype='int64').sort_values(ascending=False, kind='stable')
+    
+    charts = {}
+    rating_counts = counts('current-energy-rating')
+    property_counts = counts('property-type')
+    
+    if not rating_counts.empty:
+        charts['energy_ratings'] = rating_chart(rating_counts)
+    if not property_counts.empty:
+        charts['property_types'] = property_type_chart(property_counts)
+    
+    bands = counts('efficiency-band')
+    if not bands.empty:
+        band = Config.ANALYTICS_EFFICIENCY_BAND
+        bands = bands.rename(index=int).sort_index()
+        charts['efficiency_histogram'] = efficiency_histogram_chart(
+            bands.index.to_numpy() + band / 2, bands.to_numpy(), band
+        )
+    
+    rating_summary = []
+    for rating in ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'Unknown']:
+        row = rollups['current-energy-rating'].get('' if rating == 'Unknown' else rating)
+        if row:
+            rating_summary.append({
+                'rating': rating,
+                'count': row['certificates'],
+                'percentage': round(100 * row['certificates'] / total, 1),
+                'avg_efficiency': (round(row['efficiency_sum'] / row['efficiency_count'], 1)
+                                   if row['efficiency_count'] else None),
+                'avg_floor_area': None
+            })
+    
+    return {
+        'success': True,
+        'charts': charts,
+        'data_summary': {
+            'total_records': total,
+            'avg_efficiency': efficiency_sum / efficiency_count if efficiency_count else None,
+            'most_common_rating': rating_counts.index[0] if not rating_counts.empty else 'N/A',
+            'improvement_potential': None,
+            'dominant_property_type': property_counts.index[0] if not property_counts.empty else None
+        },
+        'rating_summary': rating_summary,
+        'efficiency_comparison': {'current': [], 'potential': []},
+        'breakdowns': {
+            'local_authority': counts('local-authority').to_dict(),
+            'lodgement_year': counts('lodgement-year').sort_index().to_dict()
+        }
+    }
+
 @app.route('/download/<filename>')
 def download_file(filename):
     """Download exported files"""
@@ -310,10 +673,25 @@ def download_file(filename):
             return send_file(filepath, as_attachment=True)
         else:
             return "File not found", 404
-            
+    
     except Exception as e:
         return f"Download error: {str(e)}", 500
 
+@app.route('/tiles/<name>/<int:z>/<int:x>/<int:y>.pbf')
+def vector_tile(name, z, x, y):
+    """Serve one tile from an exported MBTiles archive"""
+    filepath = Path(geojson_exporter.export_path) / f"{Path(name).name}.mbtiles"
+    
+    if not filepath.exists():
+        return "Tileset not found", 404
+    
+    tile = VectorTileExporter.read_tile(str(filepath), z, x, y)
+    if tile is None:
+        return Response(status=204)
+    
+    return Response(tile, mimetype='application/vnd.mapbox-vector-tile',
+                    headers={'Content-Encoding': 'gzip'})
+
 def get_energy_color(rating):
     """Get color for energy rating"""
     colors = {
@@ -327,21 +705,5 @@ def get_energy_color(rating):
     }
     return colors.get(rating, '#cccccc')
 
-def get_approximate_postcode_location(postcode):
-    """Get approximate location for UK postcode"""
-    # This is a simplified mapping - in production you'd use proper geocoding
-    postcode_areas = {
-        'GU1': (51.2362, -0.5704),  # Guildford
-        'GU2': (51.2483, -0.5915),
-        'M1': (53.4808, -2.2426),   # Manchester
-        'SW1': (51.4994, -0.1319),  # Westminster
-        'EC1': (51.5186, -0.1067),  # City of London
-        'W1': (51.5154, -0.1410),   # West End
-    }
-    
-    # Extract postcode area
-    area = postcode.split()[0] if ' ' in postcode else postcode[:2]
-    return postcode_areas.get(area, (54.5, -3.0))  # Default to UK center
-
 if __name__ == '__main__':
     app.run(debug=True, port=5000, host='0.0.0.0', threaded=True)
\ No newline at end of file